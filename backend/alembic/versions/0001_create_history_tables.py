@@ -0,0 +1,53 @@
+"""create history tables
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sessions",
+        sa.Column("session_id", sa.String(36), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_activity", sa.DateTime(), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("current_simulation_id", sa.String(36), nullable=True),
+    )
+    op.create_index("ix_sessions_last_activity", "sessions", ["last_activity"])
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("session_id", sa.String(36), sa.ForeignKey("sessions.session_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("type", sa.String(16), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("simulation_id", sa.String(36), nullable=True),
+    )
+    op.create_index("ix_messages_session_id", "messages", ["session_id"])
+    op.create_index("ix_messages_timestamp", "messages", ["timestamp"])
+
+    op.create_table(
+        "simulations",
+        sa.Column("simulation_id", sa.String(36), primary_key=True),
+        sa.Column("session_id", sa.String(36), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+    )
+    op.create_index("ix_simulations_session_id", "simulations", ["session_id"])
+    op.create_index("ix_simulations_created_at", "simulations", ["created_at"])
+
+
+def downgrade():
+    op.drop_table("simulations")
+    op.drop_table("messages")
+    op.drop_table("sessions")
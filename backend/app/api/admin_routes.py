@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
+from ..services.request_profiler import RequestProfiler
+from .dependencies import get_request_profiler
+
+router = APIRouter()
+
+def require_profiling_token(
+    x_profile_token: Optional[str] = Header(None),
+    profiler: RequestProfiler = Depends(get_request_profiler)
+) -> RequestProfiler:
+    """The profiler, for requests carrying PROFILING_TOKEN"""
+
+    if not profiler.authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required")
+    return profiler
+
+@router.get("/admin/requests")
+async def get_captured_requests(profiler: RequestProfiler = Depends(require_profiling_token)):
+    """Slow, sampled and requested requests kept by this worker, newest first"""
+
+    return {
+        "profiling": profiler.stats(),
+        "loop_stalls": profiler.loop.stalls_between(0, float("inf")),
+        "requests": profiler.recent()
+    }
+
+@router.get("/admin/requests/{capture_id}")
+async def get_captured_request(capture_id: str, profiler: RequestProfiler = Depends(require_profiling_token)):
+    """One captured request with its stage timings and profile"""
+
+    entry = profiler.get(capture_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Request not found (it may have left the buffer)")
+    return entry
@@ -1,26 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends
 from ..models.chat_models import ChatRequest, ChatResponse, ChatHistoryResponse
 from ..services.chat_service import ChatService
+from ..services.lod_builder import LODBuilder, apply_level
 from ..services.session_manager import SessionManager
+from .dependencies import get_chat_service, get_session_manager, get_lod_builder
 
 router = APIRouter()
 
-async def get_chat_service():
-    return ChatService()
-
-async def get_session_manager():
-    return SessionManager()
-
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_simulation(
     request: ChatRequest,
-    chat_service: ChatService = Depends(get_chat_service)
+    chat_service: ChatService = Depends(get_chat_service),
+    lod_builder: LODBuilder = Depends(get_lod_builder)
 ):
     """Process chat message and update simulation"""
     
     try:
         response_data = await chat_service.process_chat_message(request)
-        return ChatResponse(**response_data)
+        return ChatResponse(**await apply_level(response_data, lod_builder, request.level))
     
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,64 @@
+import asyncio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils.compression import negotiate_encoding, compress_body
+from ..utils.request_trace import stage
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+THREAD_THRESHOLD = 256 * 1024  # Bodies above this are compressed in a worker thread
+
+
+class CompressionMiddleware:
+    """Compresses complete responses with the best of zstd, br and gzip the client accepts.
+
+    Streamed responses (more than one body message) pass through untouched so
+    each chunk still reaches the client as soon as it is sent.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            headers = Headers(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body") or len(body) < self.minimum_size or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            with stage("http.compress"):
+                if len(body) > THREAD_THRESHOLD:
+                    compressed = await asyncio.to_thread(compress_body, body, encoding)
+                else:
+                    compressed = compress_body(body, encoding)
+            response_headers = MutableHeaders(raw=start_message["headers"])
+            response_headers["content-encoding"] = encoding
+            response_headers["content-length"] = str(len(compressed))
+            response_headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,88 @@
+from functools import lru_cache
+from ..services.llm_service import LLMService
+from ..services.chat_service import ChatService
+from ..services.session_manager import SessionManager
+from ..services.providers import warm_providers
+from ..services.history_store import HistoryStore
+from ..services.similarity_index import SimilarityIndex
+from ..services.session_broadcaster import SessionBroadcaster
+from ..services.lod_builder import LODBuilder
+from ..services.spatial_index import SceneIndexCache
+from ..services.speculation import LiveTraffic, SpeculationWorker
+from ..services.batch_service import BatchService
+from ..services.request_profiler import RequestProfiler
+from ..config import settings
+
+# Services are created once per worker so provider clients and the Redis
+# connection pool are reused across requests instead of rebuilt every call.
+
+@lru_cache()
+def get_history_store() -> HistoryStore:
+    return HistoryStore()
+
+@lru_cache()
+def get_session_manager() -> SessionManager:
+    return SessionManager(history_store=get_history_store())
+
+@lru_cache()
+def get_similarity_index() -> SimilarityIndex:
+    # Persisted prompts are replayed in the background once started (see main.lifespan)
+    return SimilarityIndex(
+        redis_client=get_session_manager().redis_client,
+        path=settings.similarity_index_path,
+        max_entries=settings.similarity_max_entries
+    )
+
+@lru_cache()
+def get_scene_indexes() -> SceneIndexCache:
+    return SceneIndexCache(get_session_manager())
+
+@lru_cache()
+def get_llm_service() -> LLMService:
+    return LLMService(
+        session_manager=get_session_manager(),
+        similarity_index=get_similarity_index(),
+        scene_indexes=get_scene_indexes()
+    )
+
+@lru_cache()
+def get_batch_service() -> BatchService:
+    return BatchService(get_llm_service(), get_session_manager())
+
+@lru_cache()
+def get_request_profiler() -> RequestProfiler:
+    return RequestProfiler()
+
+@lru_cache()
+def get_live_traffic() -> LiveTraffic:
+    return LiveTraffic()
+
+@lru_cache()
+def get_speculation_worker() -> SpeculationWorker:
+    return SpeculationWorker(get_session_manager(), get_live_traffic())
+
+@lru_cache()
+def get_chat_service() -> ChatService:
+    return ChatService(
+        session_manager=get_session_manager(),
+        scene_indexes=get_scene_indexes(),
+        speculation=get_speculation_worker()
+    )
+
+@lru_cache()
+def get_session_broadcaster() -> SessionBroadcaster:
+    # Pub/sub only when the session store itself is on Redis
+    return SessionBroadcaster(settings.redis_url if get_session_manager().redis_client else None)
+
+@lru_cache()
+def get_lod_builder() -> LODBuilder:
+    return LODBuilder()
+
+def warm_services():
+    """Build the shared services up front so the first request doesn't pay for it"""
+    # Only providers with an API key are imported; the rest stay unloaded
+    warm_providers()
+    get_session_manager()
+    get_similarity_index()
+    get_llm_service()
+    get_chat_service()
@@ -0,0 +1,53 @@
+import time
+import uuid
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..services.request_profiler import RequestProfiler
+from ..utils.request_trace import start_trace, end_trace
+
+PROFILE_HEADER = "x-profile-token"
+
+
+class ProfilingMiddleware:
+    """Times each request's stages, profiles sampled or requested ones and keeps the slow ones.
+
+    A request sent with a valid X-Profile-Token header is always profiled and
+    its response carries X-Profile-Id, the id to read it back from
+    /api/admin/requests/{id}.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        capture_id = uuid.uuid4().hex[:16]
+        requested = self.profiler.authorized(Headers(scope=scope).get(PROFILE_HEADER))
+        reason = "requested" if requested else "sampled" if self.profiler.sampled() else None
+        sampler = self.profiler.new_profiler() if reason else None
+        status = 500
+
+        async def send_traced(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    MutableHeaders(scope=message).append("x-profile-id", capture_id)
+            await send(message)
+
+        trace, token = start_trace()
+        started, start_time = time.monotonic(), time.perf_counter()
+        if sampler is not None:
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            end_trace(token)
+            self.profiler.finish(capture_id, scope, status, started, time.perf_counter() - start_time,
+                                 trace, sampler, reason)
@@ -1,23 +1,33 @@
+import json
+import time
 from fastapi import APIRouter, HTTPException, Depends
-from ..models.request_models import SimulationRequest, ExampleRequest
-from ..models.response_models import SimulationResponse, ExamplesResponse
+from fastapi.responses import StreamingResponse
+from ..config import settings
+from ..models.request_models import (
+    SimulationRequest, BatchSimulationRequest, ExampleRequest, DetailLevel, PointQuery, BoxQuery, RayQuery, NearestQuery
+)
+from ..models.response_models import SimulationResponse, StoredSimulationResponse, ExamplesResponse, SpatialQueryResponse
 from ..services.llm_service import LLMService
+from ..services.batch_service import BatchService
+from ..services.lod_builder import LODBuilder, apply_level
 from ..services.session_manager import SessionManager
+from ..services.spatial_index import SceneIndex, SceneIndexCache
+from ..services.speculation import SpeculationWorker
 from ..templates.simple_structures import get_example_structures
+from .dependencies import (
+    get_llm_service, get_session_manager, get_lod_builder, get_scene_indexes, get_speculation_worker,
+    get_batch_service
+)
 
 router = APIRouter()
 
-async def get_llm_service():
-    return LLMService()
-
-async def get_session_manager():
-    return SessionManager()
-
 @router.post("/simulate", response_model=SimulationResponse)
 async def generate_simulation(
     request: SimulationRequest,
     llm_service: LLMService = Depends(get_llm_service),
-    session_manager: SessionManager = Depends(get_session_manager)
+    session_manager: SessionManager = Depends(get_session_manager),
+    lod_builder: LODBuilder = Depends(get_lod_builder),
+    speculation: SpeculationWorker = Depends(get_speculation_worker)
 ):
     """Generate physics simulation from natural language"""
     
@@ -30,8 +40,11 @@ async def generate_simulation(
         
         # Store the simulation
         await session_manager.store_simulation(simulation_data["simulation_id"], simulation_data)
+        # Precompute the likely first chat edits while the user looks at the result
+        speculation.schedule(session_id, simulation_data, [])
         
-        return SimulationResponse(**simulation_data)
+        # The full scene is stored; the response carries the requested level of detail
+        return SimulationResponse(**await apply_level(simulation_data, lod_builder, request.level))
     
     except Exception as e:
         raise HTTPException(
@@ -39,6 +52,89 @@ async def generate_simulation(
             detail=f"Simulation generation failed: {str(e)}"
         )
 
+@router.post("/simulate/batch")
+async def generate_simulations(
+    batch: BatchSimulationRequest,
+    batch_service: BatchService = Depends(get_batch_service),
+    lod_builder: LODBuilder = Depends(get_lod_builder)
+):
+    """Generate many simulations, streaming an NDJSON line for each distinct request as it finishes.
+    
+    Lines are {"indexes": [...], "simulation": {...}} or {"indexes": [...], "error": "..."};
+    identical requests share one line. The last line is {"summary": {...}}.
+    """
+    
+    concurrency = min(batch.concurrency or settings.batch_concurrency, settings.batch_max_concurrency)
+    
+    async def lines():
+        async for result in batch_service.generate(batch.requests, concurrency):
+            if "simulation" in result:
+                level = batch.requests[result["indexes"][0]].level
+                response = SimulationResponse(**await apply_level(result["simulation"], lod_builder, level))
+                result["simulation"] = response.model_dump(mode="json")
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/simulation/{simulation_id}", response_model=StoredSimulationResponse)
+async def get_simulation(
+    simulation_id: str,
+    level: DetailLevel = DetailLevel.FULL,
+    session_manager: SessionManager = Depends(get_session_manager),
+    lod_builder: LODBuilder = Depends(get_lod_builder)
+):
+    """Fetch a stored simulation at a level of detail"""
+    
+    simulation_data = await session_manager.get_simulation(simulation_id)
+    if not simulation_data:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    
+    return StoredSimulationResponse(**await apply_level(simulation_data, lod_builder, level))
+
+async def _scene_index(simulation_id: str, scene_indexes: SceneIndexCache) -> SceneIndex:
+    # Built on the first query against a simulation, then cached
+    index = await scene_indexes.get(simulation_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    return index
+
+def _query_response(simulation_id: str, index: SceneIndex, run) -> SpatialQueryResponse:
+    start = time.perf_counter()
+    hits = run()
+    return SpatialQueryResponse(
+        simulation_id=simulation_id,
+        members=[index.member(i, distance) for i, distance in hits],
+        query_time_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
+
+@router.post("/simulation/{simulation_id}/query/point", response_model=SpatialQueryResponse)
+async def query_point(simulation_id: str, query: PointQuery, scene_indexes: SceneIndexCache = Depends(get_scene_indexes)):
+    """Members within a radius of a point, nearest first"""
+    index = await _scene_index(simulation_id, scene_indexes)
+    return _query_response(simulation_id, index, lambda: index.within(query.point, query.radius)[:query.limit])
+
+@router.post("/simulation/{simulation_id}/query/box", response_model=SpatialQueryResponse)
+async def query_box(simulation_id: str, query: BoxQuery, scene_indexes: SceneIndexCache = Depends(get_scene_indexes)):
+    """Members intersecting an axis-aligned box, most stressed first"""
+    index = await _scene_index(simulation_id, scene_indexes)
+    return _query_response(simulation_id, index, lambda: [
+        (i, None) for i in sorted(index.in_box(query.min, query.max), key=index.stress, reverse=True)[:query.limit]
+    ])
+
+@router.post("/simulation/{simulation_id}/query/ray", response_model=SpatialQueryResponse)
+async def query_ray(simulation_id: str, query: RayQuery, scene_indexes: SceneIndexCache = Depends(get_scene_indexes)):
+    """Members hit by a pick ray, nearest first"""
+    index = await _scene_index(simulation_id, scene_indexes)
+    return _query_response(simulation_id, index, lambda: index.ray(
+        query.origin, query.direction, limit=query.limit, max_distance=query.max_distance
+    ))
+
+@router.post("/simulation/{simulation_id}/query/nearest", response_model=SpatialQueryResponse)
+async def query_nearest(simulation_id: str, query: NearestQuery, scene_indexes: SceneIndexCache = Depends(get_scene_indexes)):
+    """The k members closest to a point"""
+    index = await _scene_index(simulation_id, scene_indexes)
+    return _query_response(simulation_id, index, lambda: index.nearest(query.point, query.k))
+
 @router.get("/examples", response_model=ExamplesResponse)
 async def get_examples(request: ExampleRequest = Depends()):
     """Get pre-built simulation examples"""
@@ -52,10 +148,16 @@ async def get_examples(request: ExampleRequest = Depends()):
     return ExamplesResponse(examples=examples)
 
 @router.get("/health")
-async def health_check():
+async def health_check(
+    session_manager: SessionManager = Depends(get_session_manager),
+    speculation: SpeculationWorker = Depends(get_speculation_worker)
+):
     """Health check endpoint"""
     return {
         "status": "healthy", 
         "service": "physics-simulation-api",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        # Bytes this worker wrote to Redis before and after compression
+        "storage_compression": session_manager.codec.stats(),
+        "speculation": speculation.stats()
     } 
\ No newline at end of file
@@ -0,0 +1,21 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+from ..services.speculation import LiveTraffic
+
+# Long-lived streaming responses; counting them would hold speculation off for their whole run
+STREAMING_PATHS = {"/api/simulate/batch"}
+
+
+class LiveTrafficMiddleware:
+    """Counts HTTP requests in flight so background speculation can stay out of their way"""
+
+    def __init__(self, app: ASGIApp, traffic: LiveTraffic):
+        self.app = app
+        self.traffic = traffic
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in STREAMING_PATHS:
+            # WebSocket connections are long-lived; their chat turns are counted one by one
+            await self.app(scope, receive, send)
+            return
+        with self.traffic.request():
+            await self.app(scope, receive, send)
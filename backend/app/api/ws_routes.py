@@ -0,0 +1,89 @@
+import asyncio
+import json
+from typing import Dict, Any
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from ..models.request_models import DetailLevel
+from ..services.chat_service import ChatService
+from ..services.live_session import LiveSession
+from ..services.lod_builder import LODBuilder, apply_level
+from ..services.session_broadcaster import SessionBroadcaster
+from ..services.session_manager import SessionManager
+from ..services.speculation import LiveTraffic
+from .dependencies import (
+    get_chat_service, get_session_broadcaster, get_session_manager, get_lod_builder, get_live_traffic
+)
+
+router = APIRouter()
+
+@router.websocket("/ws/session/{session_id}")
+async def session_socket(
+    websocket: WebSocket,
+    session_id: str,
+    level: DetailLevel = DetailLevel.FULL,
+    session_manager: SessionManager = Depends(get_session_manager),
+    chat_service: ChatService = Depends(get_chat_service),
+    broadcaster: SessionBroadcaster = Depends(get_session_broadcaster),
+    lod_builder: LODBuilder = Depends(get_lod_builder),
+    traffic: LiveTraffic = Depends(get_live_traffic)
+):
+    """Chat over one connection with the session held in memory.
+
+    Client sends {"type": "chat", "message": ...} or {"type": "ping"}. Server
+    sends "session" (snapshot on connect), "delta" (partial LLM text),
+    "geometry" (each mesh/support/force arrow as soon as it is complete),
+    "update" (finished turn, from this or another connection), "pong" and
+    "error". With ?level=medium|low the session and update scenes are
+    simplified; geometry events always carry full-detail members.
+    """
+
+    await websocket.accept()
+    live = LiveSession(session_id, session_manager, chat_service, broadcaster)
+    if not await live.open():
+        await websocket.send_text(json.dumps({"type": "error", "detail": "Session not found"}))
+        await websocket.close(code=4404)
+        return
+
+    async def send(event: Dict[str, Any]):
+        if level != DetailLevel.FULL:
+            if event["type"] == "update":
+                event = {**event, "update": await apply_level(event["update"], lod_builder, level)}
+            elif event["type"] == "session" and event["simulation"]:
+                event = {**event, "simulation": await apply_level(event["simulation"], lod_builder, level)}
+        await websocket.send_text(json.dumps(event, default=str))
+
+    async def forward_remote_updates():
+        while True:
+            event = live.apply_remote(await live.events.get())
+            if event:
+                await send(event)
+
+    forwarder = asyncio.create_task(forward_remote_updates())
+    try:
+        await send(live.snapshot())
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except (ValueError, KeyError):  # Not JSON, or a binary frame
+                data = None
+            if not isinstance(data, dict):
+                await send({"type": "error", "detail": "Messages must be JSON objects"})
+            elif data.get("type") == "ping":
+                await send({"type": "pong"})
+            elif data.get("type") == "chat":
+                try:
+                    with traffic.request():
+                        await live.chat(data.get("message", ""), send)
+                except ValidationError as e:
+                    await send({"type": "error", "detail": e.errors()[0]["msg"]})
+                except Exception as e:
+                    print(f"WebSocket chat error: {e}")
+                    await send({"type": "error", "detail": f"Chat processing failed: {str(e)}"})
+            else:
+                await send({"type": "error", "detail": "Unknown message type"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        forwarder.cancel()
+        # Finish the final flush even if the server cancels this handler
+        await asyncio.shield(live.close())
@@ -11,6 +11,75 @@ class Settings(BaseSettings):
     session_timeout: int = 3600  # 1 hour in seconds
     max_chat_history: int = 50   # Maximum messages per session
     
+    # Local edit engine for simple chat edits ("make it longer", "add a support")
+    local_edit_enabled: bool = True
+    local_edit_min_confidence: float = 0.8  # Below this the edit goes to the LLM
+    
+    # Compression of stored values (zstd with the dictionary in app/data) and HTTP responses
+    storage_compression_enabled: bool = True
+    storage_compression_level: int = 3
+    storage_compression_dictionary_id: int = 0  # Dictionary to write with; 0 = the newest in app/data
+    http_compression_enabled: bool = True
+    http_compression_min_size: int = 1024  # Smaller responses are sent as they are
+    
+    # Batch generation (/api/simulate/batch)
+    batch_concurrency: int = 8  # Simulations generated at once when the request doesn't say
+    batch_max_concurrency: int = 32
+    
+    # Speculative follow-ups: likely next chat edits precomputed after each stored simulation
+    speculation_enabled: bool = True
+    speculation_top_k: int = 4  # Follow-ups precomputed per simulation
+    speculation_llm_calls_per_minute: int = 0  # Per worker, for follow-ups the local edit engine can't handle; 0 = local edits only
+    speculation_cpu_share: float = 0.25  # Largest fraction of time spent on local edits while speculating
+    speculation_idle_timeout: int = 300  # Seconds without a message before a session's speculation is dropped
+    speculation_max_members: int = 20000  # Larger scenes are not speculated on
+    
+    # Scene validation before a generated simulation is stored
+    validation_enabled: bool = True
+    validation_repair: bool = True  # Snap endpoints, drop duplicate members and re-anchor stray loads
+    
+    # WebSocket chat (/api/ws/session/{id})
+    ws_flush_interval: float = 0.5  # Seconds a connection batches session writes before flushing
+    
+    # Near-duplicate prompt reuse (similarity index over past simulation prompts)
+    similarity_enabled: bool = True
+    similarity_reuse_threshold: float = 0.9  # Serve the stored scene at or above this
+    similarity_seed_threshold: float = 0.5  # Pass the stored scene as a few-shot seed at or above this
+    similarity_index_path: str = ""  # JSONL file persisting the index when Redis is unavailable
+    similarity_max_entries: int = 20000  # Newest prompts kept in the persisted index
+    
+    # Durable history on DATABASE_URL, written behind the Redis cache
+    history_enabled: bool = True
+    history_flush_interval: float = 2.0  # Seconds between write-behind flushes
+    history_batch_size: int = 200  # Pending writes that trigger an early flush
+    
+    # Request profiling and slow-request capture (/api/admin/requests)
+    profiling_enabled: bool = False  # Off: no middleware, no loop monitor, stage timers are no-ops
+    profiling_sample_rate: float = 0.0  # Fraction of requests run under the sampling profiler
+    profiling_token: str = ""  # X-Profile-Token value that profiles a request and opens the admin endpoints
+    profiling_interval_ms: float = 1.0  # Profiler sampling interval
+    slow_request_ms: float = 2000.0  # Requests slower than this are captured
+    slow_request_buffer_size: int = 100  # Captured requests kept per worker
+    loop_lag_interval_ms: float = 50.0  # How often event loop lag is measured
+    loop_stall_ms: float = 100.0  # Stalls longer than this get the loop thread's stack captured
+    
+    # Production server (python run.py --production)
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 0  # 0 = one worker per available CPU
+    keep_alive_timeout: int = 5  # Seconds to hold idle keep-alive connections
+    backlog: int = 2048  # Pending connections queued by the listening socket
+    graceful_shutdown_timeout: int = 120  # Seconds to let in-flight LLM calls finish on SIGTERM
+    
+    # Stub LLM provider for local development and load testing
+    llm_stub_enabled: bool = False  # Route every LLM call to the stub
+    llm_stub_recordings_path: str = ""  # JSON file with "simulate"/"chat" completions
+    llm_stub_latency_distribution: str = "lognormal"  # constant, uniform or lognormal
+    llm_stub_latency_mean_ms: float = 800.0
+    llm_stub_latency_jitter: float = 0.3
+    llm_stub_error_rate: float = 0.0
+    llm_stub_seed: int = 0
+    
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import JSON, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+class Base(DeclarativeBase):
+    pass
+
+class SessionRecord(Base):
+    __tablename__ = "sessions"
+
+    session_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    last_activity: Mapped[datetime] = mapped_column(DateTime, index=True)
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    current_simulation_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+
+class MessageRecord(Base):
+    __tablename__ = "messages"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    session_id: Mapped[str] = mapped_column(ForeignKey("sessions.session_id", ondelete="CASCADE"), index=True)
+    type: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, index=True)
+    simulation_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+
+class SimulationRecord(Base):
+    """One version of a simulation; chat iterations add a new row per change"""
+    __tablename__ = "simulations"
+
+    simulation_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    session_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    data: Mapped[Dict[str, Any]] = mapped_column(JSON)
@@ -1,13 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api.routes import router
 from .api.chat_routes import router as chat_router
+from .api.ws_routes import router as ws_router
+from .api.admin_routes import router as admin_router
+from .api.compression_middleware import CompressionMiddleware
+from .api.traffic_middleware import LiveTrafficMiddleware
+from .api.profiling_middleware import ProfilingMiddleware
+from .api.dependencies import (
+    warm_services, get_llm_service, get_chat_service, get_session_manager, get_history_store,
+    get_session_broadcaster, get_live_traffic, get_speculation_worker, get_request_profiler,
+    get_similarity_index
+)
 from .config import settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create provider clients and the Redis pool before accepting traffic
+    warm_services()
+    await get_history_store().start()
+    if settings.similarity_enabled:
+        # Replays persisted prompts without holding up startup
+        await get_similarity_index().start()
+    await get_speculation_worker().start(get_chat_service())
+    await get_request_profiler().start()
+    yield
+    # Uvicorn has drained in-flight requests (up to graceful_shutdown_timeout) by now
+    await get_request_profiler().stop()
+    await get_speculation_worker().stop()
+    await get_session_broadcaster().close()
+    await get_history_store().stop()
+    await get_llm_service().close()
+    get_session_manager().close()
+
 app = FastAPI(
     title="Physics Simulation API",
     description="Generate Three.js physics simulations from natural language with chat iteration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -19,16 +50,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# zstd/br/gzip for responses, negotiated per request
+if settings.http_compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.http_compression_min_size)
+
+# Lets background speculation wait until no request is in flight
+app.add_middleware(LiveTrafficMiddleware, traffic=get_live_traffic())
+
+# Outermost, so a request's time includes every other middleware
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=get_request_profiler())
+
 # Include API routes
 app.include_router(router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
+app.include_router(ws_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 
 @app.get("/")
 async def root():
     return {
         "message": "Physics Simulation API with Chat",
         "version": "1.0.0",
-        "features": ["simulation_generation", "chat_iteration", "session_management"],
+        "features": ["simulation_generation", "chat_iteration", "session_management", "websocket_chat"],
         "docs": "/docs",
         "health": "/api/health"
     } 
\ No newline at end of file
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
+from .request_models import DetailLevel
 from .response_models import SimulationMetadata
 
 class MessageType(str, Enum):
@@ -19,6 +20,7 @@ class ChatRequest(BaseModel):
     session_id: str
     message: str = Field(..., min_length=1, max_length=500)
     simulation_id: Optional[str] = None
+    level: DetailLevel = DetailLevel.FULL
 
 class ChatResponse(BaseModel):
     simulation_id: str
@@ -28,6 +30,8 @@ class ChatResponse(BaseModel):
     scene: Dict[str, Any]
     changes_made: List[str]
     metadata: SimulationMetadata
+    lod: Optional[Dict[str, Any]] = None
+    validation: Optional[Dict[str, Any]] = None
 
 class ChatHistoryResponse(BaseModel):
     session_id: str
@@ -1,28 +1,60 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from enum import Enum
 
 class ComplexityLevel(str, Enum):
     SIMPLE = "simple"
     MEDIUM = "medium"
     HIGH = "high"
- b 
+
+class DetailLevel(str, Enum):
+    FULL = "full"
+    MEDIUM = "medium"
+    LOW = "low"
+
 class LLMProvider(str, Enum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic"
     GEMINI = "gemini"
+    STUB = "stub"
 
 class SimulationRequest(BaseModel):
     prompt: str = Field(..., min_length=5, max_length=500)
     complexity: ComplexityLevel = ComplexityLevel.SIMPLE
     provider: LLMProvider = LLMProvider.OPENAI
     structure_type: str = "auto"
+    level: DetailLevel = DetailLevel.FULL  # Detail of the returned scene; the full scene is always stored
     preferences: Optional[Dict[str, Any]] = {
         "units": "metric",
         "detail_level": "educational",
         "animation": True
     }
 
+class BatchSimulationRequest(BaseModel):
+    requests: List[SimulationRequest] = Field(..., min_length=1, max_length=1000)
+    concurrency: Optional[int] = Field(None, ge=1)  # Defaults to BATCH_CONCURRENCY, capped at BATCH_MAX_CONCURRENCY
+
 class ExampleRequest(BaseModel):
     category: Optional[str] = "all"
-    complexity: Optional[ComplexityLevel] = None 
\ No newline at end of file
+    complexity: Optional[ComplexityLevel] = None
+
+# Spatial queries against a stored simulation's members; coordinates are [x, y, z]
+class PointQuery(BaseModel):
+    point: List[float] = Field(..., min_length=3, max_length=3)
+    radius: float = Field(1.0, ge=0)
+    limit: int = Field(50, ge=1, le=1000)
+
+class BoxQuery(BaseModel):
+    min: List[float] = Field(..., min_length=3, max_length=3)
+    max: List[float] = Field(..., min_length=3, max_length=3)
+    limit: int = Field(100, ge=1, le=10000)  # Most stressed members first
+
+class RayQuery(BaseModel):
+    origin: List[float] = Field(..., min_length=3, max_length=3)
+    direction: List[float] = Field(..., min_length=3, max_length=3)
+    limit: int = Field(1, ge=1, le=100)
+    max_distance: Optional[float] = Field(None, gt=0)
+
+class NearestQuery(BaseModel):
+    point: List[float] = Field(..., min_length=3, max_length=3)
+    k: int = Field(5, ge=1, le=1000)
@@ -7,6 +7,9 @@ class SimulationMetadata(BaseModel):
     processing_time: float
     llm_model: str
     confidence: float
+    prompt_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    speculative: Optional[bool] = None  # Served from a follow-up precomputed in the background
 
 class SimulationResponse(BaseModel):
     simulation_id: str
@@ -15,6 +18,34 @@ class SimulationResponse(BaseModel):
     complexity: str
     scene: Dict[str, Any]
     metadata: SimulationMetadata
+    lod: Optional[Dict[str, Any]] = None
+    validation: Optional[Dict[str, Any]] = None
+
+class StoredSimulationResponse(BaseModel):
+    simulation_id: str
+    session_id: Optional[str] = None
+    description: Optional[str] = None
+    complexity: Optional[str] = None
+    scene: Dict[str, Any]
+    stress_colors: Optional[Dict[str, Any]] = None
+    camera: Optional[Dict[str, Any]] = None
+    lighting: Optional[Dict[str, Any]] = None
+    metadata: Optional[SimulationMetadata] = None
+    lod: Optional[Dict[str, Any]] = None
+    validation: Optional[Dict[str, Any]] = None
+
+class MemberHit(BaseModel):
+    id: str
+    element_type: str
+    stress_level: float
+    start: List[float]
+    end: List[float]
+    distance: Optional[float] = None  # To the member surface, or along the ray for picks
+
+class SpatialQueryResponse(BaseModel):
+    simulation_id: str
+    members: List[MemberHit]
+    query_time_ms: float
     
 class Example(BaseModel):
     id: str
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from ..models.request_models import SimulationRequest
+from .llm_service import LLMService
+from .session_manager import SessionManager
+
+# Batch generation for /api/simulate/batch.
+#
+# Identical requests are generated once. Distinct ones run concurrently, at
+# most `concurrency` at a time, through the shared LLMService (similarity
+# reuse and validation included). Whatever has finished when the stream is
+# ready for more is stored together, sessions and simulations in one
+# pipelined Redis round trip, then yielded in completion order.
+#
+# Provider batch APIs are not used: they return results minutes to hours
+# later, which doesn't fit a stream of results as each one finishes.
+
+Finished = Tuple[List[int], Optional[Dict[str, Any]], Optional[str]]
+
+
+class BatchService:
+    """Generates and stores many simulations for one request"""
+
+    def __init__(self, llm_service: LLMService, session_manager: SessionManager):
+        self.llm_service = llm_service
+        self.session_manager = session_manager
+
+    async def generate(self, requests: List[SimulationRequest], concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+        """Results as they finish: {"indexes", "simulation"} or {"indexes", "error"}, then a "summary"."""
+
+        start_time = time.perf_counter()
+        groups: Dict[str, List[int]] = {}
+        for i, request in enumerate(requests):
+            groups.setdefault(request.model_dump_json(), []).append(i)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        finished: asyncio.Queue = asyncio.Queue()
+
+        async def run(indexes: List[int]):
+            async with semaphore:
+                try:
+                    simulation = await self.llm_service.generate_simulation(requests[indexes[0]])
+                    await finished.put((indexes, simulation, None))
+                except Exception as e:
+                    print(f"Batch generation error: {e}")
+                    await finished.put((indexes, None, str(e)))
+
+        tasks = [asyncio.create_task(run(indexes)) for indexes in groups.values()]
+        generated = errors = 0
+        try:
+            remaining = len(tasks)
+            while remaining:
+                ready: List[Finished] = [await finished.get()]
+                while not finished.empty():
+                    ready.append(finished.get_nowait())
+                remaining -= len(ready)
+
+                simulations = [simulation for _, simulation, _ in ready if simulation]
+                await self.session_manager.create_sessions(simulations)
+                for indexes, simulation, error in ready:
+                    if simulation:
+                        generated += 1
+                        yield {"indexes": indexes, "simulation": simulation}
+                    else:
+                        errors += 1
+                        yield {"indexes": indexes, "error": error}
+
+            yield {"summary": {
+                "requests": len(requests),
+                "distinct": len(groups),
+                "generated": generated,
+                "errors": errors,
+                "concurrency": concurrency,
+                "elapsed": round(time.perf_counter() - start_time, 3)
+            }}
+        finally:
+            # The client went away mid-stream; stop generating for it
+            for task in tasks:
+                task.cancel()
@@ -1,16 +1,31 @@
+import asyncio
+import copy
 import json
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from openai import AsyncOpenAI
+from typing import Dict, Any, Awaitable, Callable, List, Optional
 from ..config import settings
 from ..models.chat_models import ChatMessage, ChatRequest, MessageType
+from ..models.request_models import LLMProvider
+from ..utils.request_trace import stage, note_scene
 from .session_manager import SessionManager
+from .prompt_builder import get_chat_prefix, build_scene_context, build_focus_context, history_window
+from .providers import get_provider
+from .edit_engine import parse_edit, apply_edit, LOCAL_EDIT_MODEL
+from .spatial_index import SceneIndexCache, focus_members, mentions_members
+from .scene_validator import validate_simulation
+from .speculation import SpeculationWorker
+
+THREAD_THRESHOLD = 500  # Members above which a local edit runs in a worker thread
 
 class ChatService:
-    def __init__(self):
-        self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
-        self.session_manager = SessionManager()
+    def __init__(self, session_manager: Optional[SessionManager] = None,
+                 scene_indexes: Optional[SceneIndexCache] = None,
+                 speculation: Optional[SpeculationWorker] = None):
+        self.session_manager = session_manager or SessionManager()
+        self.scene_indexes = scene_indexes
+        self.speculation = speculation
     
     async def process_chat_message(self, request: ChatRequest) -> Dict[str, Any]:
         """Process chat message and generate updated simulation"""
@@ -21,121 +36,180 @@ class ChatService:
         # Get current simulation context
         current_simulation = await self.session_manager.get_current_simulation(request.session_id)
         
-        # Build context for LLM
-        context = self._build_chat_context(history, current_simulation, request.message)
-        
         try:
-            if self.openai_client:
-                # Generate response using LLM
-                response = await self.openai_client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=context,
-                    temperature=0.7,
-                    max_tokens=3000
-                )
-                
-                # Parse response
-                response_content = response.choices[0].message.content
-                
-                # Extract simulation JSON and explanation
-                simulation_data, explanation, changes = self._parse_chat_response(response_content)
-            else:
-                # Fallback when no OpenAI key
-                simulation_data, explanation, changes = self._get_fallback_response(request, current_simulation)
-            
-            # Generate new simulation ID
-            new_simulation_id = str(uuid.uuid4())
-            
-            # Update simulation data
-            simulation_data.update({
-                "simulation_id": new_simulation_id,
-                "session_id": request.session_id,
-                "metadata": {
-                    "generated_at": datetime.now(),
-                    "processing_time": 2.0,
-                    "llm_model": "gpt-4-turbo-preview" if self.openai_client else "fallback",
-                    "confidence": 0.85 if self.openai_client else 0.5
-                }
-            })
+            # Likely follow-ups are precomputed in the background; use one if this is it
+            update = await self.precomputed_update(request, current_simulation)
+            if update is None:
+                update = await self.generate_update(request, history, current_simulation)
             
             # Save messages to session
-            await self.session_manager.add_message(
-                request.session_id,
-                ChatMessage(
-                    id=str(uuid.uuid4()),
-                    type=MessageType.USER,
-                    content=request.message,
-                    timestamp=datetime.now()
-                )
-            )
-            
-            await self.session_manager.add_message(
-                request.session_id,
-                ChatMessage(
-                    id=str(uuid.uuid4()),
-                    type=MessageType.ASSISTANT,
-                    content=explanation,
-                    timestamp=datetime.now(),
-                    simulation_id=new_simulation_id
-                )
-            )
+            user_message, assistant_message = self.user_message(request), self.assistant_message(update)
+            await self.session_manager.add_message(request.session_id, user_message)
+            await self.session_manager.add_message(request.session_id, assistant_message)
             
             # Update current simulation
-            await self.session_manager.update_current_simulation(request.session_id, new_simulation_id)
-            await self.session_manager.store_simulation(new_simulation_id, simulation_data)
+            simulation_data = self.simulation_data(update)
+            await self.session_manager.update_current_simulation(request.session_id, update["simulation_id"])
+            await self.session_manager.store_simulation(update["simulation_id"], simulation_data)
+            self.speculate(request.session_id, simulation_data, history + [user_message, assistant_message])
             
-            return {
-                **simulation_data,
-                "message": explanation,
-                "changes_made": changes
-            }
+            return update
             
         except Exception as e:
             print(f"Chat processing error: {e}")
             return self._get_error_response(request, str(e))
     
-    def _build_chat_context(self, history: List[ChatMessage], current_simulation: Optional[Dict], message: str) -> List[Dict[str, str]]:
-        """Build context for LLM chat"""
+    async def generate_update(self, request: ChatRequest, history: List[ChatMessage],
+                              current_simulation: Optional[Dict[str, Any]],
+                              on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+                              llm_allowed: bool = True) -> Optional[Dict[str, Any]]:
+        """Produce the updated simulation for a message without saving anything.
         
-        system_prompt = """
-        You are a structural engineering assistant helping users iterate on physics simulations.
+        With on_delta the LLM response is streamed and each text delta is passed
+        to it as it arrives. With llm_allowed=False, messages that would need
+        the LLM give None.
+        """
         
-        Context:
-        - User has an existing simulation they want to modify
-        - Generate updated Three.js JSON based on their request
-        - Explain what changes you made
-        - List specific modifications in a "changes_made" array
+        start_time = time.perf_counter()
+        token_usage = {}
+        note_scene((current_simulation or {}).get("scene"))
+        adapter = get_provider(LLMProvider.STUB if settings.llm_stub_enabled else LLMProvider.OPENAI)
         
-        Return format:
-        {
-            "explanation": "I've made the following changes to your simulation...",
-            "changes_made": ["Increased bridge length from 5m to 8m", "Added 2 additional supports"],
-            "simulation": { 
-                "scene": {
-                    "meshes": [...],
-                    "supports": [...],
-                    "force_arrows": [...]
-                },
-                "stress_colors": {...},
-                "camera": {...},
-                "lighting": {...}
+        local_edit = await self._try_local_edit(request, current_simulation)
+        if local_edit:
+            # Simple edits are applied to the scene directly, without an LLM round trip
+            model_name = LOCAL_EDIT_MODEL
+            confidence, (simulation_data, explanation, changes) = local_edit
+        elif adapter and not llm_allowed:
+            # Speculative turns only reach the model while its budget lasts
+            return None
+        elif adapter:
+            model_name = adapter.model
+            confidence = 0.85
+            # Build context for LLM
+            focus = await self._focus_members(current_simulation, request.message)
+            context = self._build_chat_context(history, current_simulation, request.message, focus)
+            
+            # Generate response using LLM
+            with stage("llm"):
+                if on_delta:
+                    deltas = []
+                    async for delta in adapter.stream_chat(context, max_tokens=3000):
+                        deltas.append(delta)
+                        await on_delta(delta)
+                    response_content = "".join(deltas)
+                else:
+                    response_content, token_usage = await adapter.chat(context, max_tokens=3000)
+            
+            # Extract simulation JSON and explanation
+            simulation_data, explanation, changes = self._parse_chat_response(response_content)
+        else:
+            # Fallback when no OpenAI key
+            model_name = "fallback"
+            confidence = 0.5
+            simulation_data, explanation, changes = self._get_fallback_response(request, current_simulation)
+        
+        # Update simulation data with a new simulation ID
+        simulation_data.update({
+            "simulation_id": str(uuid.uuid4()),
+            "session_id": request.session_id,
+            "description": (current_simulation or {}).get("description", request.message),
+            "metadata": {
+                "generated_at": datetime.now(),
+                "processing_time": round(time.perf_counter() - start_time, 3),
+                "llm_model": model_name,
+                "confidence": confidence,
+                "prompt_tokens": token_usage.get("prompt_tokens"),
+                "cached_tokens": token_usage.get("cached_tokens")
             }
+        })
+        if settings.validation_enabled:
+            await validate_simulation(simulation_data, settings.validation_repair, self.scene_indexes)
+        
+        return {
+            **simulation_data,
+            "message": explanation,
+            "changes_made": changes
         }
-        """
+    
+    def user_message(self, request: ChatRequest) -> ChatMessage:
+        return ChatMessage(
+            id=str(uuid.uuid4()),
+            type=MessageType.USER,
+            content=request.message,
+            timestamp=datetime.now()
+        )
+    
+    def assistant_message(self, update: Dict[str, Any]) -> ChatMessage:
+        return ChatMessage(
+            id=str(uuid.uuid4()),
+            type=MessageType.ASSISTANT,
+            content=update["message"],
+            timestamp=datetime.now(),
+            simulation_id=update["simulation_id"]
+        )
+    
+    def simulation_data(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """The stored simulation: an update without its chat reply"""
+        return {key: value for key, value in update.items() if key not in ("message", "changes_made")}
+    
+    async def precomputed_update(self, request: ChatRequest, current_simulation: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        """The speculated update for this message, if it was one of the likely follow-ups"""
+        if not self.speculation:
+            return None
+        return await self.speculation.take(request, current_simulation)
+    
+    def speculate(self, session_id: str, simulation: Dict[str, Any], history: List[ChatMessage]):
+        """Start precomputing the likely follow-ups to a session's new simulation"""
+        if self.speculation:
+            self.speculation.schedule(session_id, simulation, history)
+    
+    async def _try_local_edit(self, request: ChatRequest, current_simulation: Optional[Dict]) -> Optional[tuple[float, tuple]]:
+        """Apply the message locally when it is a confidently recognized simple edit"""
+        
+        if not settings.local_edit_enabled or not current_simulation or "scene" not in current_simulation:
+            return None
+        
+        plan = parse_edit(request.message)
+        if not plan or plan.confidence < settings.local_edit_min_confidence:
+            return None
         
-        messages = [{"role": "system", "content": system_prompt}]
+        # Large scenes take a while to copy and edit; keep that off the event loop
+        with stage("local_edit"):
+            if len(current_simulation["scene"].get("meshes", [])) > THREAD_THRESHOLD:
+                result = await asyncio.to_thread(apply_edit, current_simulation, plan)
+            else:
+                result = apply_edit(current_simulation, plan)
+        return (plan.confidence, result) if result else None
+    
+    async def _focus_members(self, current_simulation: Optional[Dict], message: str) -> List[Dict[str, Any]]:
+        """Members the message targets, looked up in the scene's spatial index"""
         
-        # Add conversation history (last 10 messages)
-        for msg in history[-10:]:
+        simulation_id = (current_simulation or {}).get("simulation_id")
+        if not self.scene_indexes or not simulation_id or not mentions_members(message):
+            return []
+        
+        index = await self.scene_indexes.get(simulation_id, current_simulation)
+        return focus_members(index, message) if index else []
+    
+    def _build_chat_context(self, history: List[ChatMessage], current_simulation: Optional[Dict], message: str,
+                            focus: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, str]]:
+        """Build context for LLM chat"""
+        
+        # Stable prefix first so providers can reuse it across turns
+        messages = [{"role": "system", "content": get_chat_prefix()}]
+        
+        # Add recent conversation history, cut on a block boundary so it stays cacheable between turns
+        for msg in history_window(history):
             role = "user" if msg.type == MessageType.USER else "assistant"
             messages.append({"role": role, "content": msg.content})
         
-        # Add current simulation context
+        # The scene changes every turn, so it goes with the current message at the end
         if current_simulation:
-            messages.append({
-                "role": "system",
-                "content": f"Current simulation structure: {json.dumps(current_simulation.get('scene', {}), indent=2)}"
-            })
+            scene_context = build_scene_context(current_simulation.get('scene', {}))
+            if focus:
+                scene_context = f"{scene_context}\n\n{build_focus_context(focus)}"
+            message = f"{scene_context}\n\n{message}"
         
         # Add current message
         messages.append({"role": "user", "content": message})
@@ -174,49 +248,19 @@ class ChatService:
     def _get_fallback_response(self, request: ChatRequest, current_simulation: Optional[Dict]) -> tuple[Dict[str, Any], str, List[str]]:
         """Generate fallback response when LLM is unavailable"""
         
-        # Simple modifications based on common requests
-        message = request.message.lower()
-        
         if current_simulation and "scene" in current_simulation:
-            modified_scene = current_simulation["scene"].copy()
-            changes = []
-            
-            # Simple keyword-based modifications
-            if "longer" in message or "extend" in message:
-                # Make beams longer
-                for mesh in modified_scene.get("meshes", []):
-                    if mesh.get("type") == "BoxGeometry":
-                        mesh["scale"][0] *= 1.5  # Increase length
-                        changes.append("Extended structural elements")
-            
-            elif "support" in message or "column" in message:
-                # Add more supports
-                support_count = len(modified_scene.get("supports", []))
-                modified_scene.setdefault("supports", []).append({
-                    "id": f"support_{support_count + 1}",
-                    "type": "ConeGeometry",
-                    "position": [0, -0.3, 0],
-                    "scale": [0.2, 0.3, 0.2],
-                    "material": {
-                        "type": "MeshStandardMaterial",
-                        "color": "#444444"
-                    }
-                })
-                changes.append("Added additional support structure")
-            
-            elif "force" in message or "load" in message:
-                # Modify forces
-                for force in modified_scene.get("force_arrows", []):
-                    force["length"] *= 1.2
-                    force["label"] = f"{int(float(force['label'].replace('N', '')) * 1.2)}N"
-                changes.append("Modified load conditions")
+            # Without a model, apply whatever the local edit engine understands, however unsure
+            plan = parse_edit(request.message)
+            result = apply_edit(current_simulation, plan) if plan else None
+            if result:
+                return result
             
             return {
-                "scene": modified_scene,
-                "stress_colors": current_simulation.get("stress_colors", {}),
-                "camera": current_simulation.get("camera", {}),
-                "lighting": current_simulation.get("lighting", {})
-            }, f"I've updated your simulation based on your request: '{request.message}'", changes
+                "scene": copy.deepcopy(current_simulation["scene"]),
+                "stress_colors": copy.deepcopy(current_simulation.get("stress_colors", {})),
+                "camera": copy.deepcopy(current_simulation.get("camera", {})),
+                "lighting": copy.deepcopy(current_simulation.get("lighting", {}))
+            }, f"I couldn't apply '{request.message}' without the AI model, so the simulation is unchanged.", []
         
         # If no current simulation, return basic structure
         return {
@@ -0,0 +1,755 @@
+import copy
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+from ..utils.scene_geometry import (
+    vec3, member_segment, set_member_segment, centreline_bounds, arrow_tip, normalize
+)
+
+# Local handling for the common chat edits ("make it longer", "add a support",
+# "double the load", "switch to concrete"). A message is split into clauses,
+# each clause must parse into one edit, and the plan's confidence is the
+# lowest clause confidence. Anything unrecognized gets no plan and goes to
+# the LLM, and so does a clause holding a number the rules didn't read ("at
+# x=2", "under the 5kN load"): the edit would otherwise silently ignore it.
+
+LOCAL_EDIT_MODEL = "local-edit"
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "another": 1, "single": 1, "two": 2, "couple": 2, "pair": 2,
+    "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10
+}
+
+MULTIPLIER_WORDS = {"double": 2.0, "twice": 2.0, "triple": 3.0, "half": 0.5, "halve": 0.5}
+
+MATERIALS = {
+    "steel": {"color": "#8C92AC", "metalness": 0.8, "roughness": 0.2, "yield_mpa": 250},
+    "concrete": {"color": "#A9A9A9", "metalness": 0.0, "roughness": 0.9, "yield_mpa": 30},
+    "aluminum": {"color": "#D0D5DB", "metalness": 0.9, "roughness": 0.3, "yield_mpa": 270},
+    "wood": {"color": "#A0522D", "metalness": 0.0, "roughness": 0.8, "yield_mpa": 40},
+}
+MATERIAL_ALIASES = {"aluminium": "aluminum", "timber": "wood", "wooden": "wood", "metal": "steel"}
+
+LENGTH_UNITS = {"mm": 0.001, "cm": 0.01, "m": 1.0, "meter": 1.0, "meters": 1.0, "metre": 1.0, "metres": 1.0}
+FORCE_UNITS = {"n": 1.0, "kn": 1e3, "mn": 1e6}
+
+DEFAULT_GROW = 1.5
+UNREAD_DETAIL_CONFIDENCE = 0.5  # A number or place the rules didn't read; below any sensible threshold
+
+# A full stop only ends a clause before whitespace, so "2.5m" and "1.5 kN" stay whole
+_CLAUSE_SPLIT = re.compile(r"\s*(?:[,;]|\.(?=\s|$)|\band then\b|\bthen\b|\band also\b|\balso\b|\band\b|\bplus\b)\s*")
+_SIDES = r"left|right|top|bottom|front|back|first|second|third|last|inner|outer|middle"
+# "and" inside one phrase ("between the left and right towers", "left and right supports") joins no clauses
+_JOINED_AND = re.compile(
+    rf"\b(?:between|both)\s+(?:the\s+)?\S+(?:\s+\S+)?\s+and\b|\b(?:{_SIDES})\s+and\s+(?:the\s+)?(?:{_SIDES})\b"
+)
+_FILLER = re.compile(
+    r"^(?:please|pls|can you|could you|would you|i want(?: you)? to|i'd like(?: you)? to|"
+    r"let's|lets|now|ok(?:ay)?|just|try to|go ahead and)\s+"
+)
+_QUESTION = re.compile(r"^(?:what|why|how|when|where|which|who|explain|describe|tell me|is|are|does)\b")
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_LENGTH = _NUMBER + r"\s*(mm|cm|m|meters?|metres?)\b"
+_SUPPORT_NOUNS = r"supports?|columns?|piers?|bearings?"
+_PANEL_NOUNS = r"panels?|bays?"
+# Named parts of a structure; an edit to one of them is not an edit to the whole scene
+_MEMBER = re.compile(
+    r"\b(deck|beam|girder|column|tower|pylon|cable|chord|diagonal|vertical|arch|pier|slab|wall|floor|roof|"
+    r"brace|bracing)(?:e?s)?\b"
+)
+# Words placing a support somewhere the rules may not understand
+_PLACE_WORDS = re.compile(r"\b(at|under|below|beneath|near|between|beside|next to|on|where|each|both)\b")
+# Words singling out one load among several ("the left load", "the load on the end span")
+_LOAD_PLACE = re.compile(rf"\b({_SIDES}|end|mid ?span|cent(?:er|re)|spans?)\b")
+
+
+@dataclass
+class EditIntent:
+    action: str
+    confidence: float
+    clause: str
+    axis: Optional[int] = None       # 0 = x (length), 1 = y (height), 2 = z (width), None = all
+    factor: Optional[float] = None   # Relative change
+    delta: Optional[float] = None    # Absolute change (metres, newtons or a count)
+    target: Optional[float] = None   # Absolute value (metres, newtons, a count or a support's x)
+    # Support placement: "middle", "left"/"right" (ends), "x" (target is the x coordinate),
+    # "from_left"/"from_right" (target is the distance from that end), or "all" for removal
+    position: Optional[str] = None
+    direction: Optional[Tuple[float, float, float]] = None
+    material: Optional[str] = None
+    member: Optional[str] = None     # Part of the structure a scale or material edit names ("deck"); None = all of it
+    numbers: List[str] = field(default_factory=list)  # Text of the numbers the parser read
+
+
+@dataclass
+class EditPlan:
+    intents: List[EditIntent] = field(default_factory=list)
+
+    @property
+    def confidence(self) -> float:
+        return min((intent.confidence for intent in self.intents), default=0.0)
+
+
+def parse_edit(message: str) -> Optional[EditPlan]:
+    """Parse a chat message into local edits, or None if any part is not understood"""
+    text = message.lower().strip().rstrip("!?. ")
+    text = _JOINED_AND.sub(lambda match: match.group(0)[:-3] + "&", text)
+    clauses = [clause.replace("&", "and") for clause in _CLAUSE_SPLIT.split(text) if clause]
+    if not clauses:
+        return None
+
+    plan = EditPlan()
+    for clause in clauses:
+        clause = _strip_filler(clause)
+        if not clause or _QUESTION.match(clause):
+            return None
+        intent = _parse_clause(clause)
+        if intent is None:
+            return None
+        # Long clauses usually carry detail the keyword rules can't see
+        extra_words = max(0, len(clause.split()) - 8)
+        intent.confidence = max(0.0, intent.confidence - 0.05 * extra_words)
+        plan.intents.append(intent)
+    return plan
+
+
+def _strip_filler(clause: str) -> str:
+    previous = None
+    while previous != clause:
+        previous = clause
+        clause = _FILLER.sub("", clause).strip()
+    return clause
+
+
+def _parse_clause(clause: str) -> Optional[EditIntent]:
+    for parser in (_parse_material, _parse_panels, _parse_supports, _parse_load, _parse_scale):
+        intent = parser(clause)
+        if intent is not None:
+            if _has_unread_number(clause, intent.numbers):
+                intent.confidence = min(intent.confidence, UNREAD_DETAIL_CONFIDENCE)
+            return intent
+    return None
+
+
+def _has_unread_number(clause: str, read: List[str]) -> bool:
+    for text in read:
+        clause = clause.replace(text, " ", 1)
+    return bool(re.search(r"\d", clause))
+
+
+def _length(value: str, unit: Optional[str]) -> float:
+    return float(value) * LENGTH_UNITS[unit or "m"]
+
+
+def _count(clause: str, nouns: str, default: int = 1) -> Tuple[int, str]:
+    """How many of nouns the clause asks for, and the text that said so ("" for the default)"""
+    words = "|".join(NUMBER_WORDS)
+    match = re.search(
+        rf"\b(\d+|{words})\s+(?:of\s+)?(?:(?:more|extra|additional|new|intermediate|interior)\s+)?(?:{nouns})\b",
+        clause
+    )
+    if not match:
+        return default, ""
+    count = match.group(1)
+    return (int(count) if count.isdigit() else NUMBER_WORDS[count]), match.group(0)
+
+
+def _percent(clause: str) -> Optional[Tuple[float, str]]:
+    match = re.search(_NUMBER + r"\s*(?:%|percent)", clause)
+    return (float(match.group(1)) / 100, match.group(0)) if match else None
+
+
+def _multiplier(clause: str) -> Optional[Tuple[float, str]]:
+    for word, factor in MULTIPLIER_WORDS.items():
+        if re.search(rf"\b{word}\b", clause):
+            return factor, word
+    match = re.search(r"\b" + _NUMBER + r"\s*(?:x|times)\b", clause) or re.search(r"\bx\s*" + _NUMBER + r"\b", clause)
+    return (float(match.group(1)), match.group(0)) if match else None
+
+
+def _parse_material(clause: str) -> Optional[EditIntent]:
+    names = "|".join(list(MATERIALS) + list(MATERIAL_ALIASES))
+    match = re.search(rf"\b({names})\b", clause)
+    if not match or re.search(r"\b(supports?|loads?|forces?)\b", clause):
+        return None
+    material = MATERIAL_ALIASES.get(match.group(1), match.group(1))
+    verb = re.search(r"\b(switch|change|convert|make|use|swap|replace|turn|build|go)\b|\bto\b|\bin\b|\binstead\b", clause)
+    member = _MEMBER.search(clause)
+    return EditIntent("material", 0.9 if verb else 0.6, clause, material=material,
+                      member=member.group(1) if member else None)
+
+
+def _parse_panels(clause: str) -> Optional[EditIntent]:
+    if not re.search(r"\b(panels?|bays?)\b", clause):
+        return None
+    count, count_text = _count(clause, _PANEL_NOUNS)
+    if re.search(r"\b(remove|fewer|less|delete|drop)\b", clause):
+        return EditIntent("panels", 0.85, clause, delta=-count, numbers=[count_text])
+    if re.search(r"\b(add|more|extra|additional|another|increase)\b", clause):
+        return EditIntent("panels", 0.9 if count_text else 0.8, clause, delta=count, numbers=[count_text])
+    match = re.search(r"\b(\d+)\s+(?:panels?|bays?)\b", clause)
+    if match:
+        return EditIntent("panels", 0.9, clause, target=int(match.group(1)), numbers=[match.group(0)])
+    return None
+
+
+def _parse_supports(clause: str) -> Optional[EditIntent]:
+    if not re.search(rf"\b({_SUPPORT_NOUNS})\b", clause):
+        return None
+    count, count_text = _count(clause, _SUPPORT_NOUNS)
+    position, x, location_text = _support_location(clause)
+    if position in ("left", "right") and re.search(r"\b(between|both)\b", clause):
+        # "between the left and right towers" names two places, not the left end
+        position = None
+    if re.search(r"\b(remove|delete|drop|fewer|less|take away|get rid of)\b", clause):
+        action, confidence = "remove_support", 0.85
+        if re.search(r"\ball\b", clause):
+            position = "all"
+    elif re.search(r"\b(add|more|another|extra|additional|insert|put|place|include)\b", clause):
+        action, confidence = "add_support", 0.9
+    else:
+        return None
+
+    if position is None and _PLACE_WORDS.search(clause):
+        # Placed somewhere the rules can't read ("under the load", "at each joint")
+        confidence = UNREAD_DETAIL_CONFIDENCE
+    elif position not in (None, "all", "middle") and count > 1:
+        # Several supports at one spot
+        confidence = UNREAD_DETAIL_CONFIDENCE
+    return EditIntent(action, confidence, clause, delta=count, target=x, position=position,
+                      numbers=[count_text, location_text])
+
+
+def _support_location(clause: str) -> Tuple[Optional[str], Optional[float], str]:
+    """(position, x or distance, text read) for where a support goes or is removed from"""
+    match = re.search(r"\bx\s*=\s*(-?\d+(?:\.\d+)?)\s*(mm|cm|m)?\b", clause)
+    if match:
+        return "x", _length(match.group(1), match.group(2)), match.group(0)
+    match = re.search(_NUMBER + r"\s*(mm|cm|m|meters?|metres?)?\s+(?:in\s+)?from\s+(?:the\s+)?(left|right)\b", clause)
+    if match:
+        return f"from_{match.group(3)}", _length(match.group(1), match.group(2)), match.group(0)
+    if re.search(r"\b(middle|mid ?span|center|centre|halfway)\b", clause):
+        return "middle", None, ""
+    match = re.search(r"\b(left|right)(?:most)?\b", clause)
+    if match:
+        return match.group(1), None, ""
+    return None, None, ""
+
+
+def _parse_load(clause: str) -> Optional[EditIntent]:
+    if not re.search(r"\b(loads?|forces?|weights?|loading)\b", clause):
+        return None
+    # New load cases (wind, seismic, snow...) need real engineering judgement
+    if re.search(r"\b(wind|seismic|earthquake|snow|thermal|dynamic|distributed|uniform|moving|vehicle)\b", clause):
+        return None
+    intent = _parse_load_change(clause)
+    if intent is not None and intent.action != "load_direction" and \
+            (_LOAD_PLACE.search(clause) or _MEMBER.search(clause) or _PLACE_WORDS.search(clause)):
+        # One load named by place or member; the edits scale every arrow, so leave it to the LLM
+        intent.confidence = min(intent.confidence, UNREAD_DETAIL_CONFIDENCE)
+    return intent
+
+
+def _parse_load_change(clause: str) -> Optional[EditIntent]:
+
+    match = re.search(_NUMBER + r"\s*(kn|mn|n)\b", clause)
+    if match:
+        value = float(match.group(1)) * FORCE_UNITS[match.group(2)]
+        if re.search(r"\bby\b", clause):
+            sign = -1 if re.search(r"\b(decrease|reduce|lower|lessen|cut|drop)\b", clause) else 1
+            return EditIntent("scale_load", 0.9, clause, delta=sign * value, numbers=[match.group(0)])
+        return EditIntent("set_load", 0.9, clause, target=value, numbers=[match.group(0)])
+
+    multiplier = _multiplier(clause)
+    if multiplier is not None:
+        return EditIntent("scale_load", 0.95, clause, factor=multiplier[0], numbers=[multiplier[1]])
+
+    direction = _direction(clause)
+    if direction is not None:
+        return EditIntent("load_direction", 0.9, clause, direction=direction)
+
+    percent, percent_text = _percent(clause) or (None, "")
+    increase = re.search(r"\b(increase|raise|more|heavier|bigger|larger|stronger|higher)\b", clause)
+    decrease = re.search(r"\b(decrease|reduce|lower|less|lighter|smaller|weaker|cut)\b", clause)
+    if increase and not decrease:
+        return EditIntent("scale_load", 0.9 if percent else 0.75, clause, factor=1 + (percent or 0.5),
+                          numbers=[percent_text])
+    if decrease and not increase:
+        return EditIntent("scale_load", 0.9 if percent else 0.75, clause,
+                          factor=max(0.05, 1 - percent) if percent else 1 / DEFAULT_GROW, numbers=[percent_text])
+    return None
+
+
+def _direction(clause: str) -> Optional[Tuple[float, float, float]]:
+    # "from the left" pushes towards +x; "to the left"/"leftward" pushes towards -x
+    source = re.search(r"\bfrom (?:the )?(left|right|above|below|top|bottom)\b", clause)
+    if source:
+        return {"left": (1.0, 0.0, 0.0), "right": (-1.0, 0.0, 0.0), "above": (0.0, -1.0, 0.0),
+                "top": (0.0, -1.0, 0.0), "below": (0.0, 1.0, 0.0), "bottom": (0.0, 1.0, 0.0)}[source.group(1)]
+    towards = re.search(r"\b(left|right|up|down|(?:left|right|up|down)wards?|sideways|horizontal(?:ly)?|vertical(?:ly)?)\b", clause)
+    if not towards:
+        return None
+    word = towards.group(1)
+    explicit = re.search(r"(ward|ways|ontal|ical)", word)
+    if not explicit and not re.search(r"\b(point|direct|turn|rotate|flip|aim|apply|act|push|pull|change|make)\b", clause):
+        return None
+    if word.startswith("left"):
+        return (-1.0, 0.0, 0.0)
+    if word.startswith(("right", "sideways", "horizontal")):
+        return (1.0, 0.0, 0.0)
+    if word.startswith("up"):
+        return (0.0, 1.0, 0.0)
+    return (0.0, -1.0, 0.0)
+
+
+_AXIS_WORDS = [
+    (0, 1, r"\b(longer|extend|extended|lengthen|stretch|widen the span|increase the (?:length|span)|longer span)\b"),
+    (0, -1, r"\b(shorten|shorter span|reduce the (?:length|span)|decrease the (?:length|span)|less long)\b"),
+    (1, 1, r"\b(taller|higher|raise the height|increase the height|deeper)\b"),
+    (1, -1, r"\b(lower|shallower|reduce the height|decrease the height|less tall)\b"),
+    (2, 1, r"\b(wider|broader|increase the width)\b"),
+    (2, -1, r"\b(narrower|thinner|reduce the width|decrease the width)\b"),
+    (None, 1, r"\b(bigger|larger|scale up|enlarge|grow)\b"),
+    (None, -1, r"\b(smaller|scale down|shrink)\b"),
+]
+
+
+def _parse_scale(clause: str) -> Optional[EditIntent]:
+    axis, sign, word = None, 0, None
+    for candidate_axis, candidate_sign, pattern in _AXIS_WORDS:
+        word = re.search(pattern, clause)
+        if word:
+            axis, sign = candidate_axis, candidate_sign
+            break
+    if sign == 0:
+        # "shorter" alone is ambiguous between length and height; pick length unless height is named
+        word = re.search(r"\bshorter\b", clause)
+        if word:
+            axis, sign = (1 if re.search(r"\b(height|tall)\b", clause) else 0), -1
+        elif re.search(r"\b(double|twice|triple|half|halve)\b.*\b(length|span|long)\b", clause):
+            axis, sign = 0, 1
+        else:
+            return None
+
+    member = _MEMBER.search(clause)
+    scoped = {"member": member.group(1) if member else None}
+
+    match = re.search(r"\b(to|by)\s+" + _LENGTH, clause)
+    if match and axis is not None:
+        value = _length(match.group(2), match.group(3))
+        if match.group(1) == "to":
+            return EditIntent("scale", 0.95, clause, axis=axis, target=value, numbers=[match.group(0)], **scoped)
+        return EditIntent("scale", 0.95, clause, axis=axis, delta=sign * value, numbers=[match.group(0)], **scoped)
+
+    # "2m longer", "500mm taller": a size right before the comparative is a change by that much
+    for match in re.finditer(_LENGTH, clause):
+        if axis is not None and word is not None and match.end() <= word.start() \
+                and not clause[match.end():word.start()].strip():
+            value = _length(match.group(1), match.group(2))
+            return EditIntent("scale", 0.95, clause, axis=axis, delta=sign * value, numbers=[match.group(0)], **scoped)
+
+    multiplier = _multiplier(clause)
+    if multiplier is not None:
+        return EditIntent("scale", 0.95, clause, axis=axis, factor=multiplier[0], numbers=[multiplier[1]], **scoped)
+
+    percent = _percent(clause)
+    if percent is not None:
+        factor = 1 + percent[0] if sign > 0 else max(0.05, 1 - percent[0])
+        return EditIntent("scale", 0.95, clause, axis=axis, factor=factor, numbers=[percent[1]], **scoped)
+
+    return EditIntent("scale", 0.85, clause, axis=axis, factor=DEFAULT_GROW if sign > 0 else 1 / DEFAULT_GROW, **scoped)
+
+
+def apply_edit(simulation: Dict[str, Any], plan: EditPlan) -> Optional[Tuple[Dict[str, Any], str, List[str]]]:
+    """Apply a plan to a copy of the simulation; returns None if any edit doesn't fit the scene"""
+    updated = {
+        key: copy.deepcopy(value) for key, value in simulation.items()
+        if key not in ("simulation_id", "session_id", "metadata")
+    }
+    scene = updated.setdefault("scene", {})
+    for key in ("meshes", "supports", "force_arrows"):
+        scene.setdefault(key, [])
+
+    changes: List[str] = []
+    for intent in plan.intents:
+        change = _APPLY[intent.action](updated, intent)
+        if change is None:
+            return None
+        changes.append(change)
+
+    explanation = "I've updated your simulation: " + "; ".join(c[0].lower() + c[1:] for c in changes) + "."
+    return updated, explanation, changes
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _apply_scale(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    scene = simulation["scene"]
+    if intent.member is not None and not _is_whole_scene(scene, intent.member):
+        # Resizing one part of a larger structure means reconnecting its joints; leave that to the LLM
+        return None
+    bounds = centreline_bounds(scene)
+    if bounds is None:
+        return None
+    low, high = bounds
+    axes = [intent.axis] if intent.axis is not None else [0, 1, 2]
+
+    factors = [1.0, 1.0, 1.0]
+    for axis in axes:
+        extent = high[axis] - low[axis]
+        if extent <= 1e-6 and intent.axis is not None:
+            # Nothing spans that axis (a lone beam has no height to scale), so the size means a section change
+            return None
+        if intent.factor is not None:
+            factors[axis] = intent.factor
+        elif intent.target is not None:
+            factors[axis] = intent.target / extent
+        else:
+            factors[axis] = (extent + intent.delta) / extent
+        if factors[axis] <= 0:
+            return None
+
+    # Scale about the centre horizontally and about the base vertically so the structure stays grounded
+    pivot = tuple((low[i] + high[i]) / 2 if i != 1 else low[i] for i in range(3))
+
+    def transform(point):
+        point = vec3(point)
+        return tuple(pivot[i] + (point[i] - pivot[i]) * factors[i] for i in range(3))
+
+    for mesh in scene["meshes"]:
+        start, end, _ = member_segment(mesh)
+        set_member_segment(mesh, transform(start), transform(end))
+    for support in scene["supports"]:
+        support["position"] = list(transform(support.get("position")))
+    for arrow in scene["force_arrows"]:
+        tip = transform(arrow_tip(arrow))
+        direction = normalize(vec3(arrow.get("direction"), 0.0))
+        length = float(arrow.get("length", 1.0))
+        arrow["origin"] = [tip[i] - direction[i] * length for i in range(3)]
+        if "label_position" in arrow:
+            arrow["label_position"] = list(transform(arrow["label_position"]))
+
+    camera = simulation.get("camera", {})
+    if "position" in camera:
+        grow = max(factors)
+        camera["position"] = [c * grow for c in vec3(camera["position"])]
+
+    names = {0: "length", 1: "height", 2: "width"}
+    if intent.axis is None:
+        return f"Scaled the whole structure by {_fmt(factors[0])}x"
+    axis = intent.axis
+    before = high[axis] - low[axis]
+    return f"Changed {names[axis]} from {_fmt(before)}m to {_fmt(before * factors[axis])}m"
+
+
+def _is_whole_scene(scene: Dict[str, Any], member: str) -> bool:
+    """Whether every mesh is the named member ("make the beam longer" on a single beam)"""
+    meshes = scene["meshes"]
+    return bool(meshes) and all(member in _element_type(m) or member in str(m.get("id", "")).lower() for m in meshes)
+
+
+def _location_x(bounds, intent: EditIntent) -> Optional[float]:
+    """x coordinate a support edit names, or None when it names no single place"""
+    low, high = bounds
+    if intent.position == "x":
+        return intent.target
+    if intent.position == "from_left":
+        return low[0] + intent.target
+    if intent.position == "from_right":
+        return high[0] - intent.target
+    return {"left": low[0], "right": high[0]}.get(intent.position)
+
+
+def _support_template(scene: Dict[str, Any], y: float) -> Dict[str, Any]:
+    if scene["supports"]:
+        template = copy.deepcopy(scene["supports"][0])
+    else:
+        template = {
+            "type": "ConeGeometry",
+            "scale": [0.2, 0.3, 0.2],
+            "material": {"type": "MeshStandardMaterial", "color": "#444444"}
+        }
+    template["position"] = [0.0, y, 0.0]
+    return template
+
+
+def _next_id(items: List[Dict[str, Any]], prefix: str) -> str:
+    used = {item.get("id") for item in items}
+    index = len(items) + 1
+    while f"{prefix}_{index}" in used:
+        index += 1
+    return f"{prefix}_{index}"
+
+
+def _apply_add_support(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    scene = simulation["scene"]
+    bounds = centreline_bounds(scene)
+    if bounds is None:
+        return None
+    low, high = bounds
+    count = max(1, int(intent.delta or 1))
+    supports = scene["supports"]
+    y = vec3(supports[0]["position"])[1] if supports else low[1] - 0.3
+    z = (low[2] + high[2]) / 2
+
+    xs = sorted(vec3(s.get("position"))[0] for s in supports)
+    new_xs: List[float] = []
+    located = _location_x(bounds, intent)
+    if located is not None:
+        # Off the structure, or several supports on one spot: not a simple edit
+        if count > 1 or not low[0] - 1e-6 <= located <= high[0] + 1e-6:
+            return None
+        new_xs.append(located)
+    for _ in range(count - len(new_xs)):
+        if intent.position == "middle" and not new_xs:
+            x = (low[0] + high[0]) / 2
+        elif not xs:
+            x = low[0]
+        else:
+            # Widest unsupported stretch: between two supports (use the midpoint)
+            # or beyond the outermost support (use the end of the structure)
+            candidates = [(xs[i + 1] - xs[i], (xs[i] + xs[i + 1]) / 2) for i in range(len(xs) - 1)]
+            candidates.append((xs[0] - low[0], low[0]))
+            candidates.append((high[0] - xs[-1], high[0]))
+            width, x = max(candidates)
+            if width <= 1e-6:
+                break
+        new_xs.append(x)
+        xs = sorted(xs + [x])
+
+    for x in new_xs:
+        support = _support_template(scene, y)
+        support["id"] = _next_id(supports, "support")
+        support["position"] = [x, y, z]
+        supports.append(support)
+
+    if not new_xs:
+        return None
+    where = ", ".join(f"x={_fmt(x)}m" for x in new_xs)
+    noun = "support" if len(new_xs) == 1 else "supports"
+    return f"Added {len(new_xs)} {noun} at {where}"
+
+
+def _apply_remove_support(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    supports = simulation["scene"]["supports"]
+    if not supports:
+        return None
+    count = len(supports) if intent.position == "all" else min(len(supports), max(1, int(intent.delta or 1)))
+    ordered = sorted(supports, key=lambda s: vec3(s.get("position"))[0])
+    bounds = centreline_bounds(simulation["scene"])
+    located = _location_x(bounds, intent) if bounds is not None else None
+    if located is not None:
+        # The supports nearest the named place
+        candidates = sorted(ordered, key=lambda s: abs(vec3(s.get("position"))[0] - located))
+    elif intent.position == "middle" or len(ordered) > 2:
+        # Interior supports go first so the ends stay anchored
+        centre = (vec3(ordered[0]["position"])[0] + vec3(ordered[-1]["position"])[0]) / 2
+        interior = ordered[1:-1] if len(ordered) > 2 else ordered
+        candidates = sorted(interior, key=lambda s: abs(vec3(s.get("position"))[0] - centre))
+        candidates += [s for s in ordered if s not in candidates]
+    else:
+        candidates = list(reversed(ordered))
+    removed = candidates[:count]
+    removed_ids = {id(s) for s in removed}
+    simulation["scene"]["supports"] = [s for s in supports if id(s) not in removed_ids]
+    noun = "support" if count == 1 else "supports"
+    return f"Removed {count} {noun} ({', '.join(str(s.get('id')) for s in removed)})"
+
+
+def _parse_force_label(label: Any) -> Optional[float]:
+    match = re.match(r"\s*(-?\d+(?:\.\d+)?)\s*(kn|mn|n)?\s*$", str(label or ""), re.IGNORECASE)
+    if not match:
+        return None
+    return float(match.group(1)) * FORCE_UNITS[(match.group(2) or "n").lower()]
+
+
+def _format_force(newtons: float) -> str:
+    if abs(newtons) >= 1e6:
+        return f"{_fmt(newtons / 1e6)}MN"
+    if abs(newtons) >= 1e4:
+        return f"{_fmt(newtons / 1e3)}kN"
+    return f"{int(round(newtons))}N"
+
+
+def _scale_member_forces(scene: Dict[str, Any], factor: float):
+    """Member forces and stress utilisation are linear in the applied load"""
+    for mesh in scene["meshes"]:
+        data = mesh.get("userData")
+        if not isinstance(data, dict):
+            continue
+        if isinstance(data.get("force"), (int, float)):
+            data["force"] = round(data["force"] * factor, 2)
+        if isinstance(data.get("stress_level"), (int, float)):
+            data["stress_level"] = round(min(1.0, data["stress_level"] * factor), 3)
+
+
+def _apply_load_change(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    scene = simulation["scene"]
+    arrows = scene["force_arrows"]
+    if not arrows:
+        return None
+
+    before_total = 0.0
+    after_total = 0.0
+    for arrow in arrows:
+        magnitude = _parse_force_label(arrow.get("label"))
+        if magnitude is None:
+            return None
+        if intent.target is not None:
+            new_magnitude = intent.target
+        elif intent.delta is not None:
+            new_magnitude = max(0.0, magnitude + intent.delta)
+        else:
+            new_magnitude = magnitude * intent.factor
+        if magnitude <= 0 or new_magnitude <= 0:
+            return None
+        factor = new_magnitude / magnitude
+
+        # Keep the arrow tip on the loaded point; the arrow grows with sqrt(load) to stay readable
+        tip = arrow_tip(arrow)
+        direction = normalize(vec3(arrow.get("direction"), 0.0))
+        length = min(10.0, max(0.5, float(arrow.get("length", 1.0)) * math.sqrt(factor)))
+        arrow["length"] = round(length, 3)
+        arrow["origin"] = [tip[i] - direction[i] * length for i in range(3)]
+        if "label_position" in arrow:
+            arrow["label_position"] = [tip[i] - direction[i] * (length + 0.3) for i in range(3)]
+        arrow["label"] = _format_force(new_magnitude)
+
+        before_total += magnitude
+        after_total += new_magnitude
+
+    _scale_member_forces(scene, after_total / before_total)
+    return f"Changed the load from {_format_force(before_total)} to {_format_force(after_total)}"
+
+
+def _apply_load_direction(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    arrows = simulation["scene"]["force_arrows"]
+    if not arrows:
+        return None
+    direction = normalize(intent.direction)
+    for arrow in arrows:
+        tip = arrow_tip(arrow)
+        length = float(arrow.get("length", 1.0))
+        arrow["direction"] = list(direction)
+        arrow["origin"] = [tip[i] - direction[i] * length for i in range(3)]
+        if "label_position" in arrow:
+            arrow["label_position"] = [tip[i] - direction[i] * (length + 0.3) for i in range(3)]
+    names = {(1.0, 0.0, 0.0): "to the right", (-1.0, 0.0, 0.0): "to the left",
+             (0.0, 1.0, 0.0): "upward", (0.0, -1.0, 0.0): "downward"}
+    return f"Pointed the load {names.get(tuple(direction), 'in the new direction')}"
+
+
+def _apply_material(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    scene = simulation["scene"]
+    if not scene["meshes"]:
+        return None
+    if intent.member is not None and not _is_whole_scene(scene, intent.member):
+        # "make the cables steel": only some meshes change, which the rules can't pick out reliably
+        return None
+    new = MATERIALS[intent.material]
+    previous = None
+    for mesh in scene["meshes"]:
+        material = mesh.setdefault("material", {"type": "MeshStandardMaterial"})
+        material.update({"color": new["color"], "metalness": new["metalness"], "roughness": new["roughness"]})
+        data = mesh.get("userData")
+        if not isinstance(data, dict):
+            continue
+        old_name = str(data.get("material", "steel")).lower()
+        old_name = MATERIAL_ALIASES.get(old_name, old_name)
+        previous = previous or old_name
+        data["material"] = intent.material
+        if isinstance(data.get("info"), str) and old_name in data["info"].lower():
+            data["info"] = re.sub(old_name, intent.material, data["info"], flags=re.IGNORECASE)
+        # Same stress, different strength: utilisation scales with the yield ratio
+        old = MATERIALS.get(old_name)
+        if old and isinstance(data.get("stress_level"), (int, float)):
+            data["stress_level"] = round(min(1.0, data["stress_level"] * old["yield_mpa"] / new["yield_mpa"]), 3)
+
+    stress_colors = simulation.get("stress_colors")
+    if isinstance(stress_colors, dict):
+        stress_colors["max_stress"] = new["yield_mpa"]
+    if previous and previous != intent.material:
+        return f"Changed the material from {previous} to {intent.material}"
+    return f"Changed the material to {intent.material}"
+
+
+def _is_vertical(mesh: Dict[str, Any]) -> bool:
+    start, end, _ = member_segment(mesh)
+    return abs(end[1] - start[1]) > 4 * abs(end[0] - start[0])
+
+
+def _is_diagonal(mesh: Dict[str, Any]) -> bool:
+    start, end, _ = member_segment(mesh)
+    dx, dy = abs(end[0] - start[0]), abs(end[1] - start[1])
+    return dx > 1e-6 and dy > 1e-6 and not _is_vertical(mesh) and dy > 0.2 * dx
+
+
+def _element_type(mesh: Dict[str, Any]) -> str:
+    data = mesh.get("userData")
+    return str(data.get("element_type", "")).lower() if isinstance(data, dict) else ""
+
+
+def _apply_panels(simulation: Dict[str, Any], intent: EditIntent) -> Optional[str]:
+    scene = simulation["scene"]
+    meshes = scene["meshes"]
+    verticals = [m for m in meshes if _element_type(m) == "vertical" or (not _element_type(m) and _is_vertical(m))]
+    if len(verticals) < 2:
+        return None
+    diagonals = [m for m in meshes if _element_type(m) == "diagonal" or (not _element_type(m) and _is_diagonal(m))]
+
+    current = len(verticals) - 1
+    if intent.target is not None:
+        panels = int(intent.target)
+    else:
+        panels = current + int(intent.delta or 0)
+    if panels < 1 or panels > 200 or panels == current:
+        return None
+
+    xs = sorted(member_segment(v)[0][0] for v in verticals)
+    left, right = xs[0], xs[-1]
+    template = verticals[0]
+    start, end, _ = member_segment(template)
+    bottom, top = min(start[1], end[1]), max(start[1], end[1])
+    z = start[2]
+    diagonal_template = diagonals[0] if diagonals else None
+
+    replaced = {id(m) for m in verticals + diagonals}
+    kept = [m for m in meshes if id(m) not in replaced]
+    panel_width = (right - left) / panels
+
+    new_members = []
+    for i in range(panels + 1):
+        x = left + i * panel_width
+        vertical = copy.deepcopy(template)
+        vertical["id"] = f"vertical_{i + 1}"
+        set_member_segment(vertical, (x, bottom, z), (x, top, z))
+        new_members.append(vertical)
+    if diagonal_template is not None:
+        for i in range(panels):
+            x0, x1 = left + i * panel_width, left + (i + 1) * panel_width
+            diagonal = copy.deepcopy(diagonal_template)
+            diagonal["id"] = f"diagonal_{i + 1}"
+            # Pratt pattern: diagonals slope down towards midspan
+            if x0 + panel_width / 2 < (left + right) / 2:
+                set_member_segment(diagonal, (x0, top, z), (x1, bottom, z))
+            else:
+                set_member_segment(diagonal, (x0, bottom, z), (x1, top, z))
+            new_members.append(diagonal)
+
+    scene["meshes"] = kept + new_members
+    return f"Changed the truss from {current} to {panels} panels"
+
+
+_APPLY = {
+    "scale": _apply_scale,
+    "add_support": _apply_add_support,
+    "remove_support": _apply_remove_support,
+    "scale_load": _apply_load_change,
+    "set_load": _apply_load_change,
+    "load_direction": _apply_load_direction,
+    "material": _apply_material,
+    "panels": _apply_panels,
+}
@@ -0,0 +1,209 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..config import settings
+from ..database.models import SessionRecord, MessageRecord, SimulationRecord
+from ..database.session import create_engine, create_session_factory
+
+INSERT_IGNORE = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+class HistoryStore:
+    """Durable tier behind the Redis/in-memory session cache.
+
+    Writes are buffered and flushed in batches (write-behind); repeated updates
+    to the same session between flushes collapse into one write. Reads are only
+    made on a cache miss, by SessionManager.
+    """
+
+    def __init__(self):
+        # Enabled once start() has connected; until then writes are dropped
+        self.enabled = False
+        self.flush_interval = settings.history_flush_interval
+        self.batch_size = settings.history_batch_size
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._flush_requested = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._engine = None
+        self._session_factory = None
+
+    async def start(self):
+        """Connect and start the background flusher"""
+        if not settings.history_enabled:
+            return
+        try:
+            self._engine = create_engine()
+            async with self._engine.connect() as conn:
+                tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+            if not {"sessions", "messages", "simulations"} <= set(tables):
+                raise RuntimeError("history tables missing, run `alembic upgrade head`")
+            self._session_factory = create_session_factory(self._engine)
+            self._flusher = asyncio.create_task(self._run())
+            self.enabled = True
+        except Exception as e:
+            print(f"History store disabled: {e}")
+
+    async def stop(self):
+        """Flush whatever is pending and close the engine"""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self.enabled:
+            await self.flush()
+            self.enabled = False
+        if self._engine:
+            await self._engine.dispose()
+
+    def enqueue_session(self, session_data: Dict[str, Any]):
+        # Snapshot: callers such as LiveSession keep mutating the session dict until the flush
+        if self.enabled:
+            self._enqueue(("session", session_data["session_id"]), _snapshot(session_data))
+
+    def enqueue_simulation(self, simulation_id: str, simulation_data: Dict[str, Any]):
+        # Snapshot as plain JSON (metadata may hold datetimes) before the caller mutates it
+        if self.enabled:
+            self._enqueue(("simulation", simulation_id), _snapshot(simulation_data))
+
+    def _enqueue(self, key: Tuple[str, str], data: Dict[str, Any]):
+        if not self.enabled:
+            return
+        self._pending[key] = data
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write all pending sessions and simulations in one transaction"""
+        if not self._pending or not self._session_factory:
+            return
+
+        batch, self._pending = self._pending, {}
+        try:
+            async with self._session_factory() as db:
+                async with db.begin():
+                    for (kind, _), data in batch.items():
+                        if kind == "session":
+                            await self._write_session(db, data)
+                        else:
+                            await self._write_simulation(db, data)
+        except asyncio.CancelledError:
+            self._requeue(batch)
+            raise
+        except Exception as e:
+            print(f"History flush failed ({len(batch)} items): {e}")
+            self._requeue(batch)
+
+    def _requeue(self, batch: Dict[Tuple[str, str], Dict[str, Any]]):
+        # Newer updates that arrived during the failed flush take precedence
+        for key, data in batch.items():
+            self._pending.setdefault(key, data)
+
+    async def _write_session(self, db, session_data: Dict[str, Any]):
+        session_id = session_data["session_id"]
+        await db.merge(SessionRecord(
+            session_id=session_id,
+            created_at=_parse_time(session_data["created_at"]),
+            last_activity=_parse_time(session_data["last_activity"]),
+            message_count=session_data.get("message_count", 0),
+            current_simulation_id=session_data.get("current_simulation_id")
+        ))
+        # The cached session only holds the most recent messages and most of them
+        # are already stored, so insert them in one statement and skip existing ids
+        rows = [
+            {
+                "id": message["id"],
+                "session_id": session_id,
+                "type": message["type"],
+                "content": message["content"],
+                "timestamp": _parse_time(message["timestamp"]),
+                "simulation_id": message.get("simulation_id")
+            }
+            for message in session_data.get("messages", [])
+        ]
+        if not rows:
+            return
+        insert = INSERT_IGNORE.get(db.bind.dialect.name)
+        if insert is not None:
+            await db.execute(insert(MessageRecord).values(rows).on_conflict_do_nothing(index_elements=["id"]))
+        else:
+            for row in rows:
+                await db.merge(MessageRecord(**row))
+
+    async def _write_simulation(self, db, simulation_data: Dict[str, Any]):
+        await db.merge(SimulationRecord(
+            simulation_id=simulation_data["simulation_id"],
+            session_id=simulation_data.get("session_id"),
+            created_at=datetime.now(),
+            data=simulation_data
+        ))
+
+    async def load_session(self, session_id: str, max_messages: int) -> Optional[Dict[str, Any]]:
+        """Rebuild cached session data from the database"""
+        if not self.enabled:
+            return None
+        pending = self._pending.get(("session", session_id))
+        if pending:
+            return pending
+
+        async with self._session_factory() as db:
+            record = await db.get(SessionRecord, session_id)
+            if not record:
+                return None
+            result = await db.execute(
+                select(MessageRecord)
+                .where(MessageRecord.session_id == session_id)
+                .order_by(MessageRecord.timestamp.desc())
+                .limit(max_messages)
+            )
+            messages = list(reversed(result.scalars().all()))
+
+        return {
+            "session_id": record.session_id,
+            "created_at": record.created_at.isoformat(),
+            "last_activity": record.last_activity.isoformat(),
+            "message_count": record.message_count,
+            "current_simulation_id": record.current_simulation_id,
+            "messages": [
+                {
+                    "id": m.id,
+                    "type": m.type,
+                    "content": m.content,
+                    "timestamp": m.timestamp.isoformat(),
+                    "simulation_id": m.simulation_id
+                }
+                for m in messages
+            ]
+        }
+
+    async def load_simulation(self, simulation_id: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        pending = self._pending.get(("simulation", simulation_id))
+        if pending:
+            return pending
+
+        async with self._session_factory() as db:
+            record = await db.get(SimulationRecord, simulation_id)
+            return record.data if record else None
+
+def _parse_time(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+def _snapshot(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep copy as plain JSON, taken at enqueue time"""
+    return json.loads(json.dumps(data, default=str))
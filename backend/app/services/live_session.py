@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+from ..config import settings
+from ..models.chat_models import ChatMessage, ChatRequest
+from ..utils.json_stream import JsonArrayScanner
+from .chat_service import ChatService
+from .session_broadcaster import SessionBroadcaster
+from .session_manager import SessionManager
+
+GEOMETRY_KEYS = ("meshes", "supports", "force_arrows")
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class LiveSession:
+    """Session state held in memory for the life of one WebSocket connection.
+
+    History and the current simulation are read once on connect. Each turn
+    updates them in memory and replies immediately; the session store is
+    written in the background, a batch every ws_flush_interval seconds. A
+    flush appends this connection's turns to the stored session rather than
+    overwriting it, so turns made elsewhere (HTTP chat) are kept. Updates are
+    published so other connections on the session stay in sync.
+    """
+
+    def __init__(self, session_id: str, session_manager: SessionManager,
+                 chat_service: ChatService, broadcaster: SessionBroadcaster):
+        self.session_id = session_id
+        self.connection_id = str(uuid.uuid4())
+        self.session_manager = session_manager
+        self.chat_service = chat_service
+        self.broadcaster = broadcaster
+        self.history: List[ChatMessage] = []
+        self.simulation: Optional[Dict[str, Any]] = None
+        self.events: Optional[asyncio.Queue] = None
+        self._pending_simulations: Dict[str, Dict[str, Any]] = {}
+        # (user message, assistant message, simulation id) per unsaved turn of this connection
+        self._pending_turns: List[Tuple[ChatMessage, ChatMessage, str]] = []
+        self._flush_requested = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def open(self) -> bool:
+        """Load the session; False when it doesn't exist"""
+        session_data = await self.session_manager.get_session(self.session_id)
+        if not session_data:
+            return False
+        self.history = self.session_manager.chat_messages(session_data)
+        simulation_id = session_data.get("current_simulation_id")
+        if simulation_id:
+            self.simulation = await self.session_manager.get_simulation(simulation_id)
+        self.events = await self.broadcaster.subscribe(self.session_id)
+        self._flusher = asyncio.create_task(self._run())
+        return True
+
+    async def close(self):
+        """Stop listening and write whatever is still pending"""
+        if self.events is not None:
+            await self.broadcaster.unsubscribe(self.session_id, self.events)
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "session",
+            "session_id": self.session_id,
+            "messages": [message.model_dump(mode="json") for message in self.history],
+            "simulation": self.simulation
+        }
+
+    async def chat(self, message: str, send: Send):
+        """Run one chat turn, streaming text deltas and finished geometry to send"""
+        request = ChatRequest(session_id=self.session_id, message=message)
+        scanner = JsonArrayScanner(GEOMETRY_KEYS)
+
+        async def on_delta(text: str):
+            await send({"type": "delta", "text": text})
+            for key, item in scanner.feed(text):
+                await send({"type": "geometry", "key": key, "item": item})
+
+        update = await self.chat_service.precomputed_update(request, self.simulation)
+        if update is None:
+            update = await self.chat_service.generate_update(request, self.history, self.simulation, on_delta=on_delta)
+        user_message = self.chat_service.user_message(request)
+        assistant_message = self.chat_service.assistant_message(update)
+        self._apply(user_message, assistant_message, update)
+        self.chat_service.speculate(self.session_id, self.simulation, self.history)
+
+        # Persist in the background; the reply doesn't wait for the store
+        self._pending_simulations[update["simulation_id"]] = self.chat_service.simulation_data(update)
+        self._pending_turns.append((user_message, assistant_message, update["simulation_id"]))
+        self._flush_requested.set()
+
+        event = {
+            "type": "update",
+            "origin": self.connection_id,
+            "user_message": user_message.model_dump(mode="json"),
+            "assistant_message": assistant_message.model_dump(mode="json"),
+            "update": update
+        }
+        await send(event)
+        await self.broadcaster.publish(self.session_id, event)
+
+    def apply_remote(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply an update made on another connection; None for this connection's own"""
+        if event.get("origin") == self.connection_id or event.get("type") != "update":
+            return None
+        self._apply(
+            ChatMessage(**event["user_message"]),
+            ChatMessage(**event["assistant_message"]),
+            event["update"]
+        )
+        return event
+
+    def _apply(self, user_message: ChatMessage, assistant_message: ChatMessage, update: Dict[str, Any]):
+        self.history.extend((user_message, assistant_message))
+        self.history = self.session_manager.trim_history(self.history)
+        self.simulation = self.chat_service.simulation_data(update)
+
+    async def _run(self):
+        while True:
+            await self._flush_requested.wait()
+            # Let writes from quick successive turns collapse into one
+            await asyncio.sleep(settings.ws_flush_interval)
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write pending simulations, then add the pending turns to the stored session"""
+        pending, self._pending_simulations = self._pending_simulations, {}
+        for simulation_id, simulation_data in pending.items():
+            await self.session_manager.store_simulation(simulation_id, simulation_data)
+        turns, self._pending_turns = self._pending_turns, []
+        if not turns:
+            return
+
+        def add_turns(session_data: Dict[str, Any]):
+            for user_message, assistant_message, simulation_id in turns:
+                self.session_manager.append_message(session_data, user_message)
+                self.session_manager.append_message(session_data, assistant_message)
+                session_data["current_simulation_id"] = simulation_id
+
+        await self.session_manager.update_session(self.session_id, add_turns)
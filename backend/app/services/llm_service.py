@@ -1,81 +1,119 @@
+import copy
 import json
+import time
 import uuid
-import google.generativeai as genai
 from datetime import datetime
 from typing import Dict, Any, Optional
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
 from ..config import settings
 from ..models.request_models import SimulationRequest, LLMProvider
+from ..utils.request_trace import stage
+from .prompt_builder import get_simulation_prefix, build_seed_context
+from .providers import get_provider, close_providers
+from .stub_provider import StubProviderError
+from .session_manager import SessionManager
+from .similarity_index import SimilarityIndex, similarity_scope
+from .scene_validator import validate_simulation
+from .spatial_index import SceneIndexCache
 
-class LLMService:
-    def __init__(self):
-        self.openai_client: Optional[AsyncOpenAI] = None
-        if settings.openai_api_key:
-            self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+SIMILARITY_MODEL = "similarity-cache"
+MAX_SIMILAR_CHECKS = 5  # Candidates whose stored simulation is looked up before giving up
 
-        self.anthropic_client: Optional[AsyncAnthropic] = None
-        if settings.anthropic_api_key:
-            self.anthropic_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
+class LLMService:
+    def __init__(self, session_manager: Optional[SessionManager] = None,
+                 similarity_index: Optional[SimilarityIndex] = None,
+                 scene_indexes: Optional[SceneIndexCache] = None):
+        # Both are needed to reuse scenes from similar past prompts
+        self.session_manager = session_manager
+        self.similarity_index = similarity_index
+        self.scene_indexes = scene_indexes
 
-        self.gemini_client: Optional[genai.GenerativeModel] = None
-        if settings.gemini_api_key:
-            genai.configure(api_key=settings.gemini_api_key)
-            self.gemini_client = genai.GenerativeModel('gemini-pro')
+    async def close(self):
+        """Close provider HTTP clients"""
+        await close_providers()
 
     async def generate_simulation(self, request: SimulationRequest) -> Dict[str, Any]:
         """Generate Three.js simulation JSON from natural language"""
 
-        system_prompt = self._get_system_prompt(request.complexity)
+        start_time = time.perf_counter()
+        similar, stored = await self._find_similar(request)
+        if (similar and similar.score >= settings.similarity_reuse_threshold
+                and similar.same_numbers and similar.same_order):
+            # Near-duplicate of an earlier prompt: serve its scene without calling the LLM
+            simulation_data = self._add_metadata(self._copy_simulation(stored), request, SIMILARITY_MODEL)
+            simulation_data["metadata"].update({
+                "processing_time": round(time.perf_counter() - start_time, 3),
+                "confidence": round(similar.score, 3)
+            })
+            return simulation_data
+
+        system_prompt = self._get_system_prompt(request.complexity.value)
         user_prompt = self._build_user_prompt(request)
+        if stored:
+            # Close but not close enough: start the model from the earlier scene
+            user_prompt += build_seed_context(similar.prompt, stored["scene"])
+        provider = LLMProvider.STUB if settings.llm_stub_enabled else request.provider
+        adapter = get_provider(provider)
+        
+        if adapter is None:
+            # Fallback if the specified provider is not available or configured
+            return self._get_fallback_simulation(request)
         
         try:
-            if request.provider == LLMProvider.OPENAI and self.openai_client:
-                return await self._generate_with_openai(system_prompt, user_prompt, request)
-            elif request.provider == LLMProvider.ANTHROPIC and self.anthropic_client:
-                # Placeholder for Anthropic implementation
-                raise NotImplementedError("Anthropic provider is not yet implemented.")
-            elif request.provider == LLMProvider.GEMINI and self.gemini_client:
-                return await self._generate_with_gemini(system_prompt, user_prompt, request)
-            else:
-                # Fallback if the specified provider is not available or configured
-                return self._get_fallback_simulation(request)
+            with stage("llm"):
+                json_content, token_usage = await adapter.generate(system_prompt, user_prompt)
+            simulation_data = json.loads(self._strip_code_fence(json_content))
+            simulation_data = self._add_metadata(simulation_data, request, adapter.model, token_usage)
+            if settings.validation_enabled:
+                await validate_simulation(simulation_data, settings.validation_repair, self.scene_indexes)
+            if self.similarity_index is not None and settings.similarity_enabled:
+                self.similarity_index.add(request.prompt, self._similarity_scope(request), simulation_data["simulation_id"])
+            return simulation_data
                 
+        except StubProviderError:
+            # Injected failures (LLM_STUB_ERROR_RATE) reach the client, so load tests count them
+            raise
         except Exception as e:
-            print(f"LLM generation error with {request.provider}: {e}")
+            print(f"LLM generation error with {provider}: {e}")
             # Fallback to template
             return self._get_fallback_simulation(request)
 
-    async def _generate_with_openai(self, system_prompt: str, user_prompt: str, request: SimulationRequest) -> Dict[str, Any]:
-        """Generate simulation using OpenAI"""
-        response = await self.openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
-        json_content = response.choices[0].message.content
-        simulation_data = json.loads(json_content)
-        return self._add_metadata(simulation_data, request, "gpt-4-turbo-preview")
+    async def _find_similar(self, request: SimulationRequest) -> tuple:
+        """Most similar earlier prompt and its stored simulation, when still available"""
+        if not settings.similarity_enabled or self.similarity_index is None or self.session_manager is None:
+            return None, None
+        candidates = self.similarity_index.candidates(request.prompt, self._similarity_scope(request))
+        for similar in candidates[:MAX_SIMILAR_CHECKS]:
+            if similar.score < settings.similarity_seed_threshold:
+                break
+            simulation = await self.session_manager.get_simulation(similar.simulation_id)
+            if simulation and "scene" in simulation:
+                return similar, simulation
+            # Its simulation has expired: forget it and try the next best
+            self.similarity_index.discard(similar)
+        return None, None
 
-    async def _generate_with_gemini(self, system_prompt: str, user_prompt: str, request: SimulationRequest) -> Dict[str, Any]:
-        """Generate simulation using Gemini"""
-        full_prompt = f"{system_prompt}\n\n{user_prompt}"
-        response = await self.gemini_client.generate_content_async(full_prompt)
-        
-        # Clean up Gemini's response format if necessary
-        json_content = response.text.strip()
-        if json_content.startswith("```json"):
-            json_content = json_content[7:-4].strip()
-        
-        simulation_data = json.loads(json_content)
-        return self._add_metadata(simulation_data, request, "gemini-pro")
+    def _similarity_scope(self, request: SimulationRequest) -> str:
+        return similarity_scope(request.complexity.value, request.structure_type, request.preferences)
 
-    def _add_metadata(self, simulation_data: Dict[str, Any], request: SimulationRequest, model_name: str) -> Dict[str, Any]:
+    def _copy_simulation(self, simulation: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a stored simulation without its ids, session or metadata"""
+        return {
+            key: copy.deepcopy(value) for key, value in simulation.items()
+            if key not in ("simulation_id", "session_id", "description", "metadata")
+        }
+
+    def _strip_code_fence(self, content: str) -> str:
+        """Remove a ```json fence some models wrap around their output"""
+        content = content.strip()
+        if content.startswith("```"):
+            content = content.split("\n", 1)[1] if "\n" in content else ""
+            content = content.rsplit("```", 1)[0]
+        return content.strip()
+
+    def _add_metadata(self, simulation_data: Dict[str, Any], request: SimulationRequest, model_name: str,
+                      token_usage: Optional[Dict[str, Optional[int]]] = None) -> Dict[str, Any]:
         """Add metadata to the simulation data"""
+        token_usage = token_usage or {}
         simulation_data.update({
             "simulation_id": str(uuid.uuid4()),
             "description": request.prompt,
@@ -84,56 +122,16 @@ class LLMService:
                 "generated_at": datetime.now().isoformat(),
                 "processing_time": 2.5,  # Mock for now
                 "llm_model": model_name,
-                "confidence": 0.85
+                "confidence": 0.85,
+                "prompt_tokens": token_usage.get("prompt_tokens"),
+                "cached_tokens": token_usage.get("cached_tokens")
             }
         })
         return simulation_data
 
     def _get_system_prompt(self, complexity: str) -> str:
-        """Get system prompt based on complexity level"""
-        
-        prompts = {
-            "simple": """
-            You are a structural engineering assistant that converts natural language 
-            descriptions into Three.js-ready JSON for physics simulations.
-            
-            Generate JSON that includes:
-            - "scene" object with "meshes", "supports", "force_arrows"
-            - Each mesh has: id, type (BoxGeometry/CylinderGeometry), position, scale, material
-            - Force arrows have: origin, direction, length, color, label
-            - Stress colors mapping
-            - Camera position and lighting
-            
-            Focus on simple geometric shapes and clear educational visualization.
-            Return ONLY valid JSON, no explanations.
-            """,
-            
-            "medium": """
-            You are an advanced structural engineering assistant for complex simulations.
-            
-            Generate detailed Three.js JSON with:
-            - Multiple structural systems
-            - Realistic proportions and materials
-            - Multiple load cases
-            - Complex geometry arrangements
-            
-            Return ONLY valid JSON, no explanations.
-            """,
-            
-            "high": """
-            You are an expert structural engineering assistant for complex structures.
-            
-            Generate comprehensive Three.js JSON with:
-            - Multi-component systems (cables, towers, decks)
-            - Realistic structural behavior
-            - Multiple analysis types
-            - Advanced visualization features
-            
-            Return ONLY valid JSON, no explanations.
-            """
-        }
-        
-        return prompts.get(complexity, prompts["simple"])
+        """Get the cacheable system prompt prefix for a complexity level"""
+        return get_simulation_prefix(complexity)
     
     def _build_user_prompt(self, request: SimulationRequest) -> str:
         """Build user prompt with context"""
@@ -0,0 +1,207 @@
+import asyncio
+import math
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from ..models.request_models import DetailLevel
+from ..utils.scene_geometry import Vec3, member_segment, set_member_segment, user_data, user_number, EPSILON
+from ..utils.request_trace import stage, note_scene
+
+# Level-of-detail scenes for large structures. Members are treated as segments:
+#
+#   medium: chains of collinear members (same section and material, meeting
+#           end to end with nothing else attached) become one member, and
+#           members shorter than SMALL_MEMBER_FRACTION of the structure are dropped
+#   low:    the medium scene is clustered on a uniform grid; members in a cell
+#           running in the same direction become one proxy
+#
+# A proxy carries the highest stress and force of the members it replaces, and
+# the most stressed members are never merged, so stress extremes stay visible.
+
+SNAP_FRACTION = 1e-3  # Endpoint snapping tolerance, relative to the scene diagonal
+SMALL_MEMBER_FRACTION = 0.01
+LOW_GRID_CELLS = 10  # Cells along the scene diagonal for the low level
+PARALLEL_COS = 0.999
+HIGH_STRESS = 0.8
+MAX_KEPT_FRACTION = 0.02  # At most this share of members is exempt as high-stress
+CACHE_SIZE = 256
+THREAD_THRESHOLD = 500  # Members above which a level is built in a worker thread
+
+
+class _Member:
+    __slots__ = ("mesh", "start", "end", "radius", "direction", "length", "stress", "count")
+
+    def __init__(self, mesh: Dict[str, Any], count: int = 1, segment: Optional[Tuple[Vec3, Vec3, float]] = None):
+        self.mesh = mesh
+        self.start, self.end, self.radius = segment or member_segment(mesh)
+        delta = [self.end[i] - self.start[i] for i in range(3)]
+        self.length = math.sqrt(sum(d * d for d in delta))
+        self.direction = _canonical(tuple(d / self.length for d in delta)) if self.length > EPSILON else (1.0, 0.0, 0.0)
+        self.stress = user_number(mesh, "stress_level")
+        self.count = count
+
+    def signature(self) -> Tuple:
+        data = user_data(self.mesh)
+        return (self.mesh.get("type"), str(data.get("material")), str(data.get("element_type")))
+
+
+def _canonical(direction: Vec3) -> Vec3:
+    """Direction with its first significant component positive, so opposite segments compare equal"""
+    for component in direction:
+        if abs(component) > EPSILON:
+            return direction if component > 0 else tuple(-c for c in direction)
+    return direction
+
+
+def _dot(a: Vec3, b: Vec3) -> float:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+class LODBuilder:
+    """Builds simplified scenes, caching them per simulation and level"""
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+    async def scene_for(self, simulation: Dict[str, Any], level: DetailLevel) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Scene at a detail level plus {"level", "mesh_count", "full_mesh_count"}"""
+        scene = simulation.get("scene", {})
+        full_count = len(scene.get("meshes", []))
+        if level == DetailLevel.FULL:
+            return scene, {"level": level.value, "mesh_count": full_count, "full_mesh_count": full_count}
+
+        key = (simulation.get("simulation_id", ""), level.value)
+        lod_scene = self._cache.get(key) if key[0] else None
+        if lod_scene is None:
+            # Thousands of members take a few hundred ms; keep that off the event loop
+            if full_count > THREAD_THRESHOLD:
+                lod_scene = await asyncio.to_thread(build_lod, scene, level)
+            else:
+                lod_scene = build_lod(scene, level)
+            if key[0]:
+                self._cache[key] = lod_scene
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return lod_scene, {
+            "level": level.value,
+            "mesh_count": len(lod_scene.get("meshes", [])),
+            "full_mesh_count": full_count
+        }
+
+
+def build_lod(scene: Dict[str, Any], level: DetailLevel) -> Dict[str, Any]:
+    """Simplified copy of a scene; supports and force arrows are kept as they are"""
+    meshes = scene.get("meshes", [])
+    if level == DetailLevel.FULL or len(meshes) < 2:
+        return scene
+
+    members = [_Member(mesh) for mesh in meshes]
+    points = [p for m in members for p in (m.start, m.end)]
+    diagonal = max(math.sqrt(sum((max(p[i] for p in points) - min(p[i] for p in points)) ** 2 for i in range(3))), EPSILON)
+    kept = _stress_extremes(members)
+
+    members = _merge_collinear(members, kept, diagonal * SNAP_FRACTION)
+    members = [m for m in members if id(m) in kept or m.length >= diagonal * SMALL_MEMBER_FRACTION]
+    if level == DetailLevel.LOW:
+        members = _cluster(members, kept, diagonal / LOW_GRID_CELLS)
+
+    lod_scene = {key: value for key, value in scene.items() if key != "meshes"}
+    lod_scene["meshes"] = [m.mesh for m in members]
+    return lod_scene
+
+
+def _stress_extremes(members: List[_Member]) -> set:
+    """Members shown unmerged: the most stressed one and the top few above HIGH_STRESS"""
+    limit = max(1, int(len(members) * MAX_KEPT_FRACTION))
+    ranked = sorted(members, key=lambda m: m.stress, reverse=True)
+    kept = [m for m in ranked[:limit] if m.stress >= HIGH_STRESS] or ranked[:1]
+    return {id(m) for m in kept}
+
+
+def _merge_collinear(members: List[_Member], kept: set, tolerance: float) -> List[_Member]:
+    # Snap endpoints to a grid to find which members meet at each joint
+    joints: Dict[Tuple[int, int, int], List[int]] = {}
+    for index, member in enumerate(members):
+        for point in (member.start, member.end):
+            joints.setdefault(tuple(round(c / tolerance) for c in point), []).append(index)
+
+    parent = list(range(len(members)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for attached in joints.values():
+        # Only a plain splice (exactly two members, nothing else at the joint) is merged
+        if len(attached) != 2:
+            continue
+        a, b = members[attached[0]], members[attached[1]]
+        if id(a) in kept or id(b) in kept or a.signature() != b.signature():
+            continue
+        if abs(_dot(a.direction, b.direction)) < PARALLEL_COS:
+            continue
+        if abs(a.radius - b.radius) > 0.1 * max(a.radius, b.radius):
+            continue
+        parent[find(attached[0])] = find(attached[1])
+
+    groups: Dict[int, List[_Member]] = {}
+    for index, member in enumerate(members):
+        groups.setdefault(find(index), []).append(member)
+    return [group[0] if len(group) == 1 else _proxy(group, "chain") for group in groups.values()]
+
+
+def _cluster(members: List[_Member], kept: set, cell: float) -> List[_Member]:
+    groups: Dict[Tuple, List[_Member]] = {}
+    result = []
+    for member in members:
+        if id(member) in kept:
+            result.append(member)
+            continue
+        midpoint = tuple((member.start[i] + member.end[i]) / 2 for i in range(3))
+        key = (
+            tuple(math.floor(c / cell) for c in midpoint),
+            tuple(round(c * 4) for c in member.direction),
+            member.signature()
+        )
+        groups.setdefault(key, []).append(member)
+    for group in groups.values():
+        result.append(group[0] if len(group) == 1 else _proxy(group, "cluster"))
+    return result
+
+
+def _proxy(group: List[_Member], kind: str) -> _Member:
+    """One member spanning a group along its mean direction, with the group's worst stress"""
+    weights = [max(m.length, EPSILON) for m in group]
+    total = sum(weights)
+    direction = [sum(m.direction[i] * w for m, w in zip(group, weights)) for i in range(3)]
+    norm = math.sqrt(sum(d * d for d in direction)) or 1.0
+    direction = tuple(d / norm for d in direction)
+    centroid = tuple(
+        sum((m.start[i] + m.end[i]) / 2 * w for m, w in zip(group, weights)) / total for i in range(3)
+    )
+    offsets = [_dot(tuple(p[i] - centroid[i] for i in range(3)), direction) for m in group for p in (m.start, m.end)]
+    start = tuple(centroid[i] + direction[i] * min(offsets) for i in range(3))
+    end = tuple(centroid[i] + direction[i] * max(offsets) for i in range(3))
+
+    worst = max(group, key=lambda m: m.stress)
+    count = sum(m.count for m in group)
+    # set_member_segment replaces position, scale and rotation, so only userData needs copying
+    mesh = {**worst.mesh, "id": f"lod_{kind}_{worst.mesh.get('id', '')}"}
+    set_member_segment(mesh, start, end)
+    data = mesh["userData"] = dict(user_data(mesh))
+    data["force"] = max((user_number(m.mesh, "force") for m in group), key=abs)
+    data["member_count"] = count
+    data["info"] = f"{count} {data.get('element_type', 'member')}s merged for a simplified view"
+    return _Member(mesh, count=count, segment=(start, end, worst.radius))
+
+
+async def apply_level(response: Dict[str, Any], builder: LODBuilder, level: Optional[DetailLevel]) -> Dict[str, Any]:
+    """Copy of an API response with its scene at the requested level and an "lod" summary"""
+    note_scene(response.get("scene"))
+    with stage("lod"):
+        scene, lod = await builder.scene_for(response, level or DetailLevel.FULL)
+    return {**response, "scene": scene, "lod": lod}
@@ -0,0 +1,375 @@
+import json
+import textwrap
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+# Prompts are assembled as a stable prefix (system prompt, schema, few-shot
+# example) followed by the variable suffix (history, scene, user message).
+# Providers cache on exact prefix matches, so everything in the prefix must be
+# byte-for-byte identical between calls.
+#
+# Providers only cache prefixes of at least 1024 tokens (Anthropic on Sonnet,
+# OpenAI on gpt-4o and later), so the prefix carries modelling guidelines and
+# two worked examples; a shorter prefix is never cached. Prompt
+# text is dedented so indentation isn't paid for as tokens.
+
+MIN_CACHEABLE_TOKENS = 1024
+HISTORY_WINDOW = 10  # Most recent chat messages always sent
+HISTORY_BLOCK = 10  # Older messages are dropped this many at a time so the sent history stays put
+
+
+def _prompt(text: str) -> str:
+    return textwrap.dedent(text).strip()
+
+
+SIMULATION_SYSTEM_PROMPTS = {key: _prompt(text) for key, text in {
+    "simple": """
+    You are a structural engineering assistant that converts natural language
+    descriptions into Three.js-ready JSON for physics simulations.
+
+    Generate JSON that includes:
+    - "scene" object with "meshes", "supports", "force_arrows"
+    - Each mesh has: id, type (BoxGeometry/CylinderGeometry), position, scale, material
+    - Force arrows have: origin, direction, length, color, label
+    - Stress colors mapping
+    - Camera position and lighting
+
+    Focus on simple geometric shapes and clear educational visualization.
+    Return ONLY valid JSON, no explanations.
+    """,
+
+    "medium": """
+    You are an advanced structural engineering assistant for complex simulations.
+
+    Generate detailed Three.js JSON with:
+    - Multiple structural systems
+    - Realistic proportions and materials
+    - Multiple load cases
+    - Complex geometry arrangements
+
+    Return ONLY valid JSON, no explanations.
+    """,
+
+    "high": """
+    You are an expert structural engineering assistant for complex structures.
+
+    Generate comprehensive Three.js JSON with:
+    - Multi-component systems (cables, towers, decks)
+    - Realistic structural behavior
+    - Multiple analysis types
+    - Advanced visualization features
+
+    Return ONLY valid JSON, no explanations.
+    """
+}.items()}
+
+CHAT_SYSTEM_PROMPT = _prompt("""
+    You are a structural engineering assistant helping users iterate on physics simulations.
+
+    Context:
+    - User has an existing simulation they want to modify
+    - Generate updated Three.js JSON based on their request
+    - Explain what changes you made
+    - List specific modifications in a "changes_made" array
+
+    Return format:
+    {
+        "explanation": "I've made the following changes to your simulation...",
+        "changes_made": ["Increased bridge length from 5m to 8m", "Added 2 additional supports"],
+        "simulation": {
+            "scene": {
+                "meshes": [...],
+                "supports": [...],
+                "force_arrows": [...]
+            },
+            "stress_colors": {...},
+            "camera": {...},
+            "lighting": {...}
+        }
+    }
+    """)
+
+SCENE_SCHEMA = _prompt("""
+    Scene JSON schema:
+    - scene.meshes[]: {id, type: "BoxGeometry" | "CylinderGeometry", position: [x, y, z],
+      scale: [length, width, height], rotation: [rx, ry, rz],
+      material: {type: "MeshStandardMaterial", color, metalness, roughness},
+      userData: {element_type, stress_level (0-1), force (N), material, info}}
+    - scene.supports[]: {id, type: "ConeGeometry", position, scale, material}
+    - scene.force_arrows[]: {id, origin, direction (unit vector), length, color, label, label_position}
+    - stress_colors: {low, medium, high, max_stress (MPa)}
+    - camera: {position, look_at}
+    - lighting: {ambient: {color, intensity}, directional: {color, intensity, position}}
+    Units are metres and newtons. The y axis points up.
+    """)
+
+MODELLING_GUIDELINES = _prompt("""
+    Modelling guidelines:
+    - Centre the structure on the origin. Beams and decks run along x, columns and towers along y.
+    - A member's scale is its size along x, y and z before rotation, so a column is tall in y.
+      CylinderGeometry members (cables, round columns) have their length along y.
+    - Members that connect must share end points: a member at position p with length L along x
+      ends at p.x - L/2 and p.x + L/2. Rotate diagonal members about z so their ends meet the nodes.
+    - Every mesh id is unique and describes the member ("deck", "column_left", "diagonal_3").
+    - Put supports directly below the ends of the members they carry, with the cone's tip touching
+      the member. Pinned and roller supports are both drawn as ConeGeometry.
+    - Force arrows point along the load: gravity loads use direction [0, -1, 0], wind loads point
+      along +x or -x. The arrow's origin sits above the loaded point and its tip touches it;
+      label_position is just beyond the origin.
+    - stress_level is the member's utilisation (0 unloaded, 1 at max_stress). Colour members from
+      stress_colors: low below 0.4, medium up to 0.7, high above.
+    - force is the member's axial force or peak bending force in newtons; positive is tension.
+    - Steel uses metalness 0.8 and roughness 0.2, concrete metalness 0 and roughness 0.9,
+      timber metalness 0 and roughness 0.7.
+    - Place the camera far enough away to see the whole structure, looking at its centre.
+    """)
+
+BEAM_EXAMPLE: Dict[str, Any] = {
+    "scene": {
+        "meshes": [
+            {
+                "id": "beam_1",
+                "type": "BoxGeometry",
+                "position": [0, 0, 0],
+                "scale": [5, 0.2, 0.2],
+                "rotation": [0, 0, 0],
+                "material": {
+                    "type": "MeshStandardMaterial",
+                    "color": "#8C92AC",
+                    "metalness": 0.8,
+                    "roughness": 0.2
+                },
+                "userData": {
+                    "element_type": "beam",
+                    "stress_level": 0.4,
+                    "force": 1000,
+                    "material": "steel",
+                    "info": "Simple steel beam under load"
+                }
+            }
+        ],
+        "supports": [
+            {
+                "id": "support_1",
+                "type": "ConeGeometry",
+                "position": [-2.5, -0.3, 0],
+                "scale": [0.2, 0.3, 0.2],
+                "material": {"type": "MeshStandardMaterial", "color": "#444444"}
+            },
+            {
+                "id": "support_2",
+                "type": "ConeGeometry",
+                "position": [2.5, -0.3, 0],
+                "scale": [0.2, 0.3, 0.2],
+                "material": {"type": "MeshStandardMaterial", "color": "#444444"}
+            }
+        ],
+        "force_arrows": [
+            {
+                "id": "force_1",
+                "origin": [0, 2, 0],
+                "direction": [0, -1, 0],
+                "length": 2,
+                "color": "#FF4444",
+                "label": "1000N",
+                "label_position": [0, 2.3, 0]
+            }
+        ]
+    },
+    "stress_colors": {"low": "#00FF00", "medium": "#FFAA00", "high": "#FF0000", "max_stress": 250},
+    "camera": {"position": [10, 5, 10], "look_at": [0, 0, 0]},
+    "lighting": {
+        "ambient": {"color": "#404040", "intensity": 0.4},
+        "directional": {"color": "#ffffff", "intensity": 0.8, "position": [10, 10, 5]}
+    }
+}
+
+TRUSS_EXAMPLE: Dict[str, Any] = {
+    "scene": {
+        "meshes": [
+            {
+                "id": "bottom_chord",
+                "type": "BoxGeometry",
+                "position": [0, 0, 0],
+                "scale": [8, 0.15, 0.15],
+                "rotation": [0, 0, 0],
+                "material": {"type": "MeshStandardMaterial", "color": "#FFAA00", "metalness": 0.8, "roughness": 0.2},
+                "userData": {"element_type": "chord", "stress_level": 0.55, "force": 8000, "material": "steel",
+                             "info": "Bottom chord in tension"}
+            },
+            {
+                "id": "top_chord",
+                "type": "BoxGeometry",
+                "position": [0, 2, 0],
+                "scale": [4, 0.15, 0.15],
+                "rotation": [0, 0, 0],
+                "material": {"type": "MeshStandardMaterial", "color": "#FF0000", "metalness": 0.8, "roughness": 0.2},
+                "userData": {"element_type": "chord", "stress_level": 0.75, "force": -10000, "material": "steel",
+                             "info": "Top chord in compression"}
+            },
+            {
+                "id": "diagonal_left",
+                "type": "BoxGeometry",
+                "position": [-3, 1, 0],
+                "scale": [2.83, 0.12, 0.12],
+                "rotation": [0, 0, 0.785],
+                "material": {"type": "MeshStandardMaterial", "color": "#FFAA00", "metalness": 0.8, "roughness": 0.2},
+                "userData": {"element_type": "diagonal", "stress_level": 0.5, "force": -7070, "material": "steel",
+                             "info": "End diagonal in compression"}
+            },
+            {
+                "id": "diagonal_right",
+                "type": "BoxGeometry",
+                "position": [3, 1, 0],
+                "scale": [2.83, 0.12, 0.12],
+                "rotation": [0, 0, -0.785],
+                "material": {"type": "MeshStandardMaterial", "color": "#FFAA00", "metalness": 0.8, "roughness": 0.2},
+                "userData": {"element_type": "diagonal", "stress_level": 0.5, "force": -7070, "material": "steel",
+                             "info": "End diagonal in compression"}
+            },
+            {
+                "id": "vertical_middle",
+                "type": "BoxGeometry",
+                "position": [0, 1, 0],
+                "scale": [0.12, 2, 0.12],
+                "rotation": [0, 0, 0],
+                "material": {"type": "MeshStandardMaterial", "color": "#00FF00", "metalness": 0.8, "roughness": 0.2},
+                "userData": {"element_type": "vertical", "stress_level": 0.1, "force": 0, "material": "steel",
+                             "info": "Zero-force member under this load"}
+            }
+        ],
+        "supports": [
+            {
+                "id": "support_left",
+                "type": "ConeGeometry",
+                "position": [-4, -0.3, 0],
+                "scale": [0.25, 0.3, 0.25],
+                "material": {"type": "MeshStandardMaterial", "color": "#444444"}
+            },
+            {
+                "id": "support_right",
+                "type": "ConeGeometry",
+                "position": [4, -0.3, 0],
+                "scale": [0.25, 0.3, 0.25],
+                "material": {"type": "MeshStandardMaterial", "color": "#444444"}
+            }
+        ],
+        "force_arrows": [
+            {
+                "id": "load_left",
+                "origin": [-2, 4, 0],
+                "direction": [0, -1, 0],
+                "length": 2,
+                "color": "#FF4444",
+                "label": "5000N",
+                "label_position": [-2, 4.3, 0]
+            },
+            {
+                "id": "load_right",
+                "origin": [2, 4, 0],
+                "direction": [0, -1, 0],
+                "length": 2,
+                "color": "#FF4444",
+                "label": "5000N",
+                "label_position": [2, 4.3, 0]
+            }
+        ]
+    },
+    "stress_colors": {"low": "#00FF00", "medium": "#FFAA00", "high": "#FF0000", "max_stress": 250},
+    "camera": {"position": [12, 6, 12], "look_at": [0, 1, 0]},
+    "lighting": {
+        "ambient": {"color": "#404040", "intensity": 0.4},
+        "directional": {"color": "#ffffff", "intensity": 0.8, "position": [10, 10, 5]}
+    }
+}
+
+
+def _dump(data: Any) -> str:
+    """Serialize JSON deterministically so cached prefixes stay identical"""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+def _few_shot_block() -> str:
+    return (
+        'Example for "simply supported steel beam with a point load":\n'
+        f"{_dump(BEAM_EXAMPLE)}\n\n"
+        'Example for "8m steel truss with two 5kN loads on the top chord":\n'
+        f"{_dump(TRUSS_EXAMPLE)}"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_simulation_prefix(complexity: str) -> str:
+    """Stable system prompt for simulation generation at a complexity level"""
+    system_prompt = SIMULATION_SYSTEM_PROMPTS.get(complexity, SIMULATION_SYSTEM_PROMPTS["simple"])
+    return "\n\n".join([system_prompt, SCENE_SCHEMA, MODELLING_GUIDELINES, _few_shot_block()])
+
+
+@lru_cache(maxsize=None)
+def get_chat_prefix() -> str:
+    """Stable system prompt for chat iteration"""
+    return "\n\n".join([CHAT_SYSTEM_PROMPT, SCENE_SCHEMA, MODELLING_GUIDELINES, _few_shot_block()])
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token count (about 4 characters a token for prose, fewer for JSON)"""
+    return len(text) // 4
+
+
+def history_window(history: List[Any]) -> List[Any]:
+    """Recent chat history to send, starting on a block boundary.
+
+    At least HISTORY_WINDOW messages and fewer than HISTORY_WINDOW + HISTORY_BLOCK.
+    The start only moves every HISTORY_BLOCK messages, so the messages after the
+    system prompt stay identical (and cached) between most turns.
+    """
+    excess = max(0, len(history) - HISTORY_WINDOW)
+    return history[excess - excess % HISTORY_BLOCK:]
+
+
+def build_scene_context(scene: Optional[Dict[str, Any]]) -> str:
+    """Render the current scene for the variable part of the prompt"""
+    return f"Current simulation structure: {_dump(scene or {})}"
+
+
+def build_focus_context(members: List[Dict[str, Any]]) -> str:
+    """Members the request refers to, with their end points and the members meeting them"""
+    return f"Members this request refers to: {_dump(members)}"
+
+
+def build_seed_context(prompt: str, scene: Optional[Dict[str, Any]]) -> str:
+    """A similar earlier scene, appended to the user prompt as a starting point"""
+    return (
+        f"\nA similar earlier request ({prompt!r}) produced this scene. "
+        f"Adapt it to this request rather than starting from scratch:\n{_dump(scene or {})}\n"
+    )
+
+
+def anthropic_system_blocks(prefix: str) -> List[Dict[str, Any]]:
+    """System prompt as Anthropic content blocks with a cache breakpoint"""
+    return [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+
+
+def extract_token_usage(usage: Any) -> Dict[str, Optional[int]]:
+    """Normalize prompt/cached token counts from OpenAI or Anthropic usage objects"""
+    if usage is None:
+        return {"prompt_tokens": None, "cached_tokens": None}
+
+    # OpenAI: prompt_tokens includes cached tokens, reported under prompt_tokens_details
+    if hasattr(usage, "prompt_tokens"):
+        details = getattr(usage, "prompt_tokens_details", None)
+        # Older openai SDKs (1.3.x) don't model the field and leave it as a plain dict
+        cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "cached_tokens": cached or 0
+        }
+
+    # Anthropic: input_tokens excludes cache reads and cache writes
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return {
+        "prompt_tokens": input_tokens + cache_read + cache_write,
+        "cached_tokens": cache_read
+    }
@@ -0,0 +1,237 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Type
+from ..config import settings
+from ..models.request_models import LLMProvider
+from .prompt_builder import anthropic_system_blocks, extract_token_usage
+from .stub_provider import get_stub_provider, STUB_MODEL
+
+# Provider SDKs are heavy (openai, anthropic and google-generativeai pull in
+# large dependency trees), so each adapter imports its SDK the first time its
+# client is needed. Unconfigured providers are never imported.
+
+Completion = Tuple[str, Dict[str, Optional[int]]]
+
+_ADAPTERS: Dict[LLMProvider, Type["ProviderAdapter"]] = {}
+_instances: Dict[LLMProvider, "ProviderAdapter"] = {}
+
+
+def register_provider(provider: LLMProvider):
+    """Class decorator registering an adapter for an LLMProvider"""
+    def decorator(cls: Type["ProviderAdapter"]) -> Type["ProviderAdapter"]:
+        _ADAPTERS[provider] = cls
+        return cls
+    return decorator
+
+
+class ProviderAdapter(ABC):
+    """Wraps one provider SDK behind generate/chat calls returning (text, token usage)"""
+
+    model: str = ""
+
+    def __init__(self):
+        self._client: Any = None
+
+    @classmethod
+    def api_key(cls) -> str:
+        return ""
+
+    @classmethod
+    def is_configured(cls) -> bool:
+        return bool(cls.api_key())
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    @abstractmethod
+    def _create_client(self) -> Any:
+        """Build the SDK client; called once, on first use"""
+
+    async def generate(self, system_prompt: str, user_prompt: str, max_tokens: int = 4000) -> Completion:
+        """Single-turn completion for simulation generation"""
+        return await self.chat([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ], max_tokens=max_tokens)
+
+    @abstractmethod
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> Completion:
+        """Multi-turn completion; messages use OpenAI-style roles"""
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> AsyncIterator[str]:
+        """Multi-turn completion yielded as text deltas; one delta unless the provider streams"""
+        content, _ = await self.chat(messages, max_tokens=max_tokens)
+        yield content
+
+    async def close(self):
+        if self._client is not None and hasattr(self._client, "close"):
+            await self._client.close()
+
+
+@register_provider(LLMProvider.OPENAI)
+class OpenAIAdapter(ProviderAdapter):
+    model = "gpt-4o"  # Takes part in automatic prompt caching; gpt-4-turbo does not
+
+    @classmethod
+    def api_key(cls) -> str:
+        return settings.openai_api_key
+
+    def _create_client(self) -> Any:
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key())
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content, extract_token_usage(response.usage)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+@register_provider(LLMProvider.ANTHROPIC)
+class AnthropicAdapter(ProviderAdapter):
+    model = "claude-3-5-sonnet-latest"
+
+    @classmethod
+    def api_key(cls) -> str:
+        return settings.anthropic_api_key
+
+    def _create_client(self) -> Any:
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(api_key=self.api_key())
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> Completion:
+        # Anthropic takes the system prompt separately, marked cacheable
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        response = await self.client.messages.create(
+            model=self.model,
+            system=anthropic_system_blocks(system),
+            messages=[m for m in messages if m["role"] != "system"],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        return response.content[0].text, extract_token_usage(response.usage)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> AsyncIterator[str]:
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        async with self.client.messages.stream(
+            model=self.model,
+            system=anthropic_system_blocks(system),
+            messages=[m for m in messages if m["role"] != "system"],
+            temperature=0.7,
+            max_tokens=max_tokens
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+
+def gemini_contents(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """OpenAI-style messages as Gemini contents: gemini-pro has no system role, so system
+    text leads the first user turn, and consecutive turns of one role are merged"""
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    contents: List[Dict[str, Any]] = []
+    for message in messages:
+        if message["role"] == "system":
+            continue
+        role = "model" if message["role"] == "assistant" else "user"
+        text = message["content"]
+        if system and role == "user":
+            text, system = f"{system}\n\n{text}", ""
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].append(text)
+        else:
+            contents.append({"role": role, "parts": [text]})
+    if system:
+        contents.insert(0, {"role": "user", "parts": [system]})
+    return contents
+
+
+@register_provider(LLMProvider.GEMINI)
+class GeminiAdapter(ProviderAdapter):
+    model = "gemini-pro"
+
+    @classmethod
+    def api_key(cls) -> str:
+        return settings.gemini_api_key
+
+    def _create_client(self) -> Any:
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key())
+        return genai.GenerativeModel(self.model)
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> Completion:
+        response = await self.client.generate_content_async(
+            gemini_contents(messages),
+            generation_config={"temperature": 0.7, "max_output_tokens": max_tokens}
+        )
+        return response.text, {}
+
+    async def close(self):
+        # GenerativeModel holds no connection to close
+        pass
+
+
+@register_provider(LLMProvider.STUB)
+class StubAdapter(ProviderAdapter):
+    model = STUB_MODEL
+
+    @classmethod
+    def is_configured(cls) -> bool:
+        return True
+
+    def _create_client(self) -> Any:
+        return get_stub_provider()
+
+    async def generate(self, system_prompt: str, user_prompt: str, max_tokens: int = 4000) -> Completion:
+        return await self.client.complete("simulate", f"{system_prompt}\n\n{user_prompt}"), {}
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> Completion:
+        return await self.client.complete("chat", messages[-1]["content"]), {}
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> AsyncIterator[str]:
+        async for chunk in self.client.stream("chat", messages[-1]["content"]):
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+def get_provider(provider: LLMProvider) -> Optional[ProviderAdapter]:
+    """Shared adapter for a provider, or None when it has no API key"""
+    adapter_cls = _ADAPTERS.get(provider)
+    if adapter_cls is None or not adapter_cls.is_configured():
+        return None
+    if provider not in _instances:
+        _instances[provider] = adapter_cls()
+    return _instances[provider]
+
+
+def warm_providers():
+    """Import SDKs and build clients for the providers that have API keys"""
+    for provider in _ADAPTERS:
+        adapter = get_provider(provider)
+        if adapter is not None:
+            adapter.client
+
+
+async def close_providers():
+    """Close every client that was created"""
+    for adapter in _instances.values():
+        await adapter.close()
+    _instances.clear()
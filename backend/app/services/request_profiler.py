@@ -0,0 +1,216 @@
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from ..config import settings
+from ..utils.request_trace import RequestTrace
+
+# Slow-request capture and on-demand profiling.
+#
+# With PROFILING_ENABLED every HTTP request gets stage timings (see
+# utils/request_trace.py). Requests sampled at PROFILING_SAMPLE_RATE or sent
+# with "X-Profile-Token: <PROFILING_TOKEN>" also run under a pyinstrument
+# sampling profiler. Sampled, requested and slow requests are kept in a ring
+# buffer with their stages, scene size, event loop lag and profile, for
+# /api/admin/requests.
+#
+# LoopMonitor measures how late the event loop wakes up. When the loop stalls
+# (a sync Redis call, JSON for a large scene...), a watchdog thread captures
+# the loop thread's stack, which shows what blocked it even for requests that
+# weren't profiled.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+STACK_DEPTH = 12  # Innermost frames kept for a stall
+
+
+def _format_stack(frame) -> List[str]:
+    frames = traceback.extract_stack(frame)[-STACK_DEPTH:]
+    return [f"{os.path.relpath(f.filename, BACKEND_DIR) if f.filename.startswith(BACKEND_DIR) else f.filename}"
+            f":{f.lineno} {f.name}" for f in frames]
+
+
+class LoopMonitor:
+    """Event loop lag, and the loop thread's stack whenever it stalls"""
+
+    def __init__(self, interval: float, stall_threshold: float):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.lags: deque = deque(maxlen=1200)  # (monotonic time, lag seconds)
+        self.stalls: deque = deque(maxlen=50)
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            self.lags.append((now, max(0.0, now - start - self.interval)))
+
+    def _watch(self):
+        captured_beat = None
+        while not self._stopped.wait(self.stall_threshold / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.stall_threshold or beat == captured_beat:
+                continue
+            # One stack per stall: the frame the loop thread is stuck in right now
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self.stalls.append({
+                    "at": time.monotonic(),
+                    "time": datetime.now().isoformat(),
+                    "stalled_ms": round(stalled * 1000, 1),
+                    "stack": _format_stack(frame)
+                })
+            captured_beat = beat
+
+    def max_lag(self, since: float, until: float) -> float:
+        # A stall that is only just over hasn't been sampled yet; count how late the loop is now
+        overdue = max(0.0, time.monotonic() - self._beat - self.interval) if self._task else 0.0
+        return max([overdue] + [lag for at, lag in self.lags if since <= at <= until])
+
+    def stalls_between(self, since: float, until: float) -> List[Dict[str, Any]]:
+        return [{k: v for k, v in stall.items() if k != "at"} for stall in self.stalls if since <= stall["at"] <= until]
+
+    def summary(self) -> Dict[str, Any]:
+        lags = sorted(lag for _, lag in self.lags)
+        if not lags:
+            return {"samples": 0, "stalls": len(self.stalls)}
+        return {
+            "samples": len(lags),
+            "p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            "max_ms": round(lags[-1] * 1000, 2),
+            "stalls": len(self.stalls)
+        }
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the interesting ones"""
+
+    def __init__(self):
+        self.sample_rate = settings.profiling_sample_rate
+        self.slow_seconds = settings.slow_request_ms / 1000
+        self.captured: deque = deque(maxlen=settings.slow_request_buffer_size)
+        self.loop = LoopMonitor(settings.loop_lag_interval_ms / 1000, settings.loop_stall_ms / 1000)
+        self.counters = {"requests": 0, "profiled": 0, "captured": 0}
+        self._profiler_class = None
+
+    async def start(self):
+        if settings.profiling_enabled:
+            await self.loop.start()
+
+    async def stop(self):
+        await self.loop.stop()
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a request carries the profiling token; never true when no token is configured"""
+        return bool(settings.profiling_token and token) and hmac.compare_digest(token, settings.profiling_token)
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def new_profiler(self):
+        """A sampling profiler for one request, or None when pyinstrument is missing"""
+        if self._profiler_class is None:
+            try:
+                # Imported on first use so workers that never profile don't load it
+                from pyinstrument import Profiler
+                self._profiler_class = Profiler
+            except ImportError:
+                print("Request profiling unavailable: pyinstrument is not installed")
+                self._profiler_class = False
+        if not self._profiler_class:
+            return None
+        return self._profiler_class(interval=settings.profiling_interval_ms / 1000, async_mode="enabled")
+
+    def finish(self, capture_id: str, scope: Dict[str, Any], status: int, started: float, duration: float,
+               trace: RequestTrace, profiler, reason: Optional[str]):
+        """Keep the request in the buffer when it was profiled or slow"""
+        self.counters["requests"] += 1
+        if profiler is not None:
+            self.counters["profiled"] += 1
+        if reason is None and duration < self.slow_seconds:
+            return
+
+        ended = started + duration
+        stages = trace.summary()
+        self.counters["captured"] += 1
+        self.captured.append({
+            "id": capture_id,
+            "time": datetime.now().isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "reason": reason or "slow",
+            "duration_ms": round(duration * 1000, 2),
+            "stages": stages,
+            # Time outside the timed stages: routing, validation, response encoding...
+            "other_ms": round(max(0.0, duration * 1000 - sum(s["ms"] for s in stages.values())), 2),
+            "scene_members": trace.scene_members,
+            "loop_lag_max_ms": round(self.loop.max_lag(started, ended) * 1000, 2),
+            "loop_stalls": self.loop.stalls_between(started, ended),
+            "_profiler": profiler
+        })
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Captured requests, newest first, without their profiles"""
+        return [
+            {**self._public(entry), "profiled": entry["_profiler"] is not None}
+            for entry in reversed(self.captured)
+        ]
+
+    def get(self, capture_id: str) -> Optional[Dict[str, Any]]:
+        """A captured request with its profile rendered as text"""
+        for entry in self.captured:
+            if entry["id"] == capture_id:
+                profiler = entry["_profiler"]
+                profile = profiler.output_text(unicode=False, color=False) if profiler is not None else None
+                return {**self._public(entry), "profile": profile}
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.profiling_enabled,
+            "sample_rate": self.sample_rate,
+            "slow_request_ms": settings.slow_request_ms,
+            "buffered": len(self.captured),
+            **self.counters,
+            "loop_lag": self.loop.summary()
+        }
+
+    def _public(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in entry.items() if not key.startswith("_")}
@@ -0,0 +1,323 @@
+import asyncio
+import math
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from ..utils.scene_geometry import Vec3, vec3, member_segment, set_member_segment, arrow_tip, user_number, EPSILON
+from ..utils.request_trace import stage
+from .spatial_index import SceneIndex, SceneIndexCache, _FIELDS
+
+# Validation and safe repair of generated scenes, linear in the number of members:
+#
+#   1. member endpoints are hashed on a grid of the snapping tolerance
+#      and merged into shared nodes; endpoints that were slightly apart are
+#      moved onto their node (repair)
+#   2. members joining the same two nodes are duplicates; all but the most
+#      stressed are removed (repair). Parallel members leaving a node in the
+#      same direction overlap (reported)
+#   3. members are joined through shared nodes, and through endpoints resting
+#      on another member (found with the scene's spatial index) into components
+#   4. components no support touches are floating, as are supports touching
+#      no member (reported)
+#   5. force arrows whose tip and origin are both away from every member are
+#      moved onto the nearest member when it is within ANCHOR_FRACTION of the
+#      scene size (repair), otherwise reported
+#
+# Nothing is added or reshaped beyond these moves, so a repaired scene still
+# looks like what the model generated.
+
+SNAP_FRACTION = 0.01
+MEMBER_SNAP_FRACTION = 0.1  # Of the median member length
+MIN_TOLERANCE = 0.02
+ANCHOR_FRACTION = 0.1
+PARALLEL_COS = 0.999
+# Unit directions this close are parallel; bucketing directions on a grid of this size puts
+# parallel members in the same or a neighbouring cell
+DIRECTION_CELL = math.sqrt(2 - 2 * PARALLEL_COS)
+_NEIGHBOUR_CELLS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+BUSY_JOINT = 16  # Members meeting at a node above which directions are bucketed before comparing
+MAX_LISTED = 50  # Ids listed per issue; counts are always complete
+THREAD_THRESHOLD = 500  # Members above which validation runs in a worker thread
+
+
+def validate_scene(scene: Dict[str, Any], repair: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any], SceneIndex]:
+    """(scene, diagnostics, spatial index of the returned scene); the input scene is not modified"""
+    start_time = time.perf_counter()
+    # Entries that aren't objects can't be members; malformed coordinates inside one are coerced by vec3
+    meshes = [mesh for mesh in scene.get("meshes", []) if isinstance(mesh, dict)]
+    segments = [member_segment(mesh) for mesh in meshes]
+    tolerance = _tolerance(segments)
+
+    # 1. Shared nodes
+    node_of, nodes, snapped = _snap_nodes(segments, tolerance)
+    if repair and snapped:
+        meshes = list(meshes)
+        for i in snapped:
+            a, b = node_of[i]
+            mesh = meshes[i] = {**meshes[i], "position": list(meshes[i].get("position", [0, 0, 0]))}
+            set_member_segment(mesh, nodes[a], nodes[b])
+            segments[i] = (nodes[a], nodes[b], segments[i][2])
+
+    # 2. Duplicates and overlaps
+    duplicates, overlaps = _duplicates_and_overlaps(meshes, segments, node_of, nodes)
+    if repair and duplicates:
+        removed = set(duplicates)
+        removed_ids = [_mesh_id(meshes[i], i) for i in duplicates]
+        keep = [i for i in range(len(meshes)) if i not in removed]
+        meshes = [meshes[i] for i in keep]
+        segments = [segments[i] for i in keep]
+        node_of = [node_of[i] for i in keep]
+        overlaps = [(a, b) for a, b in overlaps if a not in removed and b not in removed]
+        renumber = {old: new for new, old in enumerate(keep)}
+        overlaps = [(renumber[a], renumber[b]) for a, b in overlaps]
+    else:
+        removed_ids = []
+
+    repaired_scene = {**scene, "meshes": meshes}
+    index = SceneIndex.from_scene(repaired_scene, segments)
+
+    # 3. Components
+    component = _components(index, node_of, tolerance)
+
+    # 4. Supports
+    supports = scene.get("supports", [])
+    grounded, floating_supports = set(), []
+    for position, support in enumerate(supports):
+        touching = index.within(vec3(support.get("position")), _support_reach(support) + tolerance)
+        if touching:
+            grounded.update(component[i] for i, _ in touching)
+        else:
+            floating_supports.append(_mesh_id(support, position))
+    floating = [i for i in range(index.count) if component[i] not in grounded] if supports else []
+
+    # 5. Loads
+    arrows = list(scene.get("force_arrows", []))
+    anchored, unanchored = [], []
+    for position, arrow in enumerate(arrows):
+        tip, origin = arrow_tip(arrow), vec3(arrow.get("origin"))
+        if not index.count or index.within(tip, tolerance) or index.within(origin, tolerance):
+            continue
+        nearest = index.nearest(tip, 1)
+        if repair and nearest and nearest[0][1] <= ANCHOR_FRACTION * _diagonal(index):
+            target = index.closest_point(nearest[0][0], tip)
+            arrows[position] = _moved_arrow(arrow, tuple(target[k] - tip[k] for k in range(3)))
+            anchored.append(_mesh_id(arrow, position))
+        else:
+            unanchored.append(_mesh_id(arrow, position))
+    if anchored:
+        repaired_scene["force_arrows"] = arrows
+
+    overlap_ids = [[index.ids[a], index.ids[b]] for a, b in overlaps]
+    diagnostics = {
+        "valid": not (floating or floating_supports or overlaps or unanchored or (meshes and not supports)),
+        "members": index.count,
+        "nodes": len(nodes),
+        "components": len(set(component)),
+        "tolerance": round(tolerance, 4),
+        "issues": {
+            "floating_members": _listed([index.ids[i] for i in floating]),
+            "floating_supports": _listed(floating_supports),
+            "overlapping_members": _listed(overlap_ids),
+            "unanchored_loads": _listed(unanchored),
+            "no_supports": bool(meshes) and not supports
+        },
+        "repairs": {
+            "snapped_endpoints": len(snapped) if repair else 0,
+            "removed_duplicates": _listed(removed_ids),
+            "anchored_loads": _listed(anchored)
+        } if repair else {},
+        "validation_time_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+    if not repair:
+        diagnostics["issues"]["duplicate_members"] = _listed([_mesh_id(meshes[i], i) for i in duplicates])
+        diagnostics["issues"]["unsnapped_endpoints"] = len(snapped)
+    return repaired_scene, diagnostics, index
+
+
+async def validate_simulation(simulation_data: Dict[str, Any], repair: bool = True,
+                              scene_indexes: Optional[SceneIndexCache] = None) -> Dict[str, Any]:
+    """Validate (and repair) a simulation's scene in place, attaching "validation" diagnostics"""
+    scene = simulation_data.get("scene")
+    if not isinstance(scene, dict):
+        return simulation_data
+    # Large scenes take a while to validate; keep that off the event loop
+    with stage("validation"):
+        if len(scene.get("meshes", [])) > THREAD_THRESHOLD:
+            scene, diagnostics, index = await asyncio.to_thread(validate_scene, scene, repair)
+        else:
+            scene, diagnostics, index = validate_scene(scene, repair)
+    simulation_data["scene"] = scene
+    simulation_data["validation"] = diagnostics
+    if scene_indexes is not None and simulation_data.get("simulation_id"):
+        # The index was built for validation anyway; spatial queries can reuse it
+        scene_indexes.put(simulation_data["simulation_id"], index)
+    return simulation_data
+
+
+def _tolerance(segments: List[Tuple[Vec3, Vec3, float]]) -> float:
+    """Snapping distance: SNAP_FRACTION of the scene, but never a sizeable part of a typical member"""
+    if not segments:
+        return MIN_TOLERANCE
+    low = [min(min(s[0][a], s[1][a]) for s in segments) for a in range(3)]
+    high = [max(max(s[0][a], s[1][a]) for s in segments) for a in range(3)]
+    lengths = sorted(math.dist(s[0], s[1]) for s in segments)
+    return max(min(math.dist(low, high) * SNAP_FRACTION, lengths[len(lengths) // 2] * MEMBER_SNAP_FRACTION),
+               MIN_TOLERANCE)
+
+
+def _snap_nodes(segments: List[Tuple[Vec3, Vec3, float]], tolerance: float):
+    """(node pair per member, node positions, members with an endpoint off its node)"""
+    grid: Dict[Tuple[int, int, int], List[int]] = {}
+    nodes: List[Vec3] = []
+    node_of: List[Tuple[int, int]] = []
+    snapped = []
+
+    # Cells twice the tolerance wide: a node within tolerance of a point is in
+    # the point's cell or the neighbour on its nearer side, 8 cells at most
+    cell = 2 * tolerance
+
+    def node_for(point: Vec3) -> int:
+        scaled = (point[0] / cell, point[1] / cell, point[2] / cell)
+        key = (math.floor(scaled[0]), math.floor(scaled[1]), math.floor(scaled[2]))
+        near = [(k, k - 1 if c - k < 0.5 else k + 1) for k, c in zip(key, scaled)]
+        for x in near[0]:
+            for y in near[1]:
+                for z in near[2]:
+                    for node in grid.get((x, y, z), ()):
+                        if math.dist(nodes[node], point) <= tolerance:
+                            return node
+        nodes.append(point)
+        grid.setdefault(key, []).append(len(nodes) - 1)
+        return len(nodes) - 1
+
+    for start, end, _ in segments:
+        a, b = node_for(start), node_for(end)
+        if a == b:
+            # Shorter than the tolerance: leave its geometry alone
+            b = len(nodes)
+            nodes.append(end)
+        node_of.append((a, b))
+
+    # Each node sits where most of its endpoints already are, so one stray
+    # endpoint is moved to the joint rather than the joint to it
+    votes: List[Dict[Vec3, int]] = [{} for _ in nodes]
+    for (start, end, _), (a, b) in zip(segments, node_of):
+        votes[a][start] = votes[a].get(start, 0) + 1
+        votes[b][end] = votes[b].get(end, 0) + 1
+    nodes = [max(counts, key=counts.get) for counts in votes]
+    for i, ((start, end, _), (a, b)) in enumerate(zip(segments, node_of)):
+        if math.dist(nodes[a], start) > EPSILON or math.dist(nodes[b], end) > EPSILON:
+            snapped.append(i)
+    return node_of, nodes, snapped
+
+
+def _duplicates_and_overlaps(meshes, segments, node_of, nodes):
+    """Members to drop as duplicates, and (a, b) pairs of overlapping parallel members"""
+    by_pair: Dict[Tuple[int, int], List[int]] = {}
+    incident: Dict[int, List[Tuple[int, Vec3]]] = {}
+    for i, (a, b) in enumerate(node_of):
+        by_pair.setdefault((min(a, b), max(a, b)), []).append(i)
+        for node, other in ((a, b), (b, a)):
+            direction = _unit(nodes[node], nodes[other])
+            if direction:
+                incident.setdefault(node, []).append((i, direction))
+
+    duplicates = []
+    for members in by_pair.values():
+        if len(members) > 1:
+            keep = max(members, key=lambda i: user_number(meshes[i], "stress_level"))
+            duplicates.extend(i for i in members if i != keep)
+
+    dropped = set(duplicates)
+    overlaps = set()
+    for members in incident.values():
+        members = [(i, u) for i, u in members if i not in dropped]
+        for (i, u), (j, v) in _same_direction_pairs(members):
+            if node_of[i] != node_of[j] and node_of[i][::-1] != node_of[j] and \
+                    u[0] * v[0] + u[1] * v[1] + u[2] * v[2] >= PARALLEL_COS:
+                overlaps.add((min(i, j), max(i, j)))
+    return duplicates, sorted(overlaps)
+
+
+def _same_direction_pairs(members: List[Tuple[int, Vec3]]):
+    """Pairs of members at one node that may be parallel: all of them at an ordinary joint, and
+    only those in the same or neighbouring direction cells at a busy one, so it costs its degree
+    rather than its degree squared"""
+    if len(members) <= BUSY_JOINT:
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                yield members[x], members[y]
+        return
+    cells: Dict[Tuple[int, int, int], List[Tuple[int, Vec3]]] = {}
+    for member in members:
+        u = member[1]
+        cell = (round(u[0] / DIRECTION_CELL), round(u[1] / DIRECTION_CELL), round(u[2] / DIRECTION_CELL))
+        for offset in _NEIGHBOUR_CELLS:
+            for other in cells.get((cell[0] + offset[0], cell[1] + offset[1], cell[2] + offset[2]), ()):
+                yield other, member
+        cells.setdefault(cell, []).append(member)
+
+
+def _components(index: SceneIndex, node_of: List[Tuple[int, int]], tolerance: float) -> List[int]:
+    """Component label per member"""
+    parent = list(range(index.count))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first_at: Dict[int, int] = {}
+    degree: Dict[int, int] = {}
+    for i, pair in enumerate(node_of):
+        for node in pair:
+            degree[node] = degree.get(node, 0) + 1
+            if node in first_at:
+                parent[find(i)] = find(first_at[node])
+            else:
+                first_at[node] = i
+
+    # Endpoints no other member shares may rest on another member (a T-joint)
+    d = index.data
+    for i, pair in enumerate(node_of):
+        for end, node in enumerate(pair):
+            if degree[node] > 1:
+                continue
+            base = i * _FIELDS + end * 3
+            for j, _ in index.within((d[base], d[base + 1], d[base + 2]), tolerance):
+                if j != i:
+                    parent[find(i)] = find(j)
+    return [find(i) for i in range(index.count)]
+
+
+def _support_reach(support: Dict[str, Any]) -> float:
+    """How far from its position a support still holds a member (its height)"""
+    return max(vec3(support.get("scale"), 1.0))
+
+
+def _moved_arrow(arrow: Dict[str, Any], offset: Vec3) -> Dict[str, Any]:
+    moved = dict(arrow)
+    for key in ("origin", "label_position"):
+        if key in arrow:
+            point = vec3(arrow.get(key))
+            moved[key] = [round(point[k] + offset[k], 6) for k in range(3)]
+    return moved
+
+
+def _unit(a: Vec3, b: Vec3) -> Optional[Vec3]:
+    length = math.dist(a, b)
+    if length < EPSILON:
+        return None
+    return tuple((b[k] - a[k]) / length for k in range(3))
+
+
+def _diagonal(index: SceneIndex) -> float:
+    return math.dist(index.low, index.high)
+
+
+def _mesh_id(item: Dict[str, Any], position: int) -> str:
+    return str(item.get("id", f"item_{position}"))
+
+
+def _listed(items: List[Any]) -> Dict[str, Any]:
+    return {"count": len(items), "ids": items[:MAX_LISTED]}
@@ -0,0 +1,103 @@
+import asyncio
+import json
+from typing import Dict, Any, Optional, Set
+from .session_manager import async_redis_from_url
+
+CHANNEL_PREFIX = "session-events:"
+LISTENER_STOP_TIMEOUT = 2.0  # Seconds close() waits for the pub/sub listener
+
+
+class SessionBroadcaster:
+    """Fans session updates out to every WebSocket connected to the session.
+
+    Each worker holds one Redis pub/sub connection, subscribed to the sessions
+    that have a connection on this worker, and hands incoming events to local
+    queues. Without Redis, events only reach connections on the same worker.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+        self._client = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        queues = self._queues.setdefault(session_id, set())
+        queues.add(queue)
+        if len(queues) == 1 and self.redis_url:
+            try:
+                await self._ensure_pubsub()
+                await self._pubsub.subscribe(CHANNEL_PREFIX + session_id)
+                if self._listener is None:
+                    self._listener = asyncio.create_task(self._listen())
+            except Exception as e:
+                print(f"Session pub/sub unavailable, updates stay on this worker: {e}")
+                self.redis_url = None
+        return queue
+
+    async def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        queues = self._queues.get(session_id, set())
+        queues.discard(queue)
+        if queues:
+            return
+        self._queues.pop(session_id, None)
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(CHANNEL_PREFIX + session_id)
+            except Exception as e:
+                print(f"Session pub/sub unsubscribe failed: {e}")
+
+    async def publish(self, session_id: str, event: Dict[str, Any]):
+        """Send an event to every connection on the session, on any worker"""
+        if self.redis_url:
+            try:
+                await self._ensure_pubsub()
+                await self._client.publish(CHANNEL_PREFIX + session_id, json.dumps(event, default=str))
+                return
+            except Exception as e:
+                print(f"Session publish failed, delivering locally: {e}")
+        self._deliver(session_id, json.loads(json.dumps(event, default=str)))
+
+    async def close(self):
+        self._closed = True
+        if self._listener:
+            # Some client versions swallow a cancel that lands mid-read; the
+            # flag ends the loop on the next poll either way
+            self._listener.cancel()
+            done, _ = await asyncio.wait({self._listener}, timeout=LISTENER_STOP_TIMEOUT)
+            if not done:
+                print("Session pub/sub listener did not stop; closing its connection anyway")
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        if self._client is not None:
+            await self._client.close()
+
+    async def _ensure_pubsub(self):
+        if self._client is None:
+            self._client = async_redis_from_url(self.redis_url)
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+
+    async def _listen(self):
+        while not self._closed:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Session pub/sub listener error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self._deliver(channel[len(CHANNEL_PREFIX):], json.loads(message["data"]))
+
+    def _deliver(self, session_id: str, event: Dict[str, Any]):
+        for queue in self._queues.get(session_id, ()):
+            queue.put_nowait(event)
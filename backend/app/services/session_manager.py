@@ -2,14 +2,42 @@ import json
 import uuid
 import redis
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional
 from ..config import settings
 from ..models.chat_models import ChatMessage, MessageType
+from ..utils.compression import StoredValueCodec
+from ..utils.request_trace import stage
+from .history_store import HistoryStore
+from .prompt_builder import HISTORY_BLOCK
+
+SESSION_UPDATE_ATTEMPTS = 5  # Read-modify-write retries when another writer got in first
+
+_fake_redis_server = None
+
+def _redis_from_url(url: str):
+    """Create a Redis client; "fakeredis://" gives an in-process server shared by all clients"""
+    global _fake_redis_server
+    if url.startswith("fakeredis://"):
+        # Optional dependency, only needed for local load testing without Redis
+        import fakeredis
+        if _fake_redis_server is None:
+            _fake_redis_server = fakeredis.FakeServer()
+        return fakeredis.FakeRedis(server=_fake_redis_server)
+    return redis.from_url(url)
+
+def async_redis_from_url(url: str):
+    """asyncio Redis client for pub/sub, sharing the fake server like _redis_from_url"""
+    if url.startswith("fakeredis://"):
+        from fakeredis import aioredis
+        _redis_from_url(url)
+        return aioredis.FakeRedis(server=_fake_redis_server)
+    import redis.asyncio
+    return redis.asyncio.from_url(url)
 
 class SessionManager:
-    def __init__(self):
+    def __init__(self, history_store: Optional[HistoryStore] = None):
         try:
-            self.redis_client = redis.from_url(settings.redis_url)
+            self.redis_client = _redis_from_url(settings.redis_url)
             # Test connection
             self.redis_client.ping()
         except Exception as e:
@@ -20,25 +48,134 @@ class SessionManager:
         
         self.session_timeout = settings.session_timeout
         self.max_chat_history = settings.max_chat_history
+        # Compresses simulation:* and session:* values in Redis
+        self.codec = StoredValueCodec(settings.storage_compression_enabled, settings.storage_compression_level,
+                                      write_dictionary_id=settings.storage_compression_dictionary_id)
+        # Durable tier; stays disabled (no reads or writes) until started
+        self.history_store = history_store or HistoryStore()
+    
+    def close(self):
+        """Release the Redis connection pool"""
+        if self.redis_client:
+            self.redis_client.close()
     
     async def create_session(self, initial_simulation_id: str) -> str:
         """Create a new chat session"""
         
         session_id = str(uuid.uuid4())
         
-        session_data = {
+        session_data = self._new_session_data(session_id, initial_simulation_id)
+        
+        # Store in Redis or memory
+        await self._store_session(session_id, session_data)
+        
+        return session_id
+    
+    async def create_sessions(self, simulations: List[Dict[str, Any]]) -> List[str]:
+        """Create a session for each simulation and store both, in one Redis round trip"""
+        
+        pipeline = self.redis_client.pipeline(transaction=False) if self.redis_client else None
+        session_ids = []
+        for simulation_data in simulations:
+            session_id = str(uuid.uuid4())
+            simulation_data["session_id"] = session_id
+            session_data = self._new_session_data(session_id, simulation_data["simulation_id"])
+            
+            self._cache_session(session_id, session_data, pipeline)
+            self._cache_simulation(simulation_data["simulation_id"], simulation_data, pipeline)
+            self.history_store.enqueue_session(session_data)
+            self.history_store.enqueue_simulation(simulation_data["simulation_id"], simulation_data)
+            session_ids.append(session_id)
+        
+        if pipeline is not None:
+            with stage("redis.pipeline"):
+                pipeline.execute()
+        return session_ids
+    
+    def _new_session_data(self, session_id: str, simulation_id: str) -> Dict[str, Any]:
+        return {
             "session_id": session_id,
             "created_at": datetime.now().isoformat(),
             "last_activity": datetime.now().isoformat(),
             "message_count": 0,
-            "current_simulation_id": initial_simulation_id,
+            "current_simulation_id": simulation_id,
             "messages": []
         }
+    
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Raw session data (messages as stored), for callers that keep it in memory"""
+        return await self._get_session(session_id)
+    
+    async def update_session(self, session_id: str,
+                             update: Callable[[Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+        """Apply update to the latest stored session data and write it back.
         
-        # Store in Redis or memory
-        await self._store_session(session_id, session_data)
+        With Redis the read and the write are one WATCH/MULTI transaction, rerun
+        when another writer (an HTTP chat, another connection's flush) changed
+        the session in between, so neither write is lost.
+        """
         
-        return session_id
+        if not self.redis_client:
+            session_data = await self._get_session(session_id)
+            if session_data:
+                update(session_data)
+                await self._store_session(session_id, session_data)
+            return session_data
+        
+        session_key = f"session:{session_id}"
+        for _ in range(SESSION_UPDATE_ATTEMPTS):
+            with self.redis_client.pipeline() as pipeline:
+                try:
+                    pipeline.watch(session_key)
+                    with stage("redis.get"):
+                        session_data = self._decode(pipeline.get(session_key))
+                    if session_data is None:
+                        pipeline.reset()
+                        # Expired from Redis: reload from the history store, then retry
+                        if not await self._get_session(session_id):
+                            return None
+                        continue
+                    update(session_data)
+                    pipeline.multi()
+                    self._cache_session(session_id, session_data, pipeline)
+                    pipeline.execute()
+                except redis.WatchError:
+                    continue
+            self.history_store.enqueue_session(session_data)
+            return session_data
+        
+        print(f"Session {session_id} update dropped after {SESSION_UPDATE_ATTEMPTS} conflicting writes")
+        return None
+    
+    def append_message(self, session_data: Dict[str, Any], message: ChatMessage):
+        """Add a message to session data in place"""
+        
+        session_data["messages"].append({
+            "id": message.id,
+            "type": message.type.value,
+            "content": message.content,
+            "timestamp": message.timestamp.isoformat(),
+            "simulation_id": message.simulation_id
+        })
+        
+        # Trim history if too long
+        session_data["messages"] = self.trim_history(session_data["messages"])
+        
+        # Update metadata
+        session_data["message_count"] += 1
+        session_data["last_activity"] = datetime.now().isoformat()
+    
+    def trim_history(self, messages: List[Any]) -> List[Any]:
+        """Drop the oldest messages past max_chat_history, a whole HISTORY_BLOCK at a time.
+        
+        Dropping in blocks keeps the history window sent to the LLM aligned (see
+        prompt_builder.history_window), so its cached prefix survives trimming.
+        """
+        excess = len(messages) - self.max_chat_history
+        if excess <= 0:
+            return messages
+        drop = -(-excess // HISTORY_BLOCK) * HISTORY_BLOCK  # Rounded up to whole blocks
+        return messages[drop:]
     
     async def get_chat_history(self, session_id: str) -> List[ChatMessage]:
         """Get chat history for a session"""
@@ -47,6 +184,11 @@ class SessionManager:
         if not session_data:
             return []
         
+        return self.chat_messages(session_data)
+    
+    def chat_messages(self, session_data: Dict[str, Any]) -> List[ChatMessage]:
+        """Decode the stored messages of session data"""
+        
         messages = []
         for msg_data in session_data.get("messages", []):
             messages.append(ChatMessage(
@@ -62,29 +204,7 @@ class SessionManager:
     async def add_message(self, session_id: str, message: ChatMessage):
         """Add a message to the session"""
         
-        session_data = await self._get_session(session_id)
-        if not session_data:
-            return
-        
-        # Add message
-        session_data["messages"].append({
-            "id": message.id,
-            "type": message.type.value,
-            "content": message.content,
-            "timestamp": message.timestamp.isoformat(),
-            "simulation_id": message.simulation_id
-        })
-        
-        # Trim history if too long
-        if len(session_data["messages"]) > self.max_chat_history:
-            session_data["messages"] = session_data["messages"][-self.max_chat_history:]
-        
-        # Update metadata
-        session_data["message_count"] += 1
-        session_data["last_activity"] = datetime.now().isoformat()
-        
-        # Store back
-        await self._store_session(session_id, session_data)
+        await self.update_session(session_id, lambda session_data: self.append_message(session_data, message))
     
     async def get_current_simulation(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get current simulation for a session"""
@@ -97,72 +217,105 @@ class SessionManager:
         if not simulation_id:
             return None
         
-        # Get simulation from cache
+        return await self.get_simulation(simulation_id)
+    
+    async def get_simulation(self, simulation_id: str) -> Optional[Dict[str, Any]]:
+        """Get simulation data, falling through to the history store on a cache miss"""
+        
         simulation_key = f"simulation:{simulation_id}"
         
         if self.redis_client:
-            simulation_data = self.redis_client.get(simulation_key)
+            simulation_data = self._read(simulation_key)
             if simulation_data:
-                return json.loads(simulation_data)
+                return simulation_data
         else:
             # Memory fallback
-            return self._memory_store.get(simulation_key)
+            simulation_data = self._memory_store.get(simulation_key)
+            if simulation_data:
+                return simulation_data
         
-        return None
+        with stage("history.load"):
+            simulation_data = await self.history_store.load_simulation(simulation_id)
+        if simulation_data:
+            self._cache_simulation(simulation_id, simulation_data)
+        return simulation_data
     
     async def update_current_simulation(self, session_id: str, simulation_id: str):
         """Update current simulation for a session"""
         
-        session_data = await self._get_session(session_id)
-        if not session_data:
-            return
-        
-        session_data["current_simulation_id"] = simulation_id
-        session_data["last_activity"] = datetime.now().isoformat()
+        def set_current(session_data: Dict[str, Any]):
+            session_data["current_simulation_id"] = simulation_id
+            session_data["last_activity"] = datetime.now().isoformat()
         
-        await self._store_session(session_id, session_data)
+        await self.update_session(session_id, set_current)
     
     async def store_simulation(self, simulation_id: str, simulation_data: Dict[str, Any]):
         """Store simulation data"""
         
+        self._cache_simulation(simulation_id, simulation_data)
+        self.history_store.enqueue_simulation(simulation_id, simulation_data)
+    
+    def _cache_simulation(self, simulation_id: str, simulation_data: Dict[str, Any], pipeline=None):
         simulation_key = f"simulation:{simulation_id}"
         
         if self.redis_client:
-            self.redis_client.setex(
-                simulation_key,
-                self.session_timeout,
-                json.dumps(simulation_data, default=str)
-            )
+            with stage("store.encode"):
+                stored = self.codec.encode(json.dumps(simulation_data, default=str))
+            with stage("redis.set"):
+                (self.redis_client if pipeline is None else pipeline).setex(simulation_key, self.session_timeout, stored)
         else:
             # Memory fallback
             self._memory_store[simulation_key] = simulation_data
     
     async def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get session data"""
+        """Get session data, falling through to the history store on a cache miss"""
         
         session_key = f"session:{session_id}"
         
         if self.redis_client:
-            session_data = self.redis_client.get(session_key)
+            session_data = self._read(session_key)
             if session_data:
-                return json.loads(session_data)
+                return session_data
         else:
             # Memory fallback
-            return self._memory_store.get(session_key)
+            session_data = self._memory_store.get(session_key)
+            if session_data:
+                return session_data
         
-        return None
+        with stage("history.load"):
+            session_data = await self.history_store.load_session(session_id, self.max_chat_history)
+        if session_data:
+            self._cache_session(session_id, session_data)
+        return session_data
     
     async def _store_session(self, session_id: str, session_data: Dict[str, Any]):
         """Store session data"""
         
+        self._cache_session(session_id, session_data)
+        self.history_store.enqueue_session(session_data)
+    
+    def _cache_session(self, session_id: str, session_data: Dict[str, Any], pipeline=None):
         session_key = f"session:{session_id}"
         
         if self.redis_client:
-            self.redis_client.setex(
-                session_key,
-                self.session_timeout,
-                json.dumps(session_data, default=str)
-            )
+            with stage("store.encode"):
+                stored = self.codec.encode(json.dumps(session_data, default=str))
+            with stage("redis.set"):
+                (self.redis_client if pipeline is None else pipeline).setex(session_key, self.session_timeout, stored)
         else:
             # Memory fallback
-            self._memory_store[session_key] = session_data 
\ No newline at end of file
+            self._memory_store[session_key] = session_data
+    
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        """A stored value; None when missing or written with an unknown dictionary"""
+        
+        with stage("redis.get"):
+            stored = self.redis_client.get(key)
+        return self._decode(stored)
+    
+    def _decode(self, stored: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if not stored:
+            return None
+        with stage("store.decode"):
+            text = self.codec.decode(stored)
+            return json.loads(text) if text else None
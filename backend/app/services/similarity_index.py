@@ -0,0 +1,368 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+# Near-duplicate lookup over past simulation prompts. Prompts are normalized to
+# a bag of tokens, split into character trigrams (numbers stay whole so "6m" and
+# "8m" never blur together) and indexed with MinHash LSH: a signature of
+# NUM_PERM min-hashes cut into BANDS bands, where prompts sharing any band
+# become candidates. Candidates are then ranked by exact Jaccard similarity.
+# The bag ignores word order, so each entry also keeps its words in order:
+# reuse needs the same word bigrams, which tells "steel beam on concrete
+# columns" from "concrete beam on steel columns".
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+MAX_CANDIDATES = 64
+MAX_BUCKET_SCAN = 256  # Only the newest entries of very common buckets are considered
+REPLAY_CHUNK = 500  # Entries applied per lock hold while replaying at startup
+TRIM_SLACK = 0.1  # The persisted list may exceed its cap by this fraction before it is trimmed
+REDIS_KEY = "similarity:prompts"
+TRIMMED_KEY = "similarity:prompts:trimmed"  # Entries ever trimmed from the head of REDIS_KEY
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+# Filler and phrasing words that carry no scene information ("stress" is implied
+# by every request)
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "with", "for", "and", "to", "at", "by", "from", "into",
+    "show", "showing", "me", "simulate", "simulation", "what", "is", "are", "how", "does",
+    "create", "make", "made", "model", "please", "i", "want", "see", "some", "its", "it",
+    "that", "this", "visualize", "analysis", "analyze", "calculate", "display", "stress",
+    "under", "span", "spanning", "carrying", "subjected", "using", "loaded"
+}
+# Units are converted to N / m / kg / Pa so "5 kN" and "5000N" match
+UNIT_FACTORS = {
+    "n": ("n", 1), "kn": ("n", 1e3), "mn": ("n", 1e6),
+    "m": ("m", 1), "mm": ("m", 1e-3), "cm": ("m", 1e-2), "km": ("m", 1e3),
+    "kg": ("kg", 1), "t": ("kg", 1e3),
+    "pa": ("pa", 1), "kpa": ("pa", 1e3), "mpa": ("pa", 1e6), "gpa": ("pa", 1e9)
+}
+_NUMBER_UNIT = re.compile(r"(\d+(?:\.\d+)?)\s*(kn|mn|n|km|mm|cm|m|kg|t|gpa|mpa|kpa|pa)\b")
+_TOKEN = re.compile(r"\d+(?:\.\d+)?[a-z]*|[a-z]+")
+
+
+def _to_si(match: re.Match) -> str:
+    unit, factor = UNIT_FACTORS[match.group(2)]
+    value = f"{float(match.group(1)) * factor:.6f}".rstrip("0").rstrip(".")
+    return f"{value}{unit}"
+
+
+def _prompt_tokens(prompt: str) -> List[str]:
+    text = _NUMBER_UNIT.sub(_to_si, prompt.lower())
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token in STOPWORDS:
+            continue
+        if token[0].isalpha() and len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, drop filler words and sort, so reworded prompts normalize alike"""
+    return " ".join(sorted(set(_prompt_tokens(prompt))))
+
+
+def prompt_order(prompt: str) -> str:
+    """The normalized words in their original order, numbers left out (they're compared separately)"""
+    return " ".join(token for token in _prompt_tokens(prompt) if not token[0].isdigit())
+
+
+def prompt_bigrams(order: str) -> frozenset:
+    words = ["^"] + order.split() + ["$"]
+    return frozenset(zip(words, words[1:]))
+
+
+def similarity_scope(complexity: str, structure_type: str = "auto", preferences: Optional[Dict[str, Any]] = None) -> str:
+    """Prompts only match within the same complexity, structure type and preferences"""
+    digest = zlib.crc32(json.dumps(preferences or {}, sort_keys=True, default=str).encode())
+    return f"{complexity}|{structure_type}|{digest:08x}"
+
+
+def prompt_shingles(normalized: str) -> frozenset:
+    """Character trigrams of each word; numbers are kept as single shingles"""
+    shingles = set()
+    for token in normalized.split():
+        if token[0].isdigit():
+            shingles.add(f"#{token}")
+            continue
+        padded = f" {token} "
+        shingles.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(shingles)
+
+
+def prompt_numbers(normalized: str) -> frozenset:
+    return frozenset(token for token in normalized.split() if token[0].isdigit())
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hashes(shingle: str) -> Tuple[int, ...]:
+    x = zlib.crc32(shingle.encode())
+    return tuple((a * x + b) % _MERSENNE for a, b in _PERMUTATIONS)
+
+
+def minhash_signature(shingles: frozenset) -> Tuple[int, ...]:
+    return tuple(map(min, zip(*map(_shingle_hashes, shingles))))
+
+
+@dataclass
+class SimilarPrompt:
+    simulation_id: str
+    prompt: str
+    score: float
+    same_numbers: bool
+    same_order: bool = False
+    scope: str = ""
+    order: str = ""
+
+
+@dataclass
+class _Entry:
+    prompt: str
+    order: str
+    scope: str
+    simulation_id: Optional[str]
+    band_keys: List[int]
+
+
+class SimilarityIndex:
+    """In-process MinHash LSH index of past prompts, keyed to stored simulations.
+
+    Entries are appended to a Redis list (or, without Redis, a JSONL file) and
+    every worker replays new entries before a lookup, so the index stays
+    current across workers and restarts without rebuilding it. The list keeps
+    the newest max_entries; TRIMMED_KEY counts what was cut from its head so
+    workers can still address entries by their absolute position. Each worker
+    also keeps only the newest max_entries in memory, evicting the oldest.
+    """
+
+    def __init__(self, redis_client=None, path: str = "", max_entries: int = 20000):
+        self.redis_client = redis_client
+        self.path = path
+        self.max_entries = max_entries
+        # Lookups only sync once the startup replay has caught up (see load)
+        self.ready = False
+        # entry id -> entry, oldest first
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._by_prompt: Dict[Tuple[str, str, str], int] = {}
+        # band -> band hash -> entry id, or a list of them once shared
+        self._bands: List[Dict[int, Any]] = [{} for _ in range(BANDS)]
+        self._synced = 0  # Absolute position in the persisted list, trimmed entries included
+        self._trimmed = 0
+        self._file_entries = 0
+        # Held while entries are applied or read; replay runs in a worker thread
+        self._lock = threading.Lock()
+        self._loader: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def start(self):
+        """Replay persisted entries in a worker thread; until it finishes, lookups see what's loaded so far"""
+        self._loader = asyncio.create_task(asyncio.to_thread(self.load))
+
+    def load(self):
+        """Replay every persisted entry, a chunk at a time; safe to run in a worker thread"""
+        try:
+            if self.redis_client is None and self.path and os.path.exists(self.path):
+                entries = self._compact_file()
+                for start in range(0, len(entries), REPLAY_CHUNK):
+                    with self._lock:
+                        for entry in entries[start:start + REPLAY_CHUNK]:
+                            self._apply(entry)
+            while self._sync(REPLAY_CHUNK):
+                pass
+        except Exception as e:
+            print(f"Similarity index replay failed: {e}")
+        self.ready = True
+
+    def sync(self):
+        """Apply entries other workers have added since the last sync"""
+        if self.ready:
+            self._sync()
+
+    def _sync(self, limit: Optional[int] = None) -> int:
+        if self.redis_client is None:
+            return 0
+        with self._lock:
+            try:
+                for _ in range(3):
+                    begin = max(0, self._synced - self._trimmed)
+                    end = -1 if limit is None else begin + limit - 1
+                    # Read the trim count with the entries so positions can't shift in between
+                    pipeline = self.redis_client.pipeline(transaction=True)
+                    pipeline.get(TRIMMED_KEY)
+                    pipeline.lrange(REDIS_KEY, begin, end)
+                    trimmed, raw_entries = pipeline.execute()
+                    trimmed = int(trimmed or 0)
+                    if trimmed == self._trimmed:
+                        break
+                    # Trimmed since the last read: entries before the new head are gone
+                    self._trimmed = trimmed
+                    self._synced = max(self._synced, trimmed)
+                else:
+                    return 0
+                for raw in raw_entries:
+                    self._apply(json.loads(raw))
+                self._synced += len(raw_entries)
+                return len(raw_entries)
+            except Exception as e:
+                print(f"Similarity index sync failed: {e}")
+                return 0
+
+    def add(self, prompt: str, scope: str, simulation_id: str):
+        """Index a prompt whose generated simulation is stored under simulation_id"""
+        entry = {"prompt": normalize_prompt(prompt), "order": prompt_order(prompt), "scope": scope,
+                 "simulation_id": simulation_id}
+        if not entry["prompt"]:
+            return
+        if self.redis_client is not None:
+            try:
+                length = self.redis_client.rpush(REDIS_KEY, json.dumps(entry))
+                if length > self.max_entries * (1 + TRIM_SLACK):
+                    self._trim(length - self.max_entries)
+                self.sync()
+                return
+            except Exception as e:
+                print(f"Similarity index persist failed: {e}")
+        elif self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._file_entries += 1
+            if self._file_entries > self.max_entries * (1 + TRIM_SLACK):
+                self._compact_file()
+        with self._lock:
+            self._apply(entry)
+
+    def discard(self, similar: SimilarPrompt):
+        """Stop matching an entry whose simulation no longer exists"""
+        with self._lock:
+            entry_id = self._by_prompt.get((similar.scope, similar.prompt, similar.order))
+            if entry_id is not None and self._entries[entry_id].simulation_id == similar.simulation_id:
+                self._entries[entry_id].simulation_id = None
+
+    def _trim(self, excess: int):
+        # Concurrent trims each drop their own excess and count it, so positions stay consistent
+        pipeline = self.redis_client.pipeline(transaction=True)
+        pipeline.ltrim(REDIS_KEY, excess, -1)
+        pipeline.incrby(TRIMMED_KEY, excess)
+        pipeline.execute()
+
+    def _compact_file(self) -> List[Dict[str, str]]:
+        """Keep the newest max_entries lines of the JSONL file; returns them"""
+        with open(self.path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        if len(entries) > self.max_entries:
+            entries = entries[-self.max_entries:]
+            with open(self.path + ".tmp", "w") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+            os.replace(self.path + ".tmp", self.path)
+        self._file_entries = len(entries)
+        return entries
+
+    def _apply(self, entry: Dict[str, str]):
+        # Entries written before scopes existed only carry their complexity and never match a scope
+        scope = entry.get("scope", entry.get("complexity", ""))
+        key = (scope, entry["prompt"], entry.get("order", ""))
+        existing = self._by_prompt.get(key)
+        if existing is not None:
+            # Same prompt again: point at the newest simulation and count it as new
+            self._entries[existing].simulation_id = entry["simulation_id"]
+            self._entries.move_to_end(existing)
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        band_keys = self._band_keys(minhash_signature(prompt_shingles(entry["prompt"])))
+        self._entries[entry_id] = _Entry(entry["prompt"], key[2], scope, entry["simulation_id"], band_keys)
+        self._by_prompt[key] = entry_id
+        for band, bucket_key in enumerate(band_keys):
+            buckets = self._bands[band]
+            bucket = buckets.get(bucket_key)
+            if bucket is None:
+                buckets[bucket_key] = entry_id
+            elif isinstance(bucket, list):
+                bucket.append(entry_id)
+            else:
+                buckets[bucket_key] = [bucket, entry_id]
+
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        entry_id, entry = self._entries.popitem(last=False)
+        del self._by_prompt[(entry.scope, entry.prompt, entry.order)]
+        for band, bucket_key in enumerate(entry.band_keys):
+            buckets = self._bands[band]
+            bucket = buckets[bucket_key]
+            if not isinstance(bucket, list):
+                del buckets[bucket_key]
+                continue
+            bucket.remove(entry_id)
+            if len(bucket) == 1:
+                buckets[bucket_key] = bucket[0]
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[int]:
+        return [hash(signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+    def lookup(self, prompt: str, scope: str) -> Optional[SimilarPrompt]:
+        """Most similar indexed prompt in the same scope, if any shares a band"""
+        matches = self.candidates(prompt, scope)
+        return matches[0] if matches else None
+
+    def candidates(self, prompt: str, scope: str) -> List[SimilarPrompt]:
+        """Indexed prompts in the same scope sharing a band, most similar first"""
+        self.sync()
+        normalized = normalize_prompt(prompt)
+        if not normalized or not self._entries:
+            return []
+
+        with self._lock:
+            shingles = prompt_shingles(normalized)
+            order = prompt_order(prompt)
+            # Rank candidates by how many bands they share before the exact comparison
+            votes = Counter()
+            exact = self._by_prompt.get((scope, normalized, order))
+            if exact is not None:
+                votes[exact] = BANDS + 1
+            for band, bucket_key in enumerate(self._band_keys(minhash_signature(shingles))):
+                bucket = self._bands[band].get(bucket_key)
+                if bucket is None:
+                    continue
+                votes.update(bucket[-MAX_BUCKET_SCAN:] if isinstance(bucket, list) else (bucket,))
+
+            numbers = prompt_numbers(normalized)
+            bigrams = prompt_bigrams(order)
+            matches = []
+            for entry_id, _ in votes.most_common(MAX_CANDIDATES):
+                entry = self._entries[entry_id]
+                if entry.scope != scope or entry.simulation_id is None:
+                    continue
+                if entry_id == exact:
+                    score = 1.0
+                else:
+                    other = prompt_shingles(entry.prompt)
+                    score = len(shingles & other) / len(shingles | other)
+                matches.append(SimilarPrompt(
+                    entry.simulation_id, entry.prompt, score,
+                    entry_id == exact or prompt_numbers(entry.prompt) == numbers,
+                    entry_id == exact or prompt_bigrams(entry.order) == bigrams,
+                    scope, entry.order
+                ))
+        # Among equal scores, prefer the one that could be reused
+        matches.sort(key=lambda match: (match.score, match.same_numbers and match.same_order), reverse=True)
+        return matches
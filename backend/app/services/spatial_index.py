@@ -0,0 +1,440 @@
+import asyncio
+import heapq
+import json
+import math
+import re
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from ..utils.scene_geometry import Vec3, member_segment, user_data, user_number, EPSILON
+from ..utils.request_trace import stage
+from .session_manager import SessionManager
+
+# Uniform grid over scene members for point, box, ray and nearest-neighbour
+# queries. Members are segments with a radius; each is registered in the cells
+# its segment passes through. Cell size is the median member length, so most
+# members touch one or two cells and a query only looks at a few of them.
+
+MAX_CELLS_PER_AXIS = 1024
+CACHE_SIZE = 64
+THREAD_THRESHOLD = 500  # Members above which an index is built in a worker thread
+JOINT_TOLERANCE = 0.05  # Distance at which members count as meeting at a joint
+MAX_CONNECTED = 10
+_FIELDS = 8  # start xyz, end xyz, radius, stress
+
+
+class SceneIndex:
+    """Spatial index over the members of one scene"""
+
+    def __init__(self, ids: List[str], element_types: List[str], data: array):
+        self.ids = ids
+        self.element_types = element_types
+        self.data = data
+        self.count = len(ids)
+        self.by_id = {member_id: i for i, member_id in enumerate(ids)}
+        self.max_radius = max((data[i * _FIELDS + 6] for i in range(self.count)), default=0.0)
+        self._build_grid()
+
+    @classmethod
+    def from_scene(cls, scene: Dict[str, Any],
+                   segments: Optional[List[Tuple[Vec3, Vec3, float]]] = None) -> "SceneIndex":
+        """Index a scene's meshes; pass segments when member_segment has already been computed"""
+        ids, element_types, data = [], [], array("d")
+        for position, mesh in enumerate(scene.get("meshes", [])):
+            start, end, radius = segments[position] if segments else member_segment(mesh)
+            ids.append(str(mesh.get("id", f"mesh_{position}")))
+            element_types.append(str(user_data(mesh).get("element_type") or ""))
+            data.extend(start)
+            data.extend(end)
+            data.append(radius)
+            data.append(user_number(mesh, "stress_level"))
+        return cls(ids, element_types, data)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({"ids": self.ids, "element_types": self.element_types}).encode()
+        return header + b"\n" + self.data.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "SceneIndex":
+        header, _, body = raw.partition(b"\n")
+        meta = json.loads(header)
+        data = array("d")
+        data.frombytes(body)
+        return cls(meta["ids"], meta["element_types"], data)
+
+    def _build_grid(self):
+        d = self.data
+        self.cells: Dict[Tuple[int, int, int], List[int]] = {}
+        if not self.count:
+            self.cell = 1.0
+            self.low = self.high = (0.0, 0.0, 0.0)
+            return
+
+        lows, highs = [math.inf] * 3, [-math.inf] * 3
+        lengths = []
+        for i in range(self.count):
+            base = i * _FIELDS
+            for axis in range(3):
+                a, b = d[base + axis], d[base + 3 + axis]
+                lows[axis] = min(lows[axis], a, b)
+                highs[axis] = max(highs[axis], a, b)
+            lengths.append(math.dist(d[base:base + 3], d[base + 3:base + 6]))
+        lengths.sort()
+        extent = max(highs[axis] - lows[axis] for axis in range(3))
+        self.low = tuple(lows)
+        self.high = tuple(highs)
+        self.cell = max(lengths[len(lengths) // 2], extent / MAX_CELLS_PER_AXIS, EPSILON)
+
+        cells = self.cells
+        for i in range(self.count):
+            for key in self._member_cells(i):
+                bucket = cells.get(key)
+                if bucket is None:
+                    cells[key] = [i]
+                else:
+                    bucket.append(i)
+
+    def _cell_of(self, point: Iterable[float]) -> Tuple[int, int, int]:
+        low, cell = self.low, self.cell
+        x, y, z = point
+        return (int((x - low[0]) // cell), int((y - low[1]) // cell), int((z - low[2]) // cell))
+
+    def _member_cells(self, i: int) -> List[Tuple[int, int, int]]:
+        """Every cell the member (segment grown by its radius) touches"""
+        d, base = self.data, i * _FIELDS
+        start, end, radius = d[base:base + 3], d[base + 3:base + 6], d[base + 6]
+        lo = self._cell_of([min(start[a], end[a]) - radius for a in range(3)])
+        hi = self._cell_of([max(start[a], end[a]) + radius for a in range(3)])
+        box = [(x, y, z) for x in range(lo[0], hi[0] + 1)
+               for y in range(lo[1], hi[1] + 1)
+               for z in range(lo[2], hi[2] + 1)]
+        # Axis-aligned members fill their bounding box; others only some of it
+        if len(box) <= 8 or sum(abs(end[a] - start[a]) > EPSILON for a in range(3)) <= 1:
+            return box
+        cell, low = self.cell, self.low
+        return [key for key in box if _segment_hits_box(
+            start, end, radius,
+            (low[0] + key[0] * cell, low[1] + key[1] * cell, low[2] + key[2] * cell),
+            (low[0] + (key[0] + 1) * cell, low[1] + (key[1] + 1) * cell, low[2] + (key[2] + 1) * cell)
+        )]
+
+    def _candidates(self, low: Vec3, high: Vec3) -> set:
+        """Members registered in any cell overlapping a box"""
+        lo, hi = self._cell_of(low), self._cell_of(high)
+        span = (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1)
+        found = set()
+        cells = self.cells
+        if span > len(cells):
+            # Box larger than the occupied grid: walk occupied cells instead
+            for key, members in cells.items():
+                if lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]:
+                    found.update(members)
+            return found
+        for x in range(lo[0], hi[0] + 1):
+            for y in range(lo[1], hi[1] + 1):
+                for z in range(lo[2], hi[2] + 1):
+                    members = cells.get((x, y, z))
+                    if members:
+                        found.update(members)
+        return found
+
+    def distance(self, i: int, point: Vec3) -> float:
+        """Distance from a point to the surface of member i (0 inside it)"""
+        d, base = self.data, i * _FIELDS
+        sx, sy, sz, ex, ey, ez, radius = d[base:base + 7]
+        dx, dy, dz = ex - sx, ey - sy, ez - sz
+        length2 = dx * dx + dy * dy + dz * dz
+        t = 0.0
+        if length2 > EPSILON:
+            t = max(0.0, min(1.0, ((point[0] - sx) * dx + (point[1] - sy) * dy + (point[2] - sz) * dz) / length2))
+        cx, cy, cz = sx + dx * t - point[0], sy + dy * t - point[1], sz + dz * t - point[2]
+        return max(0.0, math.sqrt(cx * cx + cy * cy + cz * cz) - radius)
+
+    def closest_point(self, i: int, point: Vec3) -> Vec3:
+        """Point on the axis of member i closest to a point"""
+        d, base = self.data, i * _FIELDS
+        start, end = d[base:base + 3], d[base + 3:base + 6]
+        delta = (end[0] - start[0], end[1] - start[1], end[2] - start[2])
+        length2 = _dot3(delta, delta)
+        t = 0.0
+        if length2 > EPSILON:
+            t = max(0.0, min(1.0, _dot3((point[0] - start[0], point[1] - start[1], point[2] - start[2]), delta) / length2))
+        return (start[0] + delta[0] * t, start[1] + delta[1] * t, start[2] + delta[2] * t)
+
+    def within(self, point: Vec3, radius: float) -> List[Tuple[int, float]]:
+        """(member, distance) for members within radius of a point, nearest first"""
+        low = (point[0] - radius, point[1] - radius, point[2] - radius)
+        high = (point[0] + radius, point[1] + radius, point[2] + radius)
+        hits = []
+        for i in self._candidates(low, high):
+            distance = self.distance(i, point)
+            if distance <= radius:
+                hits.append((i, distance))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+    def in_box(self, low: Vec3, high: Vec3) -> List[int]:
+        """Members whose segment (grown by its radius) intersects an axis-aligned box"""
+        d = self.data
+        hits = []
+        for i in self._candidates(low, high):
+            base = i * _FIELDS
+            if _segment_hits_box(d[base:base + 3], d[base + 3:base + 6], d[base + 6], low, high):
+                hits.append(i)
+        return hits
+
+    def nearest(self, point: Vec3, k: int) -> List[Tuple[int, float]]:
+        """k members closest to a point, searching rings of cells outward"""
+        if not self.count or k <= 0:
+            return []
+        k = min(k, self.count)
+        center = self._cell_of(point)
+        best: List[Tuple[float, int]] = []  # max-heap via negated distance
+        seen = set()
+        ring = 0
+        while True:
+            if (2 * ring + 1) ** 3 > 8 * len(self.cells):
+                # Far from the structure: rings would cover mostly empty cells
+                return sorted(((i, self.distance(i, point)) for i in range(self.count)), key=lambda hit: hit[1])[:k]
+            for key in _ring_cells(center, ring):
+                for i in self.cells.get(key, ()):
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    distance = self.distance(i, point)
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, i))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, i))
+            # Any surface point closer than ring * cell lies in a ring already searched
+            if len(best) == k and -best[0][0] <= ring * self.cell:
+                break
+            ring += 1
+        return sorted(((i, -negative) for negative, i in best), key=lambda hit: hit[1])
+
+    def ray(self, origin: Vec3, direction: Vec3, limit: int = 1,
+            max_distance: Optional[float] = None) -> List[Tuple[int, float]]:
+        """(member, distance along the ray) for the first `limit` members the ray passes through"""
+        norm = math.sqrt(_dot3(direction, direction))
+        if norm < EPSILON or not self.count:
+            return []
+        direction = (direction[0] / norm, direction[1] / norm, direction[2] / norm)
+
+        # Clip the ray to the occupied grid
+        pad = self.max_radius + EPSILON
+        t_enter, t_exit = 0.0, math.inf if max_distance is None else max_distance
+        for a in range(3):
+            lo, hi = self.low[a] - pad, self.high[a] + pad
+            if abs(direction[a]) < EPSILON:
+                if origin[a] < lo or origin[a] > hi:
+                    return []
+                continue
+            ta, tb = (lo - origin[a]) / direction[a], (hi - origin[a]) / direction[a]
+            if ta > tb:
+                ta, tb = tb, ta
+            t_enter, t_exit = max(t_enter, ta), min(t_exit, tb)
+        if t_enter > t_exit:
+            return []
+
+        # Walk the cells the ray crosses (Amanatides & Woo)
+        cell, low = self.cell, self.low
+        entry = [origin[a] + direction[a] * t_enter for a in range(3)]
+        key = list(self._cell_of(entry))
+        step, t_next, t_delta = [0, 0, 0], [math.inf] * 3, [math.inf] * 3
+        for a in range(3):
+            if direction[a] > EPSILON:
+                step[a] = 1
+                t_next[a] = t_enter + (low[a] + (key[a] + 1) * cell - entry[a]) / direction[a]
+                t_delta[a] = cell / direction[a]
+            elif direction[a] < -EPSILON:
+                step[a] = -1
+                t_next[a] = t_enter + (low[a] + key[a] * cell - entry[a]) / direction[a]
+                t_delta[a] = -cell / direction[a]
+
+        hits: Dict[int, float] = {}
+        tested = set()
+        t = t_enter
+        while t <= t_exit:
+            for i in self.cells.get(tuple(key), ()):
+                if i in tested:
+                    continue
+                tested.add(i)
+                hit = self._ray_hit(i, origin, direction)
+                if hit is not None and (max_distance is None or hit <= max_distance):
+                    hits[i] = hit
+            axis = t_next.index(min(t_next))
+            t = t_next[axis]
+            # Members not yet seen pass closest to the ray in a later cell
+            if len(hits) >= limit and heapq.nsmallest(limit, hits.values())[-1] <= t:
+                break
+            key[axis] += step[axis]
+            t_next[axis] += t_delta[axis]
+        return sorted(hits.items(), key=lambda hit: hit[1])[:limit]
+
+    def _ray_hit(self, i: int, origin: Vec3, direction: Vec3) -> Optional[float]:
+        """Distance along a (unit) ray to its closest approach with member i, if within its radius"""
+        d, base = self.data, i * _FIELDS
+        start, end, radius = d[base:base + 3], d[base + 3:base + 6], d[base + 6]
+        u = (end[0] - start[0], end[1] - start[1], end[2] - start[2])
+        w = (origin[0] - start[0], origin[1] - start[1], origin[2] - start[2])
+        a = _dot3(u, u)
+        b = _dot3(u, direction)
+        denominator = a - b * b
+        if a < EPSILON:
+            s = 0.0
+        elif denominator < EPSILON:
+            # Parallel: any point of the member will do
+            s = max(0.0, min(1.0, _dot3(u, w) / a))
+        else:
+            s = max(0.0, min(1.0, (_dot3(u, w) - b * _dot3(direction, w)) / denominator))
+        point = (start[0] + u[0] * s, start[1] + u[1] * s, start[2] + u[2] * s)
+        t = max(0.0, _dot3((point[0] - origin[0], point[1] - origin[1], point[2] - origin[2]), direction))
+        if a >= EPSILON:
+            # Re-project from the ray point back onto the member
+            ray_point = (origin[0] + direction[0] * t, origin[1] + direction[1] * t, origin[2] + direction[2] * t)
+            s = max(0.0, min(1.0, _dot3((ray_point[0] - start[0], ray_point[1] - start[1], ray_point[2] - start[2]), u) / a))
+            point = (start[0] + u[0] * s, start[1] + u[1] * s, start[2] + u[2] * s)
+            t = max(0.0, _dot3((point[0] - origin[0], point[1] - origin[1], point[2] - origin[2]), direction))
+        ray_point = (origin[0] + direction[0] * t, origin[1] + direction[1] * t, origin[2] + direction[2] * t)
+        if math.dist(point, ray_point) > radius:
+            return None
+        return t
+
+    def member(self, i: int, distance: Optional[float] = None) -> Dict[str, Any]:
+        d, base = self.data, i * _FIELDS
+        hit = {
+            "id": self.ids[i],
+            "element_type": self.element_types[i],
+            "stress_level": d[base + 7],
+            "start": list(d[base:base + 3]),
+            "end": list(d[base + 3:base + 6])
+        }
+        if distance is not None:
+            hit["distance"] = round(distance, 6)
+        return hit
+
+    def stress(self, i: int) -> float:
+        return self.data[i * _FIELDS + 7]
+
+
+def _dot3(a, b) -> float:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _ring_cells(center: Tuple[int, int, int], ring: int) -> set:
+    """Cells at Chebyshev distance `ring` from center"""
+    if ring == 0:
+        return {center}
+    cx, cy, cz = center
+    cells = set()
+    for x in range(cx - ring, cx + ring + 1):
+        for y in range(cy - ring, cy + ring + 1):
+            if abs(x - cx) == ring or abs(y - cy) == ring:
+                for z in range(cz - ring, cz + ring + 1):
+                    cells.add((x, y, z))
+            else:
+                cells.add((x, y, cz - ring))
+                cells.add((x, y, cz + ring))
+    return cells
+
+
+def _segment_hits_box(start, end, radius: float, low: Vec3, high: Vec3) -> bool:
+    """Slab test of a segment against a box grown by radius"""
+    t0, t1 = 0.0, 1.0
+    for a in range(3):
+        delta = end[a] - start[a]
+        lo, hi = low[a] - radius, high[a] + radius
+        if abs(delta) < EPSILON:
+            if start[a] < lo or start[a] > hi:
+                return False
+            continue
+        ta, tb = (lo - start[a]) / delta, (hi - start[a]) / delta
+        if ta > tb:
+            ta, tb = tb, ta
+        t0, t1 = max(t0, ta), min(t1, tb)
+        if t0 > t1:
+            return False
+    return True
+
+
+class SceneIndexCache:
+    """Builds scene indexes on first query and keeps them per simulation.
+
+    Built indexes stay in this worker's memory (LRU) and are written next to
+    the simulation in Redis as "simulation:{id}:index", so other workers load
+    the packed member geometry instead of recomputing it from the meshes.
+    """
+
+    def __init__(self, session_manager: SessionManager, cache_size: int = CACHE_SIZE):
+        self.session_manager = session_manager
+        self.cache_size = cache_size
+        self._indexes: "OrderedDict[str, SceneIndex]" = OrderedDict()
+
+    async def get(self, simulation_id: str, simulation: Optional[Dict[str, Any]] = None) -> Optional[SceneIndex]:
+        with stage("scene_index"):
+            return await self._get(simulation_id, simulation)
+
+    async def _get(self, simulation_id: str, simulation: Optional[Dict[str, Any]]) -> Optional[SceneIndex]:
+        index = self._indexes.get(simulation_id)
+        if index is not None:
+            self._indexes.move_to_end(simulation_id)
+            return index
+
+        redis_client = self.session_manager.redis_client
+        key = f"simulation:{simulation_id}:index"
+        raw = redis_client.get(key) if redis_client else None
+        if raw:
+            index = await self._build(SceneIndex.from_bytes, raw, len(raw) // (_FIELDS * 8))
+        else:
+            simulation = simulation or await self.session_manager.get_simulation(simulation_id)
+            if not simulation:
+                return None
+            scene = simulation.get("scene", {})
+            index = await self._build(SceneIndex.from_scene, scene, len(scene.get("meshes", [])))
+            if redis_client:
+                # Expires with the simulation it indexes
+                redis_client.setex(key, self.session_manager.session_timeout, index.to_bytes())
+
+        self.put(simulation_id, index)
+        return index
+
+    def put(self, simulation_id: str, index: SceneIndex):
+        """Cache an index built elsewhere (e.g. during validation) for this worker's queries"""
+        self._indexes[simulation_id] = index
+        self._indexes.move_to_end(simulation_id)
+        if len(self._indexes) > self.cache_size:
+            self._indexes.popitem(last=False)
+
+    async def _build(self, build, source, members: int) -> SceneIndex:
+        # Large scenes take a while to index; keep that off the event loop
+        if members > THREAD_THRESHOLD:
+            return await asyncio.to_thread(build, source)
+        return build(source)
+
+
+_MOST_STRESSED = re.compile(r"\b(most|highest|max(?:imum)?)[- ]?(stressed|stress|loaded)\b", re.IGNORECASE)
+_MEMBER_ID = re.compile(r"\b[A-Za-z][\w-]*\d\w*\b")
+
+
+def mentions_members(message: str) -> bool:
+    """Whether a chat message may target specific members (an id-like token or "most stressed")"""
+    return bool(_MOST_STRESSED.search(message) or _MEMBER_ID.search(message))
+
+
+def focus_members(index: SceneIndex, message: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Members a chat message refers to (by id, or "most stressed") with the members meeting them"""
+    targets = [index.by_id[token] for token in _MEMBER_ID.findall(message) if token in index.by_id]
+    if _MOST_STRESSED.search(message) and index.count:
+        targets.append(max(range(index.count), key=index.stress))
+
+    focus = []
+    for i in list(dict.fromkeys(targets))[:limit]:
+        member = index.member(i)
+        # Members touching either end
+        touching = set()
+        for point in (member["start"], member["end"]):
+            touching.update(j for j, _ in index.within(tuple(point), JOINT_TOLERANCE))
+        touching.discard(i)
+        member["connected_to"] = [index.ids[j] for j in sorted(touching)][:MAX_CONNECTED]
+        focus.append(member)
+    return focus
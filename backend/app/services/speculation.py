@@ -0,0 +1,331 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from ..config import settings
+from ..models.chat_models import ChatMessage, ChatRequest
+from ..utils.request_trace import stage
+from .edit_engine import parse_edit, LOCAL_EDIT_MODEL
+from .session_manager import SessionManager
+
+# Speculative follow-ups.
+#
+# After a simulation is stored, the next chat message is usually one of a few
+# edits ("make it longer", "add a support", "double the load"). The worker
+# runs the most likely of them ahead of time through
+# ChatService.generate_update, so the local edit engine takes what it can.
+# The LLM is only used for the rest when given a per-minute budget, which is
+# zero by default. Each result
+# is stored as "session:{id}:speculative:{key}" for the simulation it was
+# computed from; a live message asking for the same edit gets it back at once.
+#
+# Speculation never competes with live traffic: it waits until no request is
+# in flight, takes at most speculation_cpu_share of the time it runs, and a
+# session's remaining follow-ups are abandoned as soon as a live message
+# arrives for it or it has been idle for speculation_idle_timeout seconds.
+
+# Likely follow-ups with prior weights; follow-ups users actually send are
+# counted per worker and outrank these after a few sightings. All of them are
+# edits the local engine takes, so the defaults cost no LLM calls
+FOLLOW_UPS = [
+    ("make it longer", 1.0),
+    ("add a support in the middle", 0.9),
+    ("double the load", 0.8),
+    ("make it taller", 0.7),
+    ("make it shorter", 0.6),
+    ("switch to concrete", 0.5),
+    ("make it wider", 0.4),
+    ("halve the load", 0.3),
+]
+
+MAX_QUEUED = 256  # Sessions waiting for speculation; the oldest are dropped
+MAX_OBSERVED = 256  # Distinct follow-ups counted for ranking
+OBSERVED_DECAY = 0.98  # Weight kept by earlier sightings on each new one
+THREAD_THRESHOLD = 500  # Members above which a variant is encoded in a worker thread
+
+
+class LiveTraffic:
+    """Counts live requests in flight so background work can wait for a quiet moment"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._quiet = asyncio.Event()
+        self._quiet.set()
+
+    @contextmanager
+    def request(self):
+        self.in_flight += 1
+        self._quiet.clear()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._quiet.set()
+
+    async def wait_quiet(self):
+        await self._quiet.wait()
+
+
+@dataclass
+class _Job:
+    session_id: str
+    simulation: Dict[str, Any]
+    history: List[ChatMessage]
+    generation: int
+
+
+_WORDS = re.compile(r"[a-z0-9.]+")
+
+
+def follow_up_key(message: str) -> str:
+    """Key shared by messages asking for the same edit.
+
+    The parsed edit when the local engine would take the message, so "make it
+    longer" and "lengthen it" match; otherwise the message's words.
+    """
+    plan = parse_edit(message) if settings.local_edit_enabled else None
+    if plan and plan.confidence >= settings.local_edit_min_confidence:
+        return "edit:" + json.dumps([
+            [i.action, i.axis, i.factor, i.delta, i.target, i.position, i.direction, i.material, i.member]
+            for i in plan.intents
+        ])
+    return "text:" + " ".join(_WORDS.findall(message.lower()))
+
+
+class SpeculationWorker:
+    """Precomputes the likely next chat turns of recently updated sessions"""
+
+    def __init__(self, session_manager: SessionManager, traffic: LiveTraffic):
+        self.session_manager = session_manager
+        self.traffic = traffic
+        # Enabled once start() has been given the chat service; until then nothing is queued
+        self.enabled = False
+        self._chat_service = None
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Bumped by every live turn and new job, so running jobs notice they are stale
+        self._generation: Dict[str, int] = {}
+        self._last_activity: Dict[str, float] = {}
+        self._written: Dict[str, List[str]] = {}
+        self._memory_store: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._priors = {follow_up_key(message): (weight, message) for message, weight in FOLLOW_UPS}
+        self._observed: Dict[str, List] = {}
+        self._llm_calls = float(settings.speculation_llm_calls_per_minute)
+        self._llm_refilled_at = time.monotonic()
+        self.counters = {"scheduled": 0, "computed": 0, "llm_calls": 0, "abandoned": 0, "hits": 0, "misses": 0}
+
+    async def start(self, chat_service):
+        """Start the background worker, generating follow-ups with chat_service"""
+        if not settings.speculation_enabled:
+            return
+        self._chat_service = chat_service
+        self._task = asyncio.create_task(self._run())
+        self.enabled = True
+
+    async def stop(self):
+        self.enabled = False
+        self._jobs.clear()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, session_id: str, simulation: Dict[str, Any], history: List[ChatMessage]):
+        """Queue the likely follow-ups to a simulation just stored for a session"""
+        if not self.enabled:
+            return
+        generation = self._touch(session_id)
+        if len(simulation.get("scene", {}).get("meshes", [])) > settings.speculation_max_members:
+            return
+        self._jobs[session_id] = _Job(session_id, simulation, list(history), generation)
+        self._jobs.move_to_end(session_id)
+        self.counters["scheduled"] += 1
+        while len(self._jobs) > MAX_QUEUED:
+            self._jobs.popitem(last=False)
+            self.counters["abandoned"] += 1
+        self._wake.set()
+
+    async def take(self, request: ChatRequest, current_simulation: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """The precomputed update for a live message, if that follow-up was speculated on the current simulation"""
+        if not settings.speculation_enabled:
+            return None
+
+        start_time = time.perf_counter()
+        key = follow_up_key(request.message)
+        self._observe(key, request.message)
+        # Whatever this session had queued or running is about to be out of date
+        self._touch(request.session_id)
+        self._jobs.pop(request.session_id, None)
+
+        name = self._variant_name(request.session_id, key)
+        with stage("speculation"):
+            variant = self._read(name)
+            self._delete(self._written.pop(request.session_id, []) + [name])
+
+        base_id = (current_simulation or {}).get("simulation_id")
+        if not variant or not base_id or variant["base_simulation_id"] != base_id:
+            self.counters["misses"] += 1
+            return None
+
+        self.counters["hits"] += 1
+        update = variant["update"]
+        update["metadata"].update({
+            "generated_at": datetime.now(),
+            "processing_time": round(time.perf_counter() - start_time, 3),
+            "speculative": True
+        })
+        return update
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": len(self._jobs),
+            "live_requests": self.traffic.in_flight,
+            **self.counters
+        }
+
+    async def _run(self):
+        while True:
+            if not self._jobs:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            _, job = self._jobs.popitem(last=False)
+            try:
+                await self._speculate(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Speculation failed for session {job.session_id}: {e}")
+            self._prune()
+
+    async def _speculate(self, job: _Job):
+        # Follow-ups written for this session's previous simulation can no longer match
+        self._delete(self._written.pop(job.session_id, []))
+
+        for message in self._candidates():
+            # Live requests first
+            await self.traffic.wait_quiet()
+            if not self._current(job):
+                self.counters["abandoned"] += 1
+                return
+
+            llm_allowed = self._take_llm_call()
+            request = ChatRequest(session_id=job.session_id, message=message)
+            start_time = time.perf_counter()
+            update = await self._chat_service.generate_update(
+                request, job.history, job.simulation, llm_allowed=llm_allowed
+            )
+            elapsed = time.perf_counter() - start_time
+            used_llm = update is not None and update["metadata"]["llm_model"] not in (LOCAL_EDIT_MODEL, "fallback")
+            if used_llm:
+                self.counters["llm_calls"] += 1
+            elif llm_allowed:
+                self._llm_calls += 1
+
+            if update is not None and self._current(job):
+                await self._write(job, follow_up_key(message), update)
+                self.counters["computed"] += 1
+            if not used_llm:
+                # Local edits run on this process's CPU; keep them to their share
+                await asyncio.sleep(elapsed * (1 / settings.speculation_cpu_share - 1))
+
+    def _candidates(self) -> List[str]:
+        """Top-K follow-ups: prior weight plus how often users have sent each"""
+        scores = {key: [weight, message] for key, (weight, message) in self._priors.items()}
+        for key, (weight, message) in self._observed.items():
+            if key.startswith("text:") and settings.speculation_llm_calls_per_minute <= 0:
+                continue  # Only the LLM could compute it
+            score = scores.setdefault(key, [0.0, message])
+            score[0] += weight
+        ranked = sorted(scores.values(), key=lambda score: score[0], reverse=True)
+        return [message for _, message in ranked[:settings.speculation_top_k]]
+
+    def _observe(self, key: str, message: str):
+        for observed in self._observed.values():
+            observed[0] *= OBSERVED_DECAY
+        observed = self._observed.setdefault(key, [0.0, message])
+        observed[0] += 1.0
+        if len(self._observed) > MAX_OBSERVED:
+            del self._observed[min(self._observed, key=lambda k: self._observed[k][0])]
+
+    def _touch(self, session_id: str) -> int:
+        self._last_activity[session_id] = time.monotonic()
+        self._generation[session_id] = self._generation.get(session_id, 0) + 1
+        return self._generation[session_id]
+
+    def _current(self, job: _Job) -> bool:
+        """False once the session has moved on or gone idle"""
+        idle = time.monotonic() - self._last_activity.get(job.session_id, 0) > settings.speculation_idle_timeout
+        return not idle and self._generation.get(job.session_id) == job.generation
+
+    def _take_llm_call(self) -> bool:
+        # Token bucket holding at most a minute's worth of calls
+        budget = settings.speculation_llm_calls_per_minute
+        now = time.monotonic()
+        self._llm_calls = min(budget, self._llm_calls + (now - self._llm_refilled_at) * budget / 60)
+        self._llm_refilled_at = now
+        if self._llm_calls < 1:
+            return False
+        self._llm_calls -= 1
+        return True
+
+    def _variant_name(self, session_id: str, key: str) -> str:
+        return f"session:{session_id}:speculative:{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+    async def _write(self, job: _Job, key: str, update: Dict[str, Any]):
+        name = self._variant_name(job.session_id, key)
+        variant = {"base_simulation_id": job.simulation.get("simulation_id"), "update": update}
+        redis_client = self.session_manager.redis_client
+        if redis_client:
+            encode = lambda: self.session_manager.codec.encode(json.dumps(variant, default=str))
+            if len(update.get("scene", {}).get("meshes", [])) > THREAD_THRESHOLD:
+                stored = await asyncio.to_thread(encode)
+            else:
+                stored = encode()
+            # Dropped by Redis once the session has been idle this long
+            redis_client.setex(name, settings.speculation_idle_timeout, stored)
+        else:
+            self._memory_store[name] = (time.monotonic() + settings.speculation_idle_timeout, variant)
+        self._written.setdefault(job.session_id, []).append(name)
+
+    def _read(self, name: str) -> Optional[Dict[str, Any]]:
+        redis_client = self.session_manager.redis_client
+        if redis_client:
+            stored = redis_client.get(name)
+            text = self.session_manager.codec.decode(stored) if stored else None
+            return json.loads(text) if text else None
+        expires_at, variant = self._memory_store.get(name, (0, None))
+        return variant if expires_at > time.monotonic() else None
+
+    def _delete(self, names: List[str]):
+        if not names:
+            return
+        redis_client = self.session_manager.redis_client
+        if redis_client:
+            redis_client.delete(*names)
+        else:
+            for name in names:
+                self._memory_store.pop(name, None)
+
+    def _prune(self):
+        """Forget sessions idle past the timeout; their Redis variants expire on their own"""
+        cutoff = time.monotonic() - settings.speculation_idle_timeout
+        for session_id in [s for s, at in self._last_activity.items() if at < cutoff and s not in self._jobs]:
+            del self._last_activity[session_id]
+            self._generation.pop(session_id, None)
+            self._written.pop(session_id, None)
+        now = time.monotonic()
+        for name in [n for n, (expires_at, _) in self._memory_store.items() if expires_at <= now]:
+            del self._memory_store[name]
@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+from functools import lru_cache
+from typing import Dict, Any, List, AsyncIterator, Optional
+from ..config import settings
+from ..templates.stub_recordings import SIMULATE_RECORDINGS, CHAT_RECORDINGS
+
+STUB_MODEL = "stub"
+
+
+class StubProviderError(Exception):
+    """Injected provider failure"""
+
+
+class StubLLMProvider:
+    """Deterministic stand-in for a paid LLM API.
+
+    Replays recorded completions keyed by a hash of the prompt, so the same
+    prompt always gets the same completion. Latency is drawn from a seeded
+    distribution and failures are injected at a fixed rate.
+    """
+
+    def __init__(self, recordings: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 latency_distribution: str = "lognormal", latency_mean_ms: float = 800.0,
+                 latency_jitter: float = 0.3, error_rate: float = 0.0,
+                 chunk_size: int = 64, seed: int = 0):
+        recordings = recordings or {}
+        self.recordings = {
+            "simulate": recordings.get("simulate") or SIMULATE_RECORDINGS,
+            "chat": recordings.get("chat") or CHAT_RECORDINGS
+        }
+        self.latency_distribution = latency_distribution
+        self.latency_mean_ms = latency_mean_ms
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self._random = random.Random(seed)
+
+    async def complete(self, kind: str, prompt: str) -> str:
+        """Return a recorded completion after a simulated provider delay"""
+        await asyncio.sleep(self._sample_latency())
+        self._maybe_fail(kind)
+        return self._select(kind, prompt)
+
+    async def stream(self, kind: str, prompt: str) -> AsyncIterator[str]:
+        """Yield a recorded completion in chunks, like a streaming API"""
+        completion = self._select(kind, prompt)
+        chunks = [completion[i:i + self.chunk_size] for i in range(0, len(completion), self.chunk_size)]
+
+        # Time to first token takes a third of the latency, the rest is spread over the chunks
+        total = self._sample_latency()
+        await asyncio.sleep(total / 3)
+        self._maybe_fail(kind)
+        per_chunk = (total * 2 / 3) / max(len(chunks), 1)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(per_chunk)
+
+    def _select(self, kind: str, prompt: str) -> str:
+        options = self.recordings[kind]
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "big") % len(options)
+        return json.dumps(options[index])
+
+    def _sample_latency(self) -> float:
+        mean = self.latency_mean_ms / 1000
+        if self.latency_distribution == "constant" or mean <= 0:
+            return max(mean, 0.0)
+        if self.latency_distribution == "uniform":
+            spread = mean * self.latency_jitter
+            return self._random.uniform(max(mean - spread, 0.0), mean + spread)
+        # lognormal: long right tail, like real provider latency; sigma is the jitter
+        sigma = self.latency_jitter
+        return self._random.lognormvariate(0.0, sigma) * mean / math.exp(sigma * sigma / 2)
+
+    def _maybe_fail(self, kind: str):
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise StubProviderError(f"Injected {kind} failure")
+
+
+def _load_recordings(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache()
+def get_stub_provider() -> StubLLMProvider:
+    """Shared stub instance so the seeded latency sequence spans requests"""
+    recordings = _load_recordings(settings.llm_stub_recordings_path) if settings.llm_stub_recordings_path else None
+    return StubLLMProvider(
+        recordings=recordings,
+        latency_distribution=settings.llm_stub_latency_distribution,
+        latency_mean_ms=settings.llm_stub_latency_mean_ms,
+        latency_jitter=settings.llm_stub_latency_jitter,
+        error_rate=settings.llm_stub_error_rate,
+        seed=settings.llm_stub_seed
+    )
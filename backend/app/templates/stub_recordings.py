@@ -0,0 +1,128 @@
+from typing import Dict, Any, List
+
+# Recorded completions replayed by the stub LLM provider. Each entry is the
+# parsed JSON the real provider returned; the stub serializes it back to text
+# so the normal response parsing path is exercised.
+
+_STEEL = {"type": "MeshStandardMaterial", "color": "#8C92AC", "metalness": 0.8, "roughness": 0.2}
+_SUPPORT = {"type": "MeshStandardMaterial", "color": "#444444"}
+_STRESS_COLORS = {"low": "#00FF00", "medium": "#FFAA00", "high": "#FF0000", "max_stress": 250}
+_CAMERA = {"position": [10, 5, 10], "look_at": [0, 0, 0]}
+_LIGHTING = {
+    "ambient": {"color": "#404040", "intensity": 0.4},
+    "directional": {"color": "#ffffff", "intensity": 0.8, "position": [10, 10, 5]}
+}
+
+
+def _member(member_id: str, position: List[float], scale: List[float], rotation: List[float],
+            stress: float, force: float, element_type: str = "beam") -> Dict[str, Any]:
+    return {
+        "id": member_id,
+        "type": "BoxGeometry",
+        "position": position,
+        "scale": scale,
+        "rotation": rotation,
+        "material": dict(_STEEL),
+        "userData": {
+            "element_type": element_type,
+            "stress_level": stress,
+            "force": force,
+            "material": "steel",
+            "info": f"Steel {element_type} carrying {force}N"
+        }
+    }
+
+
+def _support(support_id: str, x: float) -> Dict[str, Any]:
+    return {
+        "id": support_id,
+        "type": "ConeGeometry",
+        "position": [x, -0.3, 0],
+        "scale": [0.2, 0.3, 0.2],
+        "material": dict(_SUPPORT)
+    }
+
+
+def _force(force_id: str, x: float, magnitude: int) -> Dict[str, Any]:
+    return {
+        "id": force_id,
+        "origin": [x, 2, 0],
+        "direction": [0, -1, 0],
+        "length": 2,
+        "color": "#FF4444",
+        "label": f"{magnitude}N",
+        "label_position": [x, 2.3, 0]
+    }
+
+
+def _truss_scene(span: float, panels: int) -> Dict[str, Any]:
+    panel = span / panels
+    meshes = [
+        _member("bottom_chord", [0, 0, 0], [span, 0.2, 0.2], [0, 0, 0], 0.5, 4000, "chord"),
+        _member("top_chord", [0, 1.5, 0], [span - panel, 0.2, 0.2], [0, 0, 0], 0.6, -4500, "chord")
+    ]
+    for i in range(panels + 1):
+        x = -span / 2 + i * panel
+        meshes.append(_member(f"vertical_{i + 1}", [x, 0.75, 0], [0.15, 1.5, 0.15], [0, 0, 0], 0.3, 1500, "vertical"))
+    return {
+        "meshes": meshes,
+        "supports": [_support("support_1", -span / 2), _support("support_2", span / 2)],
+        "force_arrows": [_force("force_1", 0, 2000)]
+    }
+
+
+SIMULATE_RECORDINGS: List[Dict[str, Any]] = [
+    {
+        "scene": {
+            "meshes": [_member("beam_1", [0, 0, 0], [5, 0.2, 0.2], [0, 0, 0], 0.4, 1000)],
+            "supports": [_support("support_1", -2.5), _support("support_2", 2.5)],
+            "force_arrows": [_force("force_1", 0, 1000)]
+        },
+        "stress_colors": _STRESS_COLORS,
+        "camera": _CAMERA,
+        "lighting": _LIGHTING
+    },
+    {
+        "scene": {
+            "meshes": [_member("beam_1", [2, 0, 0], [4, 0.25, 0.25], [0, 0, 0], 0.7, 2500)],
+            "supports": [_support("support_1", 0)],
+            "force_arrows": [_force("force_1", 4, 2500)]
+        },
+        "stress_colors": _STRESS_COLORS,
+        "camera": _CAMERA,
+        "lighting": _LIGHTING
+    },
+    {
+        "scene": _truss_scene(8, 4),
+        "stress_colors": _STRESS_COLORS,
+        "camera": {"position": [12, 6, 12], "look_at": [0, 0.75, 0]},
+        "lighting": _LIGHTING
+    }
+]
+
+CHAT_RECORDINGS: List[Dict[str, Any]] = [
+    {
+        "explanation": "I've extended the span of the truss and added a panel.",
+        "changes_made": ["Increased span from 8m to 10m", "Added one truss panel"],
+        "simulation": {
+            "scene": _truss_scene(10, 5),
+            "stress_colors": _STRESS_COLORS,
+            "camera": {"position": [14, 6, 14], "look_at": [0, 0.75, 0]},
+            "lighting": _LIGHTING
+        }
+    },
+    {
+        "explanation": "I've added an intermediate support at midspan.",
+        "changes_made": ["Added support at midspan"],
+        "simulation": {
+            "scene": {
+                "meshes": [_member("beam_1", [0, 0, 0], [5, 0.2, 0.2], [0, 0, 0], 0.2, 500)],
+                "supports": [_support("support_1", -2.5), _support("support_2", 0), _support("support_3", 2.5)],
+                "force_arrows": [_force("force_1", 0, 1000)]
+            },
+            "stress_colors": _STRESS_COLORS,
+            "camera": _CAMERA,
+            "lighting": _LIGHTING
+        }
+    }
+]
@@ -0,0 +1,154 @@
+import glob
+import gzip
+import os
+import threading
+from typing import Dict, Optional
+import brotli
+import zstandard
+
+# Compression for stored values and HTTP responses.
+#
+# Stored simulation:* and session:* values are zstd frames compressed with a
+# dictionary trained on our own scene JSON (scripts/train_scene_dictionary.py),
+# which knows the keys, materials and colors every scene repeats. Values written
+# before compression was enabled are plain JSON and are read as they are.
+#
+# Retraining moves the previous dictionary to scene_dictionary.<dict_id>.zstd
+# beside the new one. Retired dictionaries are only used to read, so values
+# written before a deploy stay readable after it. While a new dictionary rolls
+# out, pin writes to the old one (write_dictionary_id) until every worker has
+# the new file, so workers still on the old build can read what others write.
+#
+# HTTP responses are compressed with whichever of zstd, br and gzip the client
+# accepts, at a level that drops as payloads grow so CPU per response stays bounded.
+
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "scene_dictionary.zstd")
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# (largest payload in bytes, level per encoding); the last tier has no limit
+HTTP_LEVEL_TIERS = [
+    (64 * 1024, {"zstd": 6, "br": 5, "gzip": 6}),
+    (1024 * 1024, {"zstd": 4, "br": 4, "gzip": 4}),
+    (None, {"zstd": 3, "br": 2, "gzip": 1}),
+]
+
+SERVER_PREFERENCE = ["zstd", "br", "gzip"]
+
+
+class StoredValueCodec:
+    """Compresses JSON values for the session store and counts the bytes saved"""
+
+    def __init__(self, enabled: bool = True, level: int = 3, dictionary_path: str = DICTIONARY_PATH,
+                 write_dictionary_id: int = 0):
+        self.enabled = enabled
+        self.level = level
+        # Every dictionary this build can read, by dict_id
+        self.dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        self.dictionary: Optional[zstandard.ZstdCompressionDict] = None
+        # Dictionaries are loaded even when disabled: values already stored compressed must stay readable
+        if dictionary_path:
+            stem, extension = os.path.splitext(dictionary_path)
+            for path in sorted(glob.glob(f"{glob.escape(stem)}.*{extension}")):
+                self._load(path)
+            if os.path.exists(dictionary_path):
+                self.dictionary = self._load(dictionary_path)
+            if write_dictionary_id in self.dictionaries:
+                self.dictionary = self.dictionaries[write_dictionary_id]
+            elif write_dictionary_id:
+                print(f"Dictionary {write_dictionary_id} not found; compressing with the newest")
+        if self.dictionary:
+            self.dictionary.precompute_compress(level=level)
+        self.dictionary_id = self.dictionary.dict_id() if self.dictionary else 0
+        # zstd (de)compressor objects are not thread-safe; keep one per thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.values = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def encode(self, text: str) -> bytes:
+        raw = text.encode()
+        if not self.enabled:
+            return raw
+        stored = self._compressor().compress(raw)
+        with self._lock:
+            self.values += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(stored)
+        return stored
+
+    def decode(self, stored: bytes) -> Optional[str]:
+        """Stored value as JSON text; None when it was written with a dictionary this build doesn't have"""
+        if not stored.startswith(ZSTD_MAGIC):
+            return stored.decode()
+        dict_id = zstandard.get_frame_parameters(stored).dict_id
+        if dict_id and dict_id not in self.dictionaries:
+            return None
+        return self._decompressor(dict_id).decompress(stored).decode()
+
+    def stats(self) -> Dict[str, object]:
+        """Bytes this worker has written to the store, before and after compression"""
+        return {
+            "enabled": self.enabled,
+            "dictionary_id": self.dictionary_id,
+            "readable_dictionaries": sorted(self.dictionaries),
+            "values": self.values,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "saved_bytes": self.raw_bytes - self.stored_bytes,
+            "ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None
+        }
+
+    def _load(self, path: str) -> zstandard.ZstdCompressionDict:
+        with open(path, "rb") as f:
+            dictionary = zstandard.ZstdCompressionDict(f.read())
+        self.dictionaries[dictionary.dict_id()] = dictionary
+        return dictionary
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self.dictionary)
+        return compressor
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if dict_id not in decompressors:
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self.dictionaries.get(dict_id))
+        return decompressors[dict_id]
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding the client accepts: highest q-value, then zstd > br > gzip"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    candidates = [(accepted.get(name, wildcard), -rank, name) for rank, name in enumerate(SERVER_PREFERENCE)]
+    q, _, name = max(candidates)
+    return name if q > 0 else None
+
+
+def http_level(encoding: str, size: int) -> int:
+    for limit, levels in HTTP_LEVEL_TIERS:
+        if limit is None or size <= limit:
+            return levels[encoding]
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    level = http_level(encoding, len(body))
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
@@ -0,0 +1,80 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+# LLM responses arrive as a stream of JSON text. To show geometry before the
+# response is complete, the scanner watches arrays under given keys ("meshes",
+# "supports", ...) and hands back each object in them as soon as it closes.
+# Offsets are into the whole stream; only the text from the start of the open
+# item (or string) onwards is kept, so each chunk costs its own length.
+
+
+class JsonArrayScanner:
+    """Incrementally extract completed objects from keyed arrays in streamed JSON"""
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(keys)
+        self._text = ""
+        self._base = 0  # Stream offset of _text[0]
+        self._position = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        # One (bracket, key of the array it belongs to, start offset) per open container
+        self._stack: List[Tuple[str, Optional[str], int]] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk, returning (key, item) for every item completed by it"""
+        text = self._text + chunk
+        base = self._base
+        completed = []
+
+        for i in range(self._position - base, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start - base:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = base + i + 1
+            elif char == ":":
+                self._pending_key = self._last_string
+            elif char in "{[":
+                parent_key = self._stack[-1][1] if self._stack and self._stack[-1][0] == "[" else None
+                key = self._pending_key if char == "[" else parent_key
+                self._stack.append((char, key, base + i))
+                self._pending_key = None
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                bracket, key, start = self._stack.pop()
+                # An object directly inside a watched array is one item
+                if bracket == "{" and key in self.keys and self._stack and self._stack[-1][0] == "[":
+                    try:
+                        completed.append((key, json.loads(text[start - base:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+            elif char == ",":
+                self._pending_key = None
+
+        self._position = base + len(text)
+        self._discard(text)
+        return completed
+
+    def _discard(self, text: str):
+        """Drop the text no open item or string can still need"""
+        keep = self._string_start if self._in_string else self._position
+        for bracket, key, start in self._stack:
+            if bracket == "{" and key in self.keys:
+                keep = min(keep, start)
+                break
+        self._text = text[keep - self._base:]
+        self._base = keep
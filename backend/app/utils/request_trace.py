@@ -0,0 +1,87 @@
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Any, List, Optional, Tuple
+
+# Stage timings for the request being served.
+#
+# Code on the request path wraps its expensive steps in stage("redis.get"),
+# stage("llm"), ... and each step's time is added to the current request's
+# trace. The profiling middleware starts a trace per request; when profiling
+# is disabled no trace is ever started and stage() is a ContextVar lookup
+# returning a shared no-op.
+
+
+class RequestTrace:
+    __slots__ = ("stages", "scene_members")
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}  # name -> [count, seconds]
+        self.scene_members = 0
+
+    def add(self, name: str, seconds: float):
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {"count": count, "ms": round(seconds * 1000, 2)}
+            for name, (count, seconds) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+        }
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+class _Timer:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: RequestTrace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name: str):
+    """Context manager timing a block into the current request's trace"""
+    trace = _current.get()
+    return _NO_TIMER if trace is None else _Timer(trace, name)
+
+
+def note_scene(scene: Optional[Dict[str, Any]]):
+    """Record the size of a scene the current request handles (the largest one is kept)"""
+    trace = _current.get()
+    if trace is not None and scene:
+        trace.scene_members = max(trace.scene_members, len(scene.get("meshes", [])))
+
+
+def start_trace() -> Tuple[RequestTrace, Token]:
+    trace = RequestTrace()
+    return trace, _current.set(trace)
+
+
+def end_trace(token: Token):
+    _current.reset(token)
@@ -0,0 +1,150 @@
+import math
+from typing import Dict, Any, List, Optional, Tuple
+
+# Scene meshes are Three.js primitives: a position, a per-axis scale and an
+# Euler rotation (XYZ order). Structural members are long thin boxes or
+# cylinders, so most scene logic treats them as line segments along their
+# longest local axis.
+
+Vec3 = Tuple[float, float, float]
+
+EPSILON = 1e-9
+
+
+def number(value: Any, default: float = 0.0) -> float:
+    """value as a float; default when it is missing, non-numeric or not finite"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return value if math.isfinite(value) else default
+
+
+def vec3(value: Any, default: float = 0.0) -> Vec3:
+    """Coerce a scene vector (list of up to 3 numbers) to a 3-tuple; bad components become default"""
+    value = list(value)[:3] if isinstance(value, (list, tuple)) else []
+    value += [default] * (3 - len(value))
+    return (number(value[0], default), number(value[1], default), number(value[2], default))
+
+
+def user_data(mesh: Dict[str, Any]) -> Dict[str, Any]:
+    """A mesh's userData; {} when it is missing, null or not an object"""
+    data = mesh.get("userData")
+    return data if isinstance(data, dict) else {}
+
+
+def user_number(mesh: Dict[str, Any], key: str, default: float = 0.0) -> float:
+    """A numeric userData field; default when it is missing, non-numeric or not finite"""
+    return number(user_data(mesh).get(key, default), default)
+
+
+def principal_axis(mesh: Dict[str, Any]) -> int:
+    """Local axis a member runs along: y for cylinders, otherwise the longest box side"""
+    if mesh.get("type") == "CylinderGeometry":
+        return 1
+    scale = vec3(mesh.get("scale"), 1.0)
+    return max(range(3), key=lambda i: scale[i])
+
+
+def rotate_xyz(v: Vec3, rotation: Vec3) -> Vec3:
+    """Apply a Three.js XYZ Euler rotation (matrix Rx * Ry * Rz) to a vector"""
+    if not any(rotation):
+        return v
+    rx, ry, rz = rotation
+    x, y, z = v
+    # Rz
+    x, y = x * math.cos(rz) - y * math.sin(rz), x * math.sin(rz) + y * math.cos(rz)
+    # Ry
+    x, z = x * math.cos(ry) + z * math.sin(ry), -x * math.sin(ry) + z * math.cos(ry)
+    # Rx
+    y, z = y * math.cos(rx) - z * math.sin(rx), y * math.sin(rx) + z * math.cos(rx)
+    return (x, y, z)
+
+
+def member_segment(mesh: Dict[str, Any]) -> Tuple[Vec3, Vec3, float]:
+    """Return (start, end, radius) of a member treated as a segment along its principal axis"""
+    axis = principal_axis(mesh)
+    scale = vec3(mesh.get("scale"), 1.0)
+    position = vec3(mesh.get("position"))
+    unit = [0.0, 0.0, 0.0]
+    unit[axis] = 1.0
+    direction = rotate_xyz(tuple(unit), vec3(mesh.get("rotation")))
+    half = scale[axis] / 2
+    start = tuple(position[i] - direction[i] * half for i in range(3))
+    end = tuple(position[i] + direction[i] * half for i in range(3))
+    radius = max(scale[i] for i in range(3) if i != axis) / 2
+    return start, end, radius
+
+
+def set_member_segment(mesh: Dict[str, Any], start: Vec3, end: Vec3):
+    """Move, resize and rotate a member so its principal axis runs from start to end"""
+    axis = principal_axis(mesh)
+    delta = [end[i] - start[i] for i in range(3)]
+    length = math.sqrt(sum(d * d for d in delta))
+    scale = list(vec3(mesh.get("scale"), 1.0))
+    mesh["position"] = [(start[i] + end[i]) / 2 for i in range(3)]
+    if length < EPSILON:
+        return
+    scale[axis] = length
+    mesh["scale"] = scale
+    mesh["rotation"] = _rotation_for(axis, tuple(d / length for d in delta), vec3(mesh.get("rotation")))
+
+
+def _rotation_for(axis: int, d: Vec3, current: Vec3) -> List[float]:
+    dx, dy, dz = d
+    if axis == 2:
+        # Members along local z are rare (depth-wise struts); rotate about y only
+        return [0.0, math.atan2(dx, dz), 0.0]
+    if abs(dz) < EPSILON and abs(current[0]) < EPSILON and abs(current[1]) < EPSILON:
+        # In-plane member: keep the usual single z rotation
+        if axis == 0:
+            return [0.0, 0.0, math.atan2(dy, dx)]
+        return [0.0, 0.0, math.atan2(-dx, dy)]
+    if axis == 0:
+        # Ry * Rz * x = (cos y cos z, sin z, -sin y cos z)
+        return [0.0, math.atan2(-dz, dx), math.asin(max(-1.0, min(1.0, dy)))]
+    # Ry * Rz * y = (-cos y sin z, cos z, sin y sin z)
+    return [0.0, math.atan2(dz, -dx), math.acos(max(-1.0, min(1.0, dy)))]
+
+
+def mesh_bounds(mesh: Dict[str, Any]) -> Tuple[Vec3, Vec3]:
+    """Axis-aligned bounding box of a member (segment padded by its radius)"""
+    start, end, radius = member_segment(mesh)
+    low = tuple(min(start[i], end[i]) - radius for i in range(3))
+    high = tuple(max(start[i], end[i]) + radius for i in range(3))
+    return low, high
+
+
+def scene_bounds(scene: Dict[str, Any]) -> Optional[Tuple[Vec3, Vec3]]:
+    """Bounding box of all meshes in a scene, or None when it has none"""
+    boxes = [mesh_bounds(mesh) for mesh in scene.get("meshes", [])]
+    if not boxes:
+        return None
+    low = tuple(min(box[0][i] for box in boxes) for i in range(3))
+    high = tuple(max(box[1][i] for box in boxes) for i in range(3))
+    return low, high
+
+
+def centreline_bounds(scene: Dict[str, Any]) -> Optional[Tuple[Vec3, Vec3]]:
+    """Bounding box of the members' centre lines (their end points, without thickness)"""
+    ends = [point for mesh in scene.get("meshes", []) for point in member_segment(mesh)[:2]]
+    if not ends:
+        return None
+    low = tuple(min(point[i] for point in ends) for i in range(3))
+    high = tuple(max(point[i] for point in ends) for i in range(3))
+    return low, high
+
+
+def arrow_tip(arrow: Dict[str, Any]) -> Vec3:
+    """Point a force arrow acts on (its origin plus direction * length)"""
+    origin = vec3(arrow.get("origin"))
+    direction = normalize(vec3(arrow.get("direction"), 0.0))
+    length = number(arrow.get("length", 1.0), 1.0)
+    return tuple(origin[i] + direction[i] * length for i in range(3))
+
+
+def normalize(v: Vec3) -> Vec3:
+    length = math.sqrt(sum(c * c for c in v))
+    if length < EPSILON:
+        return (0.0, -1.0, 0.0)
+    return tuple(c / length for c in v)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Batch generation benchmark
+
+Generates the same library of prompts with a serial loop of /api/simulate
+calls and with /api/simulate/batch at several concurrency levels, against a
+spawned uvicorn with the stub LLM provider (constant latency) and fakeredis.
+Reports wall time, simulations per second and time to the first NDJSON line.
+
+Usage:
+    python benchmarks/batch_simulate.py
+    python benchmarks/batch_simulate.py --requests 200 --latency-ms 500 --concurrency 1 8 32 --json batch_report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+PROMPTS = [
+    "steel rod stress on truss bridge",
+    "cantilever beam with point load at the end",
+    "simply supported steel beam with distributed load",
+    "steel frame building with wind load analysis",
+    "concrete arch bridge with vehicle loads",
+    "steel truss communication tower with wind loads",
+]
+
+
+def library(count: int, duplicates: float):
+    """count requests; about `duplicates` of them repeat an earlier entry"""
+    every = round(1 / duplicates) if duplicates else 0
+    requests = []
+    for n in range(count):
+        if every and n and n % every == 0:
+            requests.append(requests[n // 2])
+        else:
+            requests.append({"prompt": f"{PROMPTS[n % len(PROMPTS)]} variant {n}", "provider": "stub"})
+    return requests
+
+
+def spawn_server(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "REDIS_URL": "fakeredis://",
+        "HISTORY_ENABLED": "false",
+        "SIMILARITY_ENABLED": "false",
+        "SPECULATION_ENABLED": "false",
+        "LLM_STUB_ENABLED": "true",
+        "LLM_STUB_LATENCY_DISTRIBUTION": "constant",
+        "LLM_STUB_LATENCY_MEAN_MS": str(args.latency_ms),
+        "BATCH_MAX_CONCURRENCY": str(max(args.concurrency)),
+    })
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+
+
+def wait_until_healthy(client: httpx.Client, deadline: float = 30.0):
+    start = time.perf_counter()
+    while time.perf_counter() - start < deadline:
+        try:
+            if client.get("/api/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy")
+
+
+def run_all(client: httpx.Client, requests, concurrency_levels):
+    runs = {}
+    start = time.perf_counter()
+    for request in requests:
+        client.post("/api/simulate", json=request).raise_for_status()
+    elapsed = time.perf_counter() - start
+    runs["serial"] = {"elapsed_s": round(elapsed, 2), "per_second": round(len(requests) / elapsed, 1)}
+
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        first = None
+        lines = []
+        with client.stream("POST", "/api/simulate/batch",
+                           json={"requests": requests, "concurrency": concurrency}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    first = first or time.perf_counter() - start
+                    lines.append(json.loads(line))
+        elapsed = time.perf_counter() - start
+        summary = lines[-1]["summary"]
+        assert sum(len(line["indexes"]) for line in lines[:-1]) == len(requests)
+        runs[f"batch-{concurrency}"] = {
+            "elapsed_s": round(elapsed, 2),
+            "per_second": round(len(requests) / elapsed, 1),
+            "first_line_ms": round(first * 1000, 1),
+            "distinct": summary["distinct"],
+            "errors": summary["errors"],
+        }
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial /api/simulate calls with /api/simulate/batch")
+    parser.add_argument("--requests", type=int, default=64, help="Simulations in the library")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Fraction of repeated entries")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Stub LLM latency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--port", type=int, default=8766, help="Port for the spawned server")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    requests = library(args.requests, args.duplicates)
+    server = spawn_server(args.port, args)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=300) as client:
+            wait_until_healthy(client)
+            runs = run_all(client, requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+    report = {"requests": len(requests), "latency_ms": args.latency_ms, "runs": runs}
+
+    print(f"{len(requests)} requests, stub latency {args.latency_ms:.0f}ms")
+    for name, stats in report["runs"].items():
+        extra = f"  first line {stats['first_line_ms']}ms, {stats['distinct']} distinct" if "first_line_ms" in stats else ""
+        print(f"  {name:<10} {stats['elapsed_s']:>7}s  {stats['per_second']:>7}/s{extra}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
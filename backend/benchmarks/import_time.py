@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for app.main
+
+Imports the app in fresh interpreters under `python -X importtime` and reports
+total import time, peak RSS, the heaviest modules and which provider SDKs were
+loaded. With no API keys set none of the SDKs should appear.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --top 15 --json import_report.json
+    python benchmarks/import_time.py --max-ms 800   # exit 1 on regression, for CI
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDER_SDKS = ["openai", "anthropic", "google.generativeai"]
+
+CHILD_SCRIPT = """
+import json, resource, sys
+import app.main
+print(json.dumps({
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "sdks": [name for name in %r if name in sys.modules],
+}))
+""" % (PROVIDER_SDKS,)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse `-X importtime` lines into (module, self_us, cumulative_us)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        # One space follows the separator; further indentation marks nested imports
+        rows.append((module.rstrip()[1:], int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_once(env: Dict[str, str]) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = parse_importtime(result.stderr)
+    app_main = next(cumulative for module, _, cumulative in rows if module == "app.main")
+    # Direct children of top-level imports (depth 1) so nested modules aren't counted twice
+    top_level = sorted(
+        ((module.strip(), cumulative) for module, _, cumulative in rows
+         if module.startswith("  ") and not module.startswith("    ")),
+        key=lambda row: row[1], reverse=True
+    )
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"app_main_us": app_main, "top_level": top_level, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and RSS of app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    parser.add_argument("--max-ms", type=float, help="Exit non-zero if median import time exceeds this")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    runs = [measure_once(env) for _ in range(args.runs)]
+
+    median_ms = statistics.median(run["app_main_us"] for run in runs) / 1000
+    report = {
+        "runs": args.runs,
+        "median_import_ms": round(median_ms, 1),
+        "median_max_rss_mb": round(statistics.median(run["max_rss_kb"] for run in runs) / 1024, 1),
+        "provider_sdks_loaded": runs[-1]["sdks"],
+        "heaviest_modules_ms": [
+            [module, round(us / 1000, 1)] for module, us in runs[-1]["top_level"][:args.top]
+        ],
+    }
+
+    print(f"app.main import: {report['median_import_ms']}ms (median of {args.runs}), "
+          f"peak RSS {report['median_max_rss_mb']}MB")
+    print(f"provider SDKs loaded: {', '.join(report['provider_sdks_loaded']) or 'none'}")
+    for module, ms in report["heaviest_modules_ms"]:
+        print(f"  {ms:>8.1f}ms  {module}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"FAIL: import time {median_ms:.1f}ms > {args.max_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
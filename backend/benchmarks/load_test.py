@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the simulation API
+
+Drives realistic simulate-then-chat sessions against a running server and
+reports throughput plus p50/p95/p99 latency for each stage.
+
+Usage:
+    # Spawn uvicorn with the stub LLM provider and an in-process fakeredis
+    python benchmarks/load_test.py --spawn --sessions 200 --concurrency 20
+
+    # Against an already running server (set LLM_STUB_ENABLED=true there)
+    python benchmarks/load_test.py --base-url http://localhost:8000
+
+    # Fail (exit 1) when a stage regresses, for CI
+    python benchmarks/load_test.py --spawn --max-p95 simulate=1500 --max-p95 chat=1500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+PROMPTS = [
+    "steel rod stress on truss bridge",
+    "cantilever beam with point load at the end",
+    "simply supported steel beam with distributed load",
+    "steel frame building with wind load analysis",
+    "concrete arch bridge with vehicle loads",
+    "steel truss communication tower with wind loads",
+]
+
+CHAT_MESSAGES = [
+    "make it longer",
+    "add a support in the middle",
+    "double the load",
+    "switch to concrete",
+    "show wind load from the left",
+    "add two more panels",
+]
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, stage: str, seconds: float, ok: bool):
+        self.latencies[stage].append(seconds * 1000)
+        if not ok:
+            self.errors[stage] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for stage, samples in self.latencies.items():
+            ordered = sorted(samples)
+            report[stage] = {
+                "count": len(ordered),
+                "errors": self.errors[stage],
+                "throughput_rps": round(len(ordered) / elapsed, 2),
+                "mean_ms": round(statistics.fmean(ordered), 1),
+                "p50_ms": round(_percentile(ordered, 50), 1),
+                "p95_ms": round(_percentile(ordered, 95), 1),
+                "p99_ms": round(_percentile(ordered, 99), 1),
+            }
+        return report
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _timed(client: httpx.AsyncClient, stats: StageStats, stage: str, method: str, url: str,
+                 **kwargs) -> Optional[dict]:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        body = response.json() if response.status_code == 200 else None
+        # Chat reports provider failures in-band as an "error" model response
+        ok = body is not None and body.get("metadata", {}).get("llm_model") != "error"
+        stats.record(stage, time.perf_counter() - start, ok)
+        return body if ok else None
+    except httpx.HTTPError:
+        stats.record(stage, time.perf_counter() - start, False)
+        return None
+
+
+async def run_session(client: httpx.AsyncClient, stats: StageStats, rng: random.Random, chat_turns: int):
+    """One user: generate a simulation, iterate on it, then read the history"""
+    simulation = await _timed(client, stats, "simulate", "POST", "/api/simulate", json={
+        "prompt": rng.choice(PROMPTS),
+        "complexity": rng.choice(["simple", "simple", "medium"]),
+    })
+    if not simulation:
+        return
+
+    session_id = simulation["session_id"]
+    for _ in range(chat_turns):
+        await _timed(client, stats, "chat", "POST", "/api/chat", json={
+            "session_id": session_id,
+            "message": rng.choice(CHAT_MESSAGES),
+        })
+
+    await _timed(client, stats, "history", "GET", f"/api/chat/history/{session_id}")
+
+
+async def run_load(base_url: str, sessions: int, concurrency: int, chat_turns: int, seed: int, timeout: float):
+    stats = StageStats()
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            async with semaphore:
+                await run_session(client, stats, random.Random(rng.random()), chat_turns)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(sessions / elapsed, 2),
+        "stages": stats.summary(elapsed),
+    }
+
+
+def spawn_server(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "LLM_STUB_ENABLED": "true",
+        "LLM_STUB_LATENCY_MEAN_MS": str(args.latency_mean_ms),
+        "LLM_STUB_LATENCY_JITTER": str(args.latency_jitter),
+        "LLM_STUB_ERROR_RATE": str(args.error_rate),
+        "REDIS_URL": args.redis_url,
+    })
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+
+
+async def wait_until_healthy(base_url: str, deadline: float = 30.0):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        start = time.perf_counter()
+        while time.perf_counter() - start < deadline:
+            try:
+                if (await client.get("/api/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+def check_thresholds(report: dict, thresholds: List[str]) -> List[str]:
+    failures = []
+    for threshold in thresholds:
+        stage, limit = threshold.split("=")
+        p95 = report["stages"].get(stage, {}).get("p95_ms")
+        if p95 is not None and p95 > float(limit):
+            failures.append(f"{stage} p95 {p95}ms > {limit}ms")
+    return failures
+
+
+def print_report(report: dict):
+    print(f"\n{report['sessions']} sessions, concurrency {report['concurrency']}, "
+          f"{report['elapsed_s']}s, {report['sessions_per_s']} sessions/s")
+    print(f"{'stage':<10}{'count':>8}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<10}{s['count']:>8}{s['errors']:>8}{s['throughput_rps']:>9}"
+              f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/simulate and /api/chat")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn with the stub provider")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--redis-url", default="fakeredis://", help="REDIS_URL for --spawn")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--chat-turns", type=int, default=3)
+    parser.add_argument("--latency-mean-ms", type=float, default=200.0, help="Stub latency for --spawn")
+    parser.add_argument("--latency-jitter", type=float, default=0.3, help="Stub latency jitter for --spawn")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stub error rate for --spawn")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    parser.add_argument("--max-p95", action="append", default=[], metavar="STAGE=MS",
+                        help="Exit non-zero if a stage's p95 exceeds MS")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if args.spawn:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = spawn_server(args.port, args)
+
+    try:
+        asyncio.run(wait_until_healthy(base_url))
+        report = asyncio.run(run_load(base_url, args.sessions, args.concurrency, args.chat_turns,
+                                      args.seed, args.timeout))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_thresholds(report, args.max_p95)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
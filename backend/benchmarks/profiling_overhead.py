@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Profiling hook overhead
+
+Measures what the profiling hook adds per call and per request:
+- stage() with no trace (profiling disabled) and with a trace
+- a trivial ASGI app called directly, bare and behind ProfilingMiddleware with
+  tracing only and with every request profiled by pyinstrument
+
+Usage:
+    python benchmarks/profiling_overhead.py
+    python benchmarks/profiling_overhead.py --calls 1000000 --requests 20000 --json profiling_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.api.profiling_middleware import ProfilingMiddleware  # noqa: E402
+from app.services.request_profiler import RequestProfiler  # noqa: E402
+from app.utils.request_trace import stage, start_trace, end_trace  # noqa: E402
+
+
+def stage_ns(calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        with stage("redis.get"):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def request_us(handler, requests: int, headers=()) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/health", "headers": list(headers)}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await handler(scope, receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of the profiling hook")
+    parser.add_argument("--calls", type=int, default=500000, help="stage() calls timed")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests through the middleware")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = {"stage_ns": {}, "request_us": {}}
+    report["stage_ns"]["disabled"] = round(stage_ns(args.calls), 1)
+    _, token = start_trace()
+    report["stage_ns"]["traced"] = round(stage_ns(args.calls), 1)
+    end_trace(token)
+
+    settings.profiling_token = "benchmark"
+    profiler = RequestProfiler()
+    middleware = ProfilingMiddleware(app, profiler)
+    requested = [(b"x-profile-token", b"benchmark")]
+    report["request_us"]["bare"] = round(asyncio.run(request_us(app, args.requests)), 2)
+    report["request_us"]["traced"] = round(asyncio.run(request_us(middleware, args.requests)), 2)
+    report["request_us"]["profiled"] = round(asyncio.run(request_us(middleware, args.requests // 10, requested)), 2)
+
+    print(f"stage(): {report['stage_ns']['disabled']}ns disabled, {report['stage_ns']['traced']}ns traced")
+    bare = report["request_us"]["bare"]
+    for name, us in report["request_us"].items():
+        print(f"  {name:<9} {us:>8}us per request (+{us - bare:.2f}us)")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Scene validation benchmark
+
+Generates framed towers of increasing size (see benchmarks/spatial_index.py),
+breaks them the way generated scenes tend to be broken — jittered endpoints,
+duplicated members, a floating member, a support in mid-air and a load pointing
+at empty space — then validates and repairs them, checking that every defect
+is found and timing each size.
+
+Usage:
+    python benchmarks/scene_validation.py
+    python benchmarks/scene_validation.py --sizes 1000 10000 50000 --json validation_report.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from spatial_index import tower  # noqa: E402
+from app.services.scene_validator import validate_scene  # noqa: E402
+from app.utils.scene_geometry import member_segment, set_member_segment  # noqa: E402
+
+
+def broken_scene(members: int, defects: int, rng: random.Random):
+    scene = tower(members, rng)
+    meshes = scene["meshes"]
+    scene["supports"] = [
+        {"id": f"support_{i}", "type": "ConeGeometry", "position": [i * 4.0, -0.3, 0], "scale": [0.2, 0.3, 0.2]}
+        for i in range(8)
+    ] + [{"id": "support_air", "type": "ConeGeometry", "position": [-20, 30, -20], "scale": [0.2, 0.3, 0.2]}]
+    scene["force_arrows"] = [
+        {"id": "load_on_top", "origin": [0, 5.5, 0], "direction": [0, -1, 0], "length": 2},
+        {"id": "load_near", "origin": [2.0, 5.5, 0.6], "direction": [0, -1, 0], "length": 2},
+    ]
+
+    picked = rng.sample(range(len(meshes)), 2 * defects)
+    for i in picked[:defects]:
+        meshes.append({**copy.deepcopy(meshes[i]), "id": f"duplicate_of_{meshes[i]['id']}"})
+    for i in picked[defects:]:
+        # Endpoint a few centimetres off its joint
+        start, end, _ = member_segment(meshes[i])
+        jittered = tuple(c + rng.uniform(-0.03, 0.03) for c in end)
+        meshes[i] = copy.deepcopy(meshes[i])
+        set_member_segment(meshes[i], start, jittered)
+    floating = copy.deepcopy(meshes[0])
+    floating["id"] = "floating_member"
+    set_member_segment(floating, (-30, 10, -30), (-30, 12, -30))
+    meshes.append(floating)
+    return scene
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure scene validation time and defect recall")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--defects", type=int, default=20, help="Duplicated and jittered members of each kind")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = []
+    failed = False
+    for size in args.sizes:
+        scene = broken_scene(size, args.defects, rng)
+        start = time.perf_counter()
+        _, diagnostics, _ = validate_scene(scene)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        issues, repairs = diagnostics["issues"], diagnostics["repairs"]
+        row = {
+            "members": len(scene["meshes"]),
+            "validation_ms": round(elapsed_ms, 1),
+            "us_per_member": round(elapsed_ms * 1000 / len(scene["meshes"]), 1),
+            "removed_duplicates": repairs["removed_duplicates"]["count"],
+            "snapped_endpoints": repairs["snapped_endpoints"],
+            "floating_members": issues["floating_members"]["ids"],
+            "floating_supports": issues["floating_supports"]["ids"],
+            "anchored_loads": repairs["anchored_loads"]["ids"],
+        }
+        report.append(row)
+        found = (row["removed_duplicates"] == args.defects and row["snapped_endpoints"] >= args.defects
+                 and row["floating_members"] == ["floating_member"] and row["floating_supports"] == ["support_air"]
+                 and row["anchored_loads"] == ["load_near"])
+        failed |= not found
+        print(f"{row['members']:>7} members: {row['validation_ms']}ms ({row['us_per_member']}us/member), "
+              f"{row['removed_duplicates']} duplicates removed, {row['snapped_endpoints']} endpoints snapped, "
+              f"floating {row['floating_members'] + row['floating_supports']}, anchored {row['anchored_loads']}"
+              f"{'' if found else '  <- defects missed'}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
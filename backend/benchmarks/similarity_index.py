@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Similarity index benchmark
+
+Builds an in-memory index of synthetic simulation prompts (structure, material,
+span, load and load case drawn at random and phrased with different templates),
+then looks up:
+
+- paraphrases of indexed prompts, which should be served from the index
+  (hit rate, and how many hits point at a prompt with the same parameters)
+- prompts with unseen parameters, which must not be served (false reuse) but
+  may be close enough to seed generation
+
+Usage:
+    python benchmarks/similarity_index.py
+    python benchmarks/similarity_index.py --size 250000 --queries 5000 --json similarity_report.json
+    python benchmarks/similarity_index.py --reuse-threshold 0.85 --max-p99-ms 5
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.similarity_index import SimilarityIndex  # noqa: E402
+
+STRUCTURES = [
+    "truss bridge", "beam", "cantilever beam", "simply supported beam", "arch bridge",
+    "suspension bridge", "portal frame", "tower", "column", "roof truss", "pratt truss",
+    "warren truss", "cable-stayed bridge", "footbridge", "crane boom", "retaining wall",
+    "shelf bracket", "balcony slab", "staircase", "gantry"
+]
+MATERIALS = ["steel", "wood", "timber", "aluminum", "concrete", "reinforced concrete", "carbon fiber", "titanium"]
+LOAD_CASES = ["point load", "distributed load", "wind load", "snow load", "seismic load",
+              "traffic load", "moving load", "impact load"]
+LOADS = ["500N", "1000N", "2 kN", "5kN", "10 kN", "20kN", "50 kN", "100kN", "200 kN", "1 MN"]
+COMPLEXITIES = ["simple", "medium"]
+
+TEMPLATES = [
+    "{material} {structure} {span}m span with {load} {case}",
+    "stress in a {span} m {material} {structure} with a {load} {case}",
+    "show me a {span}m {material} {structure} with {load} {case}",
+    "{load} {case} on a {span}m {structure} made of {material}",
+    "Simulate the {material} {structure}, {span} m, under {load} {case}.",
+    "how does a {span}m long {material} {structure} handle a {load} {case}?",
+    "detailed {material} {structure}s ({span} m) loaded by {load} {case}",
+]
+
+
+def random_params(rng: random.Random):
+    return (
+        rng.choice(STRUCTURES), rng.choice(MATERIALS), rng.randint(2, 80),
+        rng.choice(LOADS), rng.choice(LOAD_CASES), rng.choice(COMPLEXITIES)
+    )
+
+
+def phrase(params, template: str) -> str:
+    structure, material, span, load, case, _ = params
+    return template.format(structure=structure, material=material, span=span, load=load, case=case)
+
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure similarity index hit rate and lookup latency")
+    parser.add_argument("--size", type=int, default=100_000, help="Prompts in the index")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries of each kind")
+    parser.add_argument("--reuse-threshold", type=float, default=0.9)
+    parser.add_argument("--seed-threshold", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit non-zero if p99 lookup latency exceeds this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = SimilarityIndex(max_entries=args.size)
+    indexed = {}
+    while len(indexed) < args.size:
+        params = random_params(rng)
+        indexed.setdefault(params, rng.choice(TEMPLATES))
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for params, template in indexed.items():
+        index.add(phrase(params, template), params[-1], repr(params))
+    build_s = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    indexed_params = list(indexed)
+    paraphrases = []
+    for params in rng.sample(indexed_params, args.queries):
+        template = rng.choice([t for t in TEMPLATES if t != indexed[params]])
+        paraphrases.append((params, phrase(params, template)))
+    novel = []
+    while len(novel) < args.queries:
+        params = random_params(rng)
+        if params not in indexed:
+            novel.append((params, phrase(params, rng.choice(TEMPLATES))))
+
+    latencies_ms = []
+
+    def run(queries):
+        reused = correct = seeded = 0
+        for params, prompt in queries:
+            start = time.perf_counter()
+            match = index.lookup(prompt, params[-1])
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+            if match and match.score >= args.reuse_threshold and match.same_numbers and match.same_order:
+                reused += 1
+                correct += match.simulation_id == repr(params)
+            elif match and match.score >= args.seed_threshold:
+                seeded += 1
+        return reused, correct, seeded
+
+    para_reused, para_correct, para_seeded = run(paraphrases)
+    novel_reused, _, novel_seeded = run(novel)
+
+    report = {
+        "index_size": len(index),
+        "build_seconds": round(build_s, 2),
+        "inserts_per_second": round(len(index) / build_s),
+        "index_rss_mb": round((rss_after - rss_before) / 1024, 1),
+        "paraphrase_hit_rate": round(para_reused / args.queries, 4),
+        "paraphrase_hit_precision": round(para_correct / para_reused, 4) if para_reused else None,
+        "paraphrase_seed_rate": round(para_seeded / args.queries, 4),
+        "novel_false_reuse_rate": round(novel_reused / args.queries, 4),
+        "novel_seed_rate": round(novel_seeded / args.queries, 4),
+        "lookup_ms": {
+            "p50": round(percentile(latencies_ms, 50), 3),
+            "p95": round(percentile(latencies_ms, 95), 3),
+            "p99": round(percentile(latencies_ms, 99), 3),
+            "mean": round(statistics.mean(latencies_ms), 3),
+        },
+    }
+
+    print(f"index: {report['index_size']} prompts built in {report['build_seconds']}s "
+          f"({report['inserts_per_second']}/s), ~{report['index_rss_mb']}MB")
+    print(f"paraphrases: {report['paraphrase_hit_rate']:.1%} served from the index "
+          f"({report['paraphrase_hit_precision'] or 0:.1%} correct), {report['paraphrase_seed_rate']:.1%} seeded")
+    print(f"novel prompts: {report['novel_false_reuse_rate']:.1%} wrongly served, "
+          f"{report['novel_seed_rate']:.1%} seeded")
+    lookup = report["lookup_ms"]
+    print(f"lookup: p50 {lookup['p50']}ms  p95 {lookup['p95']}ms  p99 {lookup['p99']}ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_p99_ms is not None and lookup["p99"] > args.max_p99_ms:
+        print(f"FAIL: p99 lookup {lookup['p99']}ms > {args.max_p99_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Spatial index benchmark
+
+Generates a framed tower (columns, split floor beams and diagonal braces) with
+about --members members, builds the scene index, then times point, box,
+ray-pick and nearest-member queries at random locations. Every query kind is
+also checked against a brute-force scan over all members.
+
+Usage:
+    python benchmarks/spatial_index.py
+    python benchmarks/spatial_index.py --members 100000 --queries 5000 --json spatial_report.json
+    python benchmarks/spatial_index.py --max-p99-ms 1
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.spatial_index import SceneIndex, _FIELDS, _segment_hits_box  # noqa: E402
+from app.utils.scene_geometry import set_member_segment  # noqa: E402
+
+GRID = 8
+BAY = 4.0
+STOREY = 3.5
+SPLIT = 3
+
+
+def tower(members: int, rng: random.Random):
+    meshes = []
+
+    def add(start, end, element_type):
+        mesh = {
+            "id": f"{element_type}_{len(meshes)}",
+            "type": "BoxGeometry",
+            "position": [0, 0, 0],
+            "scale": [0.3, 1.0, 0.3],
+            "rotation": [0, 0, 0],
+            "userData": {"element_type": element_type, "stress_level": round(rng.random(), 3)}
+        }
+        set_member_segment(mesh, start, end)
+        meshes.append(mesh)
+
+    floor = 0
+    while len(meshes) < members:
+        y0, y1 = floor * STOREY, (floor + 1) * STOREY
+        for i in range(GRID):
+            for j in range(GRID):
+                add((i * BAY, y0, j * BAY), (i * BAY, y1, j * BAY), "column")
+        for i in range(GRID):
+            for j in range(GRID - 1):
+                for k in range(SPLIT):
+                    a, b = j * BAY + k * BAY / SPLIT, j * BAY + (k + 1) * BAY / SPLIT
+                    add((i * BAY, y1, a), (i * BAY, y1, b), "beam")
+                    add((a, y1, i * BAY), (b, y1, i * BAY), "beam")
+        for j in range(GRID - 1):
+            add((j * BAY, y0, 0), ((j + 1) * BAY, y1, 0), "brace")
+            add((0, y0, j * BAY), (0, y1, (j + 1) * BAY), "brace")
+        floor += 1
+    return {"meshes": meshes[:members]}
+
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure scene index build and query latency")
+    parser.add_argument("--members", type=int, default=50_000, help="Members in the generated scene")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries of each kind")
+    parser.add_argument("--checks", type=int, default=50, help="Queries of each kind checked by brute force")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per nearest query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit non-zero if any query kind's p99 exceeds this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scene = tower(args.members, rng)
+    index, build_ms = timed(SceneIndex.from_scene, scene)
+    packed = index.to_bytes()
+    _, load_ms = timed(SceneIndex.from_bytes, packed)
+
+    def random_point():
+        return tuple(rng.uniform(index.low[a], index.high[a]) for a in range(3))
+
+    def random_box():
+        center = random_point()
+        half = rng.uniform(0.5, 3.0)
+        return (tuple(c - half for c in center), tuple(c + half for c in center))
+
+    def random_ray():
+        # Picks from outside the structure toward a point inside it
+        target = random_point()
+        theta = rng.uniform(0, 2 * math.pi)
+        origin = (target[0] + 60 * math.cos(theta), target[1] + rng.uniform(-10, 10), target[2] + 60 * math.sin(theta))
+        return origin, tuple(target[a] - origin[a] for a in range(3))
+
+    kinds = {
+        "point": (lambda: (random_point(), 1.0), index.within),
+        "box": (random_box, index.in_box),
+        "ray": (random_ray, index.ray),
+        "nearest": (lambda: (random_point(), args.k), index.nearest),
+    }
+    brute = {
+        "point": lambda p, r: sorted(i for i in range(index.count) if index.distance(i, p) <= r),
+        "box": lambda lo, hi: sorted(i for i in range(index.count) if _hits_box(index, i, lo, hi)),
+        "ray": lambda o, d: _brute_ray(index, o, d),
+        "nearest": lambda p, k: sorted(index.distance(i, p) for i in range(index.count))[:k],
+    }
+
+    report = {"members": index.count, "cells": len(index.cells), "cell_size": round(index.cell, 3),
+              "build_ms": round(build_ms, 1), "packed_kb": round(len(packed) / 1024, 1),
+              "load_ms": round(load_ms, 1), "queries": {}}
+    failures = 0
+    for kind, (make_args, query) in kinds.items():
+        latencies, sizes, mismatches = [], [], 0
+        for n in range(args.queries):
+            query_args = make_args()
+            result, elapsed = timed(query, *query_args)
+            latencies.append(elapsed)
+            sizes.append(len(result))
+            if n < args.checks:
+                expected = brute[kind](*query_args)
+                mismatches += _normalise(kind, result) != expected
+        failures += mismatches
+        report["queries"][kind] = {
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "mean_results": round(statistics.mean(sizes), 1),
+            "brute_force_mismatches": mismatches,
+        }
+
+    print(f"index: {report['members']} members in {report['cells']} cells of {report['cell_size']}m, "
+          f"built in {report['build_ms']}ms, packed {report['packed_kb']}KB (loads in {report['load_ms']}ms)")
+    for kind, stats in report["queries"].items():
+        print(f"{kind:>8}: p50 {stats['p50_ms']}ms  p99 {stats['p99_ms']}ms  "
+              f"~{stats['mean_results']} results  {stats['brute_force_mismatches']} mismatches")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if failures:
+        print(f"FAIL: {failures} queries disagree with brute force")
+        sys.exit(1)
+    if args.max_p99_ms is not None:
+        slow = [kind for kind, stats in report["queries"].items() if stats["p99_ms"] > args.max_p99_ms]
+        if slow:
+            print(f"FAIL: p99 above {args.max_p99_ms}ms for {', '.join(slow)}")
+            sys.exit(1)
+
+
+def _hits_box(index, i, low, high):
+    d, base = index.data, i * _FIELDS
+    return _segment_hits_box(d[base:base + 3], d[base + 3:base + 6], d[base + 6], low, high)
+
+
+def _brute_ray(index, origin, direction):
+    norm = math.sqrt(sum(c * c for c in direction))
+    unit = tuple(c / norm for c in direction)
+    hits = [(t, i) for i in range(index.count) for t in [index._ray_hit(i, origin, unit)] if t is not None]
+    return [min(hits)[1]] if hits else []
+
+
+def _normalise(kind, result):
+    if kind == "nearest":
+        return [distance for _, distance in result]
+    if kind == "ray":
+        return [i for i, _ in result]
+    if kind == "point":
+        return sorted(i for i, _ in result)
+    return sorted(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@
 FastAPI Server Runner
 
 Usage:
-    python run.py
+    python run.py                # Development: single worker with auto-reload
+    python run.py --production   # Production: one worker per CPU, uvloop/httptools
 
 Environment Variables:
     OPENAI_API_KEY=your_openai_api_key_here
@@ -13,21 +14,102 @@ Environment Variables:
     LOG_LEVEL=INFO
     SESSION_TIMEOUT=3600
     MAX_CHAT_HISTORY=50
+
+Production Variables:
+    HOST=0.0.0.0
+    PORT=8000
+    WORKERS=0                    # 0 = one worker per available CPU; more than one needs Redis,
+                                 # and PostgreSQL unless HISTORY_ENABLED=false, else 1 is started
+    KEEP_ALIVE_TIMEOUT=5
+    BACKLOG=2048
+    GRACEFUL_SHUTDOWN_TIMEOUT=120
 """
 
-import uvicorn
+import importlib.util
 import os
+import sys
+import uvicorn
+from app.config import settings
 
-if __name__ == "__main__":
-    # Check for environment variables
-    if not os.getenv("OPENAI_API_KEY"):
-        print("Warning: OPENAI_API_KEY not set. LLM features will use fallback responses.")
-    
-    # Run the server
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity/cpusets in containers)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def shared_redis_error() -> str:
+    """Why workers couldn't share sessions through REDIS_URL, or "" when they can"""
+    if settings.redis_url.startswith("fakeredis://"):
+        return "fakeredis:// is in-process, so each worker would get its own"
+    try:
+        import redis
+        client = redis.from_url(settings.redis_url, socket_connect_timeout=5)
+        client.ping()
+        client.close()
+    except Exception as e:
+        return f"Redis at {settings.redis_url} is unreachable ({e})"
+    return ""
+
+def shared_history_error() -> str:
+    """Why workers couldn't share the history database, or "" when they can"""
+    if settings.history_enabled and settings.database_url.startswith("sqlite"):
+        return "SQLite takes one writer at a time, so concurrent flushes fail with \"database is locked\""
+    return ""
+
+def production_workers() -> int:
+    """Workers to start: WORKERS (0 = one per CPU), or 1 when they couldn't share state"""
+    workers = settings.workers or available_cpus()
+    if workers > 1:
+        # Without a shared Redis each worker falls back to its own in-memory
+        # sessions, and chat breaks whenever a request lands on another worker
+        error = shared_redis_error()
+        if error:
+            print(f"Warning: starting 1 worker instead of {workers}: {error}. "
+                  "Start Redis to run more.")
+            return 1
+        error = shared_history_error()
+        if error:
+            print(f"Warning: starting 1 worker instead of {workers}: {error}. "
+                  "Use PostgreSQL for DATABASE_URL or set HISTORY_ENABLED=false to run more.")
+            return 1
+    return workers
+
+def run_production():
+    workers = production_workers()
+    # uvloop/httptools come with uvicorn[standard]; uvloop is not available on Windows
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+    print(f"Starting {workers} worker(s) with loop={loop}, http={http}")
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.backlog,
+        timeout_keep_alive=settings.keep_alive_timeout,
+        timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+        log_level=settings.log_level.lower(),
+        proxy_headers=True
+    )
+
+def run_development():
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
         reload=True,
         log_level="info"
-    ) 
\ No newline at end of file
+    )
+
+if __name__ == "__main__":
+    # Check for environment variables
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Warning: OPENAI_API_KEY not set. LLM features will use fallback responses.")
+
+    if "--production" in sys.argv[1:]:
+        run_production()
+    else:
+        run_development()
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Settings are read when app.config is first imported, so the test environment
+# is set up before any app module loads: no Redis (services fall back to memory),
+# no history database and no provider keys.
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1"
+os.environ["HISTORY_ENABLED"] = "false"
+os.environ["SIMILARITY_INDEX_PATH"] = ""
+os.environ["SPECULATION_ENABLED"] = "false"
+for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GEMINI_API_KEY"):
+    os.environ[key] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+
+from app.models.request_models import SimulationRequest
+from app.services.batch_service import BatchService
+from app.services.session_manager import SessionManager
+
+
+class CountingLLM:
+    """Stands in for LLMService: records calls and how many ran at once"""
+
+    def __init__(self):
+        self.prompts = []
+        self.running = self.peak = 0
+
+    async def generate_simulation(self, request: SimulationRequest):
+        self.prompts.append(request.prompt)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if "fail" in request.prompt:
+                raise RuntimeError("provider error")
+            return {"simulation_id": str(uuid.uuid4()), "scene": {"meshes": []}, "description": request.prompt}
+        finally:
+            self.running -= 1
+
+
+def run_batch(prompts, concurrency=2):
+    llm, sessions = CountingLLM(), SessionManager()
+    requests = [SimulationRequest(prompt=prompt) for prompt in prompts]
+
+    async def collect():
+        return [line async for line in BatchService(llm, sessions).generate(requests, concurrency)]
+
+    return llm, sessions, asyncio.run(collect())
+
+
+def test_identical_requests_are_generated_once():
+    prompts = ["steel beam 5m", "truss bridge", "steel beam 5m", "arch bridge", "steel beam 5m", "truss bridge"]
+    llm, sessions, lines = run_batch(prompts)
+
+    assert sorted(llm.prompts) == ["arch bridge", "steel beam 5m", "truss bridge"]
+    results = {tuple(line["indexes"]): line for line in lines if "indexes" in line}
+    assert set(results) == {(0, 2, 4), (1, 5), (3,)}
+    assert lines[-1]["summary"]["requests"] == 6
+    assert lines[-1]["summary"]["distinct"] == 3
+    assert lines[-1]["summary"]["generated"] == 3
+
+    simulation = results[(0, 2, 4)]["simulation"]
+    assert asyncio.run(sessions.get_simulation(simulation["simulation_id"]))["description"] == "steel beam 5m"
+    assert asyncio.run(sessions.get_session(simulation["session_id"]))["current_simulation_id"] == simulation["simulation_id"]
+
+
+def test_requests_differing_in_options_are_not_merged():
+    llm, sessions = CountingLLM(), SessionManager()
+    requests = [SimulationRequest(prompt="steel beam"), SimulationRequest(prompt="steel beam", complexity="high")]
+
+    async def collect():
+        return [line async for line in BatchService(llm, sessions).generate(requests, 4)]
+
+    lines = asyncio.run(collect())
+    assert len(llm.prompts) == 2 and lines[-1]["summary"]["distinct"] == 2
+
+
+def test_errors_are_reported_per_group_and_concurrency_is_capped():
+    prompts = [f"structure {n}" for n in range(8)] + ["please fail", "please fail"]
+    llm, _, lines = run_batch(prompts, concurrency=3)
+
+    assert llm.peak <= 3
+    failed = [line for line in lines if "error" in line]
+    assert len(failed) == 1 and failed[0]["indexes"] == [8, 9]
+    assert lines[-1]["summary"]["errors"] == 1 and lines[-1]["summary"]["generated"] == 8
@@ -0,0 +1,95 @@
+import json
+import random
+
+import pytest
+import zstandard
+
+from app.utils.compression import StoredValueCodec, negotiate_encoding
+
+VALUE = json.dumps({"scene": {"meshes": [{"id": "beam_1", "type": "BoxGeometry", "scale": [5, 0.3, 0.3],
+                                          "userData": {"material": "steel", "stress_level": 0.4}}]}})
+
+
+def train(seed: int) -> bytes:
+    rng = random.Random(seed)
+    samples = [json.dumps({"id": f"member_{n}", "seed": seed, "material": rng.choice(["steel", "wood", "concrete"]),
+                           "stress_level": round(rng.random(), 2), "position": [rng.randint(0, 50), 0, 0]}).encode()
+               for n in range(500)]
+    return zstandard.train_dictionary(4096, samples).as_bytes()
+
+
+def write(path, data: bytes):
+    path.write_bytes(data)
+    return zstandard.ZstdCompressionDict(data).dict_id()
+
+
+def test_round_trip_with_the_shipped_dictionary():
+    codec = StoredValueCodec()
+    assert codec.dictionary_id
+    stored = codec.encode(VALUE)
+    assert zstandard.get_frame_parameters(stored).dict_id == codec.dictionary_id
+    assert codec.decode(stored) == VALUE
+    assert codec.stats()["values"] == 1
+
+
+def test_plain_and_dictionary_free_values_are_read():
+    codec = StoredValueCodec()
+    assert codec.decode(VALUE.encode()) == VALUE
+    assert codec.decode(zstandard.ZstdCompressor().compress(VALUE.encode())) == VALUE
+    assert StoredValueCodec(enabled=False).encode(VALUE) == VALUE.encode()
+
+
+def test_values_written_with_a_retired_dictionary_stay_readable(tmp_path):
+    current = tmp_path / "scene_dictionary.zstd"
+    old_id = write(current, train(1))
+    before = StoredValueCodec(dictionary_path=str(current)).encode(VALUE)
+
+    # Retraining keeps the old dictionary beside the new one
+    current.rename(tmp_path / f"scene_dictionary.{old_id}.zstd")
+    new_id = write(current, train(2))
+    assert new_id != old_id
+    after = StoredValueCodec(dictionary_path=str(current))
+    assert after.dictionary_id == new_id
+    assert after.decode(before) == VALUE
+    assert sorted(after.stats()["readable_dictionaries"]) == sorted([old_id, new_id])
+
+
+def test_unknown_dictionary_is_a_miss(tmp_path):
+    path = tmp_path / "scene_dictionary.zstd"
+    write(path, train(1))
+    stored = StoredValueCodec(dictionary_path=str(path)).encode(VALUE)
+    write(path, train(2))  # Replaced without keeping the old one
+    assert StoredValueCodec(dictionary_path=str(path)).decode(stored) is None
+
+
+def test_pinned_dictionary_is_readable_by_workers_without_the_new_one(tmp_path):
+    old_dir, new_dir = tmp_path / "old", tmp_path / "new"
+    old_dir.mkdir()
+    new_dir.mkdir()
+    old_id = write(old_dir / "scene_dictionary.zstd", train(1))
+    write(new_dir / f"scene_dictionary.{old_id}.zstd", train(1))
+    write(new_dir / "scene_dictionary.zstd", train(2))
+
+    pinned = StoredValueCodec(dictionary_path=str(new_dir / "scene_dictionary.zstd"), write_dictionary_id=old_id)
+    assert pinned.dictionary_id == old_id
+    old_worker = StoredValueCodec(dictionary_path=str(old_dir / "scene_dictionary.zstd"))
+    assert old_worker.decode(pinned.encode(VALUE)) == VALUE
+
+
+def test_values_stay_readable_with_compression_turned_off():
+    stored = StoredValueCodec(enabled=True).encode(VALUE)
+    assert stored.startswith(b"\x28\xb5\x2f\xfd")
+    disabled = StoredValueCodec(enabled=False)
+    assert disabled.decode(stored) == VALUE
+    assert disabled.encode(VALUE) == VALUE.encode()
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br, zstd", "zstd"),
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, zstd;q=0.5", "gzip"),
+    ("identity", None),
+    ("*", "zstd"),
+])
+def test_encoding_negotiation(header, expected):
+    assert negotiate_encoding(header) == expected
@@ -0,0 +1,200 @@
+import copy
+
+import pytest
+
+from app.config import settings
+from app.services.edit_engine import parse_edit, apply_edit
+from app.services.prompt_builder import BEAM_EXAMPLE, TRUSS_EXAMPLE
+from app.utils.scene_geometry import centreline_bounds, set_member_segment, vec3
+
+THRESHOLD = settings.local_edit_min_confidence
+
+
+def beam():
+    # 5m steel beam from x=-2.5 to 2.5 on two supports, 1000N at midspan
+    return copy.deepcopy(BEAM_EXAMPLE)
+
+
+def truss():
+    return copy.deepcopy(TRUSS_EXAMPLE)
+
+
+def edit(simulation, message):
+    plan = parse_edit(message)
+    assert plan is not None and plan.confidence >= THRESHOLD, message
+    return apply_edit(simulation, plan)
+
+
+def extent(simulation, axis):
+    low, high = centreline_bounds(simulation["scene"])
+    return high[axis] - low[axis]
+
+
+def support_xs(simulation):
+    return sorted(round(vec3(s["position"])[0], 3) for s in simulation["scene"]["supports"])
+
+
+@pytest.mark.parametrize("message", [
+    "make it longer",
+    "make it 2m longer",
+    "make the span 3 metres shorter",
+    "lengthen it by 2m",
+    "make it 10% taller",
+    "add a support in the middle",
+    "add 2 supports",
+    "add two more supports",
+    "add a support at x=2",
+    "add a support at 1m from the left",
+    "remove the left support",
+    "double the load",
+    "increase the load by 20%",
+    "set the load to 5kn",
+    "switch to concrete",
+    "add 3 panels",
+])
+def test_simple_edits_are_local(message):
+    plan = parse_edit(message)
+    assert plan is not None and plan.confidence >= THRESHOLD
+
+
+@pytest.mark.parametrize("message", [
+    "make it 2m bigger",              # size with no axis
+    "make it longer than 12m",        # number after the comparative
+    "increase the load at x=2",       # place for a load
+    "add a support under the load",   # place the rules can't read
+    "add 2 supports at x=2",          # several supports on one spot
+    "increase the load",              # no amount
+    "double the left load",           # one load of several
+    "double the load on the left span",
+    "add a support between the left and right towers",
+])
+def test_unread_details_go_to_the_llm(message):
+    plan = parse_edit(message)
+    assert plan is None or plan.confidence < THRESHOLD
+
+
+@pytest.mark.parametrize("message", ["what is the max stress", "show wind load", "add a cable stay"])
+def test_unrecognized_messages_have_no_plan(message):
+    assert parse_edit(message) is None
+
+
+def test_absolute_length_change():
+    simulation = beam()
+    before = extent(simulation, 0)
+    updated, _, changes = edit(simulation, "make it 2m longer")
+    assert extent(updated, 0) == pytest.approx(before + 2)
+    assert changes == [f"Changed length from {before:g}m to {before + 2:g}m"]
+
+
+def test_absolute_height_change_in_millimetres():
+    simulation = truss()
+    before = extent(simulation, 1)
+    updated, _, _ = edit(simulation, "make it 500mm taller")
+    assert extent(updated, 1) == pytest.approx(before + 0.5)
+
+
+def test_height_of_a_lone_beam_goes_to_the_llm():
+    # A beam has no height span to scale; "taller" means a deeper section
+    assert apply_edit(beam(), parse_edit("make it 500mm taller")) is None
+
+
+def test_support_at_coordinate():
+    updated, _, changes = edit(beam(), "add a support at x=2")
+    assert support_xs(updated) == [-2.5, 2.0, 2.5]
+    assert changes == ["Added 1 support at x=2m"]
+
+
+def test_support_from_left_end():
+    updated, _, _ = edit(beam(), "add a support at 1m from the left")
+    assert support_xs(updated) == [-2.5, -1.5, 2.5]
+
+
+def test_support_count_next_to_noun():
+    updated, _, _ = edit(beam(), "add 2 supports")
+    assert len(updated["scene"]["supports"]) == 4
+
+
+def test_support_off_the_structure_is_not_applied():
+    plan = parse_edit("add a support at x=20")
+    assert apply_edit(beam(), plan) is None
+
+
+def test_remove_named_end_support():
+    updated, _, _ = edit(beam(), "remove the left support")
+    assert support_xs(updated) == [2.5]
+
+
+def test_named_member_in_a_larger_structure_goes_to_the_llm():
+    plan = parse_edit("make the top chord longer")
+    assert plan is not None and plan.intents[0].member == "chord"
+    assert apply_edit(truss(), plan) is None
+
+
+@pytest.mark.parametrize("message", [
+    "switch the deck to concrete", "make the cables steel", "use timber for the columns"
+])
+def test_material_of_a_named_member_goes_to_the_llm(message):
+    plan = parse_edit(message)
+    assert plan is not None and plan.intents[0].member is not None
+    assert apply_edit(truss(), plan) is None
+
+
+def test_material_of_a_member_that_is_the_whole_scene():
+    updated, _, _ = edit(beam(), "make the beam concrete")
+    assert updated["scene"]["meshes"][0]["userData"]["material"] == "concrete"
+
+
+@pytest.mark.parametrize("message, action, value", [
+    ("make it 2.5m longer", "scale", 2.5),
+    ("set the load to 1.5 kN", "set_load", 1500),
+    ("increase load to 12.5kN", "set_load", 12500),
+])
+def test_decimals_do_not_split_clauses(message, action, value):
+    plan = parse_edit(message)
+    assert len(plan.intents) == 1 and plan.confidence >= THRESHOLD
+    intent = plan.intents[0]
+    assert intent.action == action and value in (intent.delta, intent.target)
+
+
+def test_sentences_and_joined_edits_still_split():
+    plan = parse_edit("Make it 2.5m longer. Add a support in the middle and double the load.")
+    assert [intent.action for intent in plan.intents] == ["scale", "add_support", "scale_load"]
+
+
+def test_and_inside_a_phrase_is_one_clause():
+    plan = parse_edit("add a support between the left and right towers")
+    assert len(plan.intents) == 1 and plan.intents[0].position is None
+
+
+def test_named_member_that_is_the_whole_scene():
+    simulation = beam()
+    before = extent(simulation, 0)
+    updated, _, _ = edit(simulation, "make the beam longer")
+    assert extent(updated, 0) == pytest.approx(before * 1.5)
+
+
+def test_load_change_scales_member_forces():
+    updated, _, changes = edit(beam(), "double the load")
+    assert updated["scene"]["force_arrows"][0]["label"] == "2000N"
+    assert updated["scene"]["meshes"][0]["userData"]["force"] == 2000
+    assert changes == ["Changed the load from 1000N to 2000N"]
+
+
+def test_panels_are_rebuilt():
+    simulation = truss()
+    meshes = simulation["scene"]["meshes"]
+    for x in (-4, 4):
+        end_post = copy.deepcopy(meshes[-1])
+        set_member_segment(end_post, (x, 0, 0), (x, 2, 0))
+        meshes.append(end_post)
+    updated, _, changes = edit(simulation, "add 2 panels")
+    verticals = [m for m in updated["scene"]["meshes"] if m["userData"]["element_type"] == "vertical"]
+    assert changes == ["Changed the truss from 2 to 4 panels"]
+    assert sorted(round(m["position"][0], 3) for m in verticals) == [-4, -2, 0, 2, 4]
+
+
+def test_edit_leaves_the_original_untouched():
+    simulation = beam()
+    original = copy.deepcopy(simulation)
+    edit(simulation, "make it 2m longer and add a support at x=3")
+    assert simulation == original
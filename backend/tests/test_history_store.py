@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from app.services.history_store import HistoryStore
+
+
+def enabled_store() -> HistoryStore:
+    store = HistoryStore()
+    store.enabled = True
+    return store
+
+
+def test_enqueued_session_is_a_snapshot():
+    store = enabled_store()
+    session = {"session_id": "s1", "message_count": 1, "messages": [{"id": "m1", "content": "hi"}]}
+    store.enqueue_session(session)
+
+    # The caller keeps mutating its copy (LiveSession does between flushes)
+    session["messages"].append({"id": "m2", "content": "half-written"})
+    session["message_count"] = 2
+
+    pending = store._pending[("session", "s1")]
+    assert pending["message_count"] == 1
+    assert [message["id"] for message in pending["messages"]] == ["m1"]
+
+
+def test_enqueued_simulation_is_plain_json():
+    store = enabled_store()
+    simulation = {"simulation_id": "sim1", "metadata": {"generated_at": datetime(2024, 1, 1)}, "scene": {}}
+    store.enqueue_simulation("sim1", simulation)
+    simulation["scene"]["meshes"] = []
+    pending = store._pending[("simulation", "sim1")]
+    assert pending["metadata"]["generated_at"] == "2024-01-01 00:00:00"
+    assert pending["scene"] == {}
+
+
+def test_disabled_store_drops_writes():
+    store = HistoryStore()
+    store.enqueue_session({"session_id": "s1", "messages": []})
+    assert not store._pending
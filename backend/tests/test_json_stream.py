@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from app.utils.json_stream import JsonArrayScanner
+
+RESPONSE = json.dumps({
+    "description": "A beam [with brackets] and \"quotes\" {in text}",
+    "scene": {
+        "meshes": [{"id": f"m{i}", "name": "brace \\\" {x}", "geometry": {"args": [1, 2, [3]]}} for i in range(50)],
+        "supports": [{"id": "s1", "position": [0, 0, 0]}],
+        "force_arrows": []
+    },
+    "changes_made": ["none"]
+})
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(RESPONSE)])
+def test_items_are_returned_as_they_close(size):
+    scanner = JsonArrayScanner(["meshes", "supports", "force_arrows"])
+    found = []
+    for start in range(0, len(RESPONSE), size):
+        found += scanner.feed(RESPONSE[start:start + size])
+    scene = json.loads(RESPONSE)["scene"]
+    assert found == [("meshes", mesh) for mesh in scene["meshes"]] + [("supports", scene["supports"][0])]
+
+
+def test_buffer_holds_only_the_open_item():
+    scanner = JsonArrayScanner(["meshes"])
+    longest = 0
+    for char in RESPONSE:
+        scanner.feed(char)
+        longest = max(longest, len(scanner._text))
+    item = max(len(json.dumps(mesh)) for mesh in json.loads(RESPONSE)["scene"]["meshes"])
+    assert longest <= item + 1
@@ -0,0 +1,75 @@
+import asyncio
+import copy
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models.chat_models import ChatMessage, MessageType
+from app.services.chat_service import ChatService
+from app.services.live_session import LiveSession
+from app.services.prompt_builder import BEAM_EXAMPLE
+from app.services.session_broadcaster import SessionBroadcaster
+from app.services.session_manager import SessionManager
+
+
+def session_manager(store: str) -> SessionManager:
+    manager = SessionManager()
+    if store == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        manager.redis_client = fakeredis.FakeRedis()
+    return manager
+
+
+def user_message(content: str) -> ChatMessage:
+    return ChatMessage(id=str(uuid.uuid4()), type=MessageType.USER, content=content, timestamp=datetime.now())
+
+
+async def chat_alongside_http(manager: SessionManager):
+    await manager.store_simulation("sim-0", {**copy.deepcopy(BEAM_EXAMPLE), "simulation_id": "sim-0"})
+    session_id = await manager.create_session("sim-0")
+    live = LiveSession(session_id, manager, ChatService(manager), SessionBroadcaster())
+    assert await live.open()
+
+    events = []
+
+    async def send(event):
+        events.append(event)
+
+    await live.chat("make it 2m longer", send)
+    # An HTTP /api/chat turn lands before the WebSocket's batched flush
+    await manager.add_message(session_id, user_message("from http"))
+    await live.close()
+    return session_id, events[-1]["update"]["simulation_id"]
+
+
+@pytest.mark.parametrize("store", ["memory", "redis"])
+def test_flush_keeps_concurrent_http_turns(store):
+    manager = session_manager(store)
+    session_id, simulation_id = asyncio.run(chat_alongside_http(manager))
+    session = asyncio.run(manager.get_session(session_id))
+    contents = [message["content"] for message in session["messages"]]
+    assert "from http" in contents and "make it 2m longer" in contents
+    assert session["message_count"] == 3
+    assert session["current_simulation_id"] == simulation_id
+
+
+def test_update_session_reruns_after_a_conflicting_write():
+    manager = session_manager("redis")
+    session_id = asyncio.run(manager.create_session("sim-0"))
+    other_writer = SessionManager()
+    other_writer.redis_client = manager.redis_client
+    calls = []
+
+    def add_live_turn(session_data):
+        calls.append(1)
+        if len(calls) == 1:
+            # Another writer saves between our read and our write
+            other_writer._cache_session(session_id, {**session_data, "messages": [{"content": "other"}],
+                                                     "message_count": 1})
+        session_data["messages"].append({"content": "live"})
+
+    asyncio.run(manager.update_session(session_id, add_live_turn))
+    session = asyncio.run(manager.get_session(session_id))
+    assert len(calls) == 2
+    assert [message["content"] for message in session["messages"]] == ["other", "live"]
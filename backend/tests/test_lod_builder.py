@@ -0,0 +1,45 @@
+import math
+
+from app.models.request_models import DetailLevel
+from app.services.lod_builder import build_lod
+from app.utils.scene_geometry import set_member_segment
+
+
+def member(mesh_id, start, end, user_data):
+    mesh = {"id": mesh_id, "type": "BoxGeometry", "scale": [1, 0.2, 0.2], "userData": user_data}
+    set_member_segment(mesh, start, end)
+    return mesh
+
+
+def chord(user_data_for):
+    # Ten spliced 1m segments along x: a chain medium merges into one member
+    return {
+        "meshes": [member(f"m{i}", (i, 0, 0), (i + 1, 0, 0), user_data_for(i)) for i in range(10)],
+        "supports": [],
+        "force_arrows": []
+    }
+
+
+def test_medium_merges_a_spliced_chain():
+    scene = chord(lambda i: {"element_type": "chord", "stress_level": 0.1 * i, "force": -100 * i})
+    meshes = build_lod(scene, DetailLevel.MEDIUM)["meshes"]
+    # The most stressed segment stays on its own; the rest collapse to one proxy
+    assert len(meshes) == 2
+    proxy = next(mesh for mesh in meshes if mesh["id"].startswith("lod_"))
+    assert proxy["userData"]["member_count"] == 9
+    assert proxy["userData"]["force"] == -800
+    assert math.isclose(proxy["userData"]["stress_level"], 0.8)
+
+
+def test_unreadable_user_data_is_treated_as_zero():
+    odd = [None, "steel", {"stress_level": "high"}, {"stress_level": None, "force": "n/a"},
+           {"stress_level": float("nan")}, {"stress_level": [1]}, {}, {"element_type": ["x"]}, None, {}]
+    scene = chord(lambda i: odd[i])
+    for level in (DetailLevel.MEDIUM, DetailLevel.LOW):
+        meshes = build_lod(scene, level)["meshes"]
+        assert 0 < len(meshes) < len(scene["meshes"])
+
+
+def test_full_level_is_the_scene_itself():
+    scene = chord(lambda i: {})
+    assert build_lod(scene, DetailLevel.FULL) is scene
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from app.services.prompt_builder import (
+    MIN_CACHEABLE_TOKENS, HISTORY_WINDOW, HISTORY_BLOCK,
+    get_simulation_prefix, get_chat_prefix, estimate_tokens, history_window, extract_token_usage
+)
+from app.services.session_manager import SessionManager
+
+
+def test_prefixes_reach_cache_minimum():
+    for complexity in ("simple", "medium", "high"):
+        assert estimate_tokens(get_simulation_prefix(complexity)) >= MIN_CACHEABLE_TOKENS
+    assert estimate_tokens(get_chat_prefix()) >= MIN_CACHEABLE_TOKENS
+
+
+def test_prefix_is_dedented():
+    assert not any(line.startswith("    You are") for line in get_chat_prefix().splitlines())
+    assert get_simulation_prefix("simple").startswith("You are")
+
+
+def test_history_window_bounds():
+    for length in range(0, 60):
+        history = list(range(length))
+        window = history_window(history)
+        assert window == history[length - len(window):]
+        assert len(window) == length or HISTORY_WINDOW <= len(window) < HISTORY_WINDOW + HISTORY_BLOCK
+
+
+def test_history_window_stable_between_turns():
+    # A turn adds a user and an assistant message; the window start only moves once per block
+    starts = [history_window(list(range(length)))[0] for length in range(HISTORY_WINDOW, 40, 2)]
+    moves = sum(1 for a, b in zip(starts, starts[1:]) if a != b)
+    assert moves <= (40 - HISTORY_WINDOW) // HISTORY_BLOCK
+
+
+def test_trimmed_history_keeps_window_aligned():
+    manager = SessionManager.__new__(SessionManager)
+    manager.max_chat_history = 50
+    messages = []
+    first_sent = []
+    for number in range(200):
+        messages = manager.trim_history(messages + [number])
+        assert len(messages) <= 50
+        first_sent.append(history_window(messages)[0])
+    # The first message sent is always a multiple of the block, wherever trimming cut
+    assert all(first % HISTORY_BLOCK == 0 for first in first_sent)
+
+
+def test_openai_cached_tokens_as_object_or_dict():
+    # Newer SDKs model prompt_tokens_details; openai 1.3.x leaves it a plain dict
+    modelled = SimpleNamespace(prompt_tokens=2000, prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+    raw = SimpleNamespace(prompt_tokens=2000, prompt_tokens_details={"cached_tokens": 1536})
+    for usage in (modelled, raw):
+        assert extract_token_usage(usage) == {"prompt_tokens": 2000, "cached_tokens": 1536}
+    assert extract_token_usage(SimpleNamespace(prompt_tokens=10))["cached_tokens"] == 0
@@ -0,0 +1,127 @@
+import copy
+import math
+import random
+
+import pytest
+
+from app.services.scene_validator import validate_scene, PARALLEL_COS
+from app.utils.scene_geometry import member_segment, set_member_segment
+
+
+def member(mesh_id, start, end, user_data=None):
+    mesh = {"id": mesh_id, "type": "BoxGeometry", "scale": [1, 0.2, 0.2], "userData": user_data}
+    set_member_segment(mesh, start, end)
+    return mesh
+
+
+def support(support_id, position):
+    return {"id": support_id, "type": "ConeGeometry", "position": list(position), "scale": [0.3, 0.5, 0.3]}
+
+
+def frame():
+    # Portal frame: two 4m columns on supports and a 6m beam across the top
+    return {
+        "meshes": [
+            member("left", (0, 0, 0), (0, 4, 0)),
+            member("right", (6, 0, 0), (6, 4, 0)),
+            member("beam", (0, 4, 0), (6, 4, 0), {"stress_level": 0.4})
+        ],
+        "supports": [support("s1", (0, 0, 0)), support("s2", (6, 0, 0))],
+        "force_arrows": [{"id": "load", "origin": [3, 6, 0], "direction": [0, -1, 0], "length": 2}]
+    }
+
+
+def test_sound_frame_is_valid_and_unchanged():
+    scene = frame()
+    repaired, diagnostics, index = validate_scene(scene)
+    assert diagnostics["valid"]
+    assert diagnostics["components"] == 1 and diagnostics["nodes"] == 4
+    assert repaired["meshes"] == scene["meshes"]
+    assert index.count == 3
+
+
+def test_stray_endpoint_is_snapped_onto_the_joint():
+    scene = frame()
+    set_member_segment(scene["meshes"][2], (0.03, 4.02, 0), (6, 4, 0))
+    original = copy.deepcopy(scene)
+    repaired, diagnostics, _ = validate_scene(scene)
+    assert diagnostics["repairs"]["snapped_endpoints"] == 1
+    start, end, _ = member_segment(repaired["meshes"][2])
+    assert start == pytest.approx((0, 4, 0), abs=1e-6)
+    assert scene == original  # The input is left alone
+
+
+def test_duplicate_keeps_the_most_stressed_copy():
+    scene = frame()
+    scene["meshes"].append(member("beam_copy", (6, 4, 0), (0, 4, 0), None))
+    scene["meshes"].append(member("beam_odd", (0, 4, 0), (6, 4, 0), {"stress_level": "high"}))
+    repaired, diagnostics, _ = validate_scene(scene)
+    assert sorted(diagnostics["repairs"]["removed_duplicates"]["ids"]) == ["beam_copy", "beam_odd"]
+    assert [mesh["id"] for mesh in repaired["meshes"]] == ["left", "right", "beam"]
+
+
+def test_floating_load_is_anchored_to_the_nearest_member():
+    scene = frame()
+    scene["force_arrows"][0]["origin"] = [3, 6.5, 0]
+    repaired, diagnostics, _ = validate_scene(scene)
+    assert diagnostics["repairs"]["anchored_loads"]["ids"] == ["load"]
+    assert repaired["force_arrows"][0]["origin"] == pytest.approx([3, 6, 0], abs=0.2)
+
+
+def test_unsupported_member_and_far_load_are_reported():
+    scene = frame()
+    scene["meshes"].append(member("loose", (20, 10, 0), (24, 10, 0)))
+    scene["force_arrows"].append({"id": "far", "origin": [3, 60, 0], "direction": [0, -1, 0], "length": 2})
+    _, diagnostics, _ = validate_scene(scene)
+    assert not diagnostics["valid"]
+    assert diagnostics["issues"]["floating_members"]["ids"] == ["loose"]
+    assert diagnostics["issues"]["unanchored_loads"]["ids"] == ["far"]
+
+
+def test_report_only_mode_changes_nothing():
+    scene = frame()
+    scene["meshes"].append(member("beam_copy", (0, 4, 0), (6, 4, 0)))
+    repaired, diagnostics, _ = validate_scene(scene, repair=False)
+    assert repaired["meshes"] == scene["meshes"]
+    assert diagnostics["issues"]["duplicate_members"]["ids"] == ["beam_copy"]
+    assert diagnostics["repairs"] == {}
+
+
+def test_parallel_members_at_a_busy_joint_are_reported():
+    # Spokes from one hub in random directions, some nudged just off another spoke
+    rng = random.Random(7)
+    directions = []
+    for _ in range(150):
+        d = [rng.gauss(0, 1) for _ in range(3)]
+        directions.append(d)
+        if rng.random() < 0.3:
+            directions.append([c + rng.gauss(0, 0.01) for c in d])
+    scene = {"meshes": [], "supports": [support("s", (0, 0, 0))], "force_arrows": []}
+    units = []
+    for n, d in enumerate(directions):
+        length = math.sqrt(sum(c * c for c in d))
+        units.append([c / length for c in d])
+        scene["meshes"].append(member(f"m{n}", (0, 0, 0), tuple((2 + n % 7) * c / length for c in d)))
+
+    _, diagnostics, _ = validate_scene(scene, repair=False)
+    # Spokes whose far ends snapped together are duplicates, not overlaps
+    duplicates = set(diagnostics["issues"]["duplicate_members"]["ids"])
+    expected = [
+        [f"m{i}", f"m{j}"] for i in range(len(units)) for j in range(i + 1, len(units))
+        if sum(a * b for a, b in zip(units[i], units[j])) >= PARALLEL_COS
+        and not {f"m{i}", f"m{j}"} & duplicates
+    ]
+    overlaps = diagnostics["issues"]["overlapping_members"]
+    assert expected and overlaps["count"] == len(expected)
+    assert all(pair in expected for pair in overlaps["ids"])
+
+
+def test_malformed_members_do_not_fail_validation():
+    scene = frame()
+    scene["meshes"].append({"id": "bad", "position": [None, "x", 0], "rotation": None, "scale": "big"})
+    scene["meshes"].append(None)
+    scene["force_arrows"][0]["length"] = "long"
+    repaired, diagnostics, index = validate_scene(scene)
+    assert index.count == 4
+    assert [mesh["id"] for mesh in repaired["meshes"]] == ["left", "right", "beam", "bad"]
+    assert diagnostics["members"] == 4
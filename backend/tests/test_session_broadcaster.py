@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.session_broadcaster import SessionBroadcaster, LISTENER_STOP_TIMEOUT
+
+
+def test_local_delivery_without_redis():
+    async def run():
+        broadcaster = SessionBroadcaster()
+        queue = await broadcaster.subscribe("s1")
+        await broadcaster.publish("s1", {"type": "update"})
+        await broadcaster.publish("s2", {"type": "update"})
+        return queue.qsize()
+
+    assert asyncio.run(run()) == 1
+
+
+def test_close_returns_when_the_listener_swallows_cancel():
+    pytest.importorskip("fakeredis")
+
+    async def swallowing_get_message(timeout):
+        # What some client versions do with a cancel that lands mid-read
+        try:
+            await asyncio.sleep(timeout)
+        except asyncio.CancelledError:
+            pass
+        return None
+
+    async def run():
+        broadcaster = SessionBroadcaster("fakeredis://")
+        await broadcaster.subscribe("s1")
+        broadcaster._pubsub.get_message = swallowing_get_message
+        await asyncio.sleep(0.05)
+        listener = broadcaster._listener
+        start = time.perf_counter()
+        await broadcaster.close()
+        return time.perf_counter() - start, listener.done()
+
+    elapsed, stopped = asyncio.run(run())
+    assert stopped and elapsed < LISTENER_STOP_TIMEOUT
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import pytest
+
+from app.models.request_models import SimulationRequest
+from app.services.llm_service import LLMService
+from app.services.similarity_index import SimilarityIndex, REDIS_KEY, TRIMMED_KEY, normalize_prompt, similarity_scope
+
+
+def test_reworded_prompt_is_an_exact_match():
+    index = SimilarityIndex()
+    index.add("Simulate a 6m steel beam with a 5 kN point load", "simple", "sim-1")
+    match = index.lookup("steel beam, 6 m, point load of 5000N", "simple")
+    assert match.simulation_id == "sim-1"
+    assert match.score == 1.0 and match.same_numbers and match.same_order
+
+
+def test_near_duplicate_ranks_above_unrelated():
+    index = SimilarityIndex()
+    index.add("steel truss bridge with vehicle loads", "simple", "truss")
+    index.add("concrete arch dam under water pressure", "simple", "dam")
+    matches = index.candidates("steel truss bridges with vehicle load", "simple")
+    assert matches[0].simulation_id == "truss"
+    assert all(match.simulation_id != "dam" or match.score < matches[0].score for match in matches)
+
+
+def test_numbers_must_match_for_reuse():
+    index = SimilarityIndex()
+    index.add("6m steel beam with point load", "simple", "six")
+    match = index.lookup("8m steel beam with point load", "simple")
+    assert match is None or not match.same_numbers
+
+
+def test_swapped_words_are_not_reused():
+    index = SimilarityIndex()
+    index.add("steel beam on concrete columns", "simple", "steel-beam")
+    match = index.lookup("concrete beam on steel columns", "simple")
+    # Same bag of words, but the materials belong to different members
+    assert match.score == 1.0 and match.same_numbers
+    assert not match.same_order
+
+
+def test_complexity_is_part_of_the_key():
+    index = SimilarityIndex()
+    index.add("steel frame building with wind load", "simple", "simple-sim")
+    assert index.lookup("steel frame building with wind load", "high") is None
+
+
+class StubSessions:
+    def __init__(self, simulations):
+        self.simulations = simulations
+
+    async def get_simulation(self, simulation_id):
+        return self.simulations.get(simulation_id)
+
+
+def test_expired_match_falls_through_to_the_next_candidate():
+    request = SimulationRequest(prompt="steel truss bridge with vehicle loads and wind")
+    scope = service_scope(request)
+    index = SimilarityIndex()
+    index.add("steel truss bridge with vehicle loads", scope, "alive")
+    index.add("steel truss bridge with vehicle loads and wind", scope, "expired")
+    service = LLMService(session_manager=StubSessions({"alive": {"scene": {"meshes": []}}}), similarity_index=index)
+
+    similar, simulation = asyncio.run(service._find_similar(request))
+    assert similar.simulation_id == "alive"
+    assert simulation == {"scene": {"meshes": []}}
+    # The dead entry is no longer offered
+    assert [m.simulation_id for m in index.candidates(request.prompt, scope)] == ["alive"]
+
+
+def service_scope(request):
+    return similarity_scope(request.complexity.value, request.structure_type, request.preferences)
+
+
+def test_structure_type_and_preferences_are_part_of_the_scope():
+    index = SimilarityIndex()
+    service = LLMService(session_manager=StubSessions({"sim-1": {"scene": {"meshes": []}}}), similarity_index=index)
+    original = SimulationRequest(prompt="steel truss bridge with vehicle loads")
+    index.add(original.prompt, service_scope(original), "sim-1")
+
+    assert asyncio.run(service._find_similar(original))[0].simulation_id == "sim-1"
+    for request in (
+        SimulationRequest(prompt=original.prompt, structure_type="arch"),
+        SimulationRequest(prompt=original.prompt, preferences={**original.preferences, "units": "imperial"}),
+    ):
+        assert asyncio.run(service._find_similar(request)) == (None, None)
+
+
+def test_memory_keeps_only_the_newest_entries():
+    index = SimilarityIndex(max_entries=10)
+    for i in range(30):
+        index.add(f"steel beam number {i}", "simple", f"sim-{i}")
+    # Adding an existing prompt again refreshes it instead of growing the index
+    index.add("steel beam number 20", "simple", "sim-20b")
+    index.add("steel beam number 31", "simple", "sim-31")
+
+    assert len(index) == 10
+    for band in index._bands:
+        ids = [i for bucket in band.values() for i in (bucket if isinstance(bucket, list) else [bucket])]
+        assert sorted(ids) == sorted(index._entries)
+    assert all(match.simulation_id not in ("sim-0", "sim-21") for match in index.candidates("steel beam number 0", "simple"))
+    assert index.lookup("steel beam number 20", "simple").simulation_id == "sim-20b"
+    assert index.lookup("steel beam number 31", "simple").simulation_id == "sim-31"
+
+
+def test_redis_list_is_capped_and_workers_stay_in_step():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    writer = SimilarityIndex(redis_client=fakeredis.FakeRedis(server=server), max_entries=10)
+    writer.load()
+    reader = SimilarityIndex(redis_client=fakeredis.FakeRedis(server=server), max_entries=10)
+    reader.load()
+
+    for i in range(40):
+        writer.add(f"steel beam number {i}", "simple", f"sim-{i}")
+        if i % 7 == 0:
+            reader.sync()
+    reader.sync()
+
+    client = fakeredis.FakeRedis(server=server)
+    assert client.llen(REDIS_KEY) <= 11
+    assert int(client.get(TRIMMED_KEY)) + client.llen(REDIS_KEY) == 40
+    # The reader never applied a shifted entry: each prompt maps to its own simulation
+    for i in range(40):
+        match = reader.lookup(f"steel beam number {i}", "simple")
+        if match is not None and match.score == 1.0:
+            assert match.simulation_id == f"sim-{i}"
+    assert reader.lookup("steel beam number 39", "simple").simulation_id == "sim-39"
+
+    # A worker starting now only replays what's left
+    late = SimilarityIndex(redis_client=fakeredis.FakeRedis(server=server), max_entries=10)
+    asyncio.run(_start_and_wait(late))
+    assert late.ready and len(late) == client.llen(REDIS_KEY)
+
+
+async def _start_and_wait(index):
+    await index.start()
+    await index._loader
+
+
+def test_jsonl_file_is_compacted(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    with open(path, "w") as f:
+        for i in range(30):
+            f.write(json.dumps({"prompt": normalize_prompt(f"beam {i}"), "complexity": "simple",
+                                "simulation_id": f"sim-{i}"}) + "\n")
+    index = SimilarityIndex(path=str(path), max_entries=10)
+    index.load()
+    assert len(path.read_text().splitlines()) == 10
+    assert len(index) == 10
+    assert index.lookup("beam 29", "simple").simulation_id == "sim-29"
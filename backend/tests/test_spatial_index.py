@@ -0,0 +1,83 @@
+import math
+import random
+
+import pytest
+
+from app.services.spatial_index import SceneIndex
+from app.utils.scene_geometry import set_member_segment
+
+
+def member(mesh_id, start, end, user_data=None):
+    mesh = {"id": mesh_id, "type": "CylinderGeometry", "scale": [0.1, 1, 0.1], "userData": user_data}
+    set_member_segment(mesh, start, end)
+    return mesh
+
+
+def random_scene(count=300, seed=7):
+    rng = random.Random(seed)
+    meshes = []
+    for i in range(count):
+        start = tuple(rng.uniform(-20, 20) for _ in range(3))
+        end = tuple(c + rng.uniform(-2, 2) for c in start)
+        meshes.append(member(f"m{i}", start, end, {"stress_level": rng.random()}))
+    return {"meshes": meshes}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SceneIndex.from_scene(random_scene())
+
+
+def test_nearest_matches_brute_force(index):
+    rng = random.Random(1)
+    for _ in range(50):
+        point = tuple(rng.uniform(-30, 30) for _ in range(3))
+        expected = sorted(index.distance(i, point) for i in range(index.count))[:5]
+        found = [distance for _, distance in index.nearest(point, 5)]
+        assert found == pytest.approx(expected)
+
+
+def test_nearest_far_from_the_structure(index):
+    point = (500.0, 0.0, 0.0)
+    expected = min(range(index.count), key=lambda i: index.distance(i, point))
+    assert index.nearest(point, 1)[0][0] == expected
+
+
+def test_ray_matches_brute_force(index):
+    rng = random.Random(2)
+    for _ in range(100):
+        origin = tuple(rng.uniform(-30, 30) for _ in range(3))
+        direction = tuple(rng.uniform(-1, 1) for _ in range(3))
+        norm = math.sqrt(sum(c * c for c in direction))
+        unit = tuple(c / norm for c in direction)
+        hits = [(i, index._ray_hit(i, origin, unit)) for i in range(index.count)]
+        expected = sorted((t for _, t in hits if t is not None))[:3]
+        found = [t for _, t in index.ray(origin, direction, limit=3)]
+        assert found == pytest.approx(expected)
+
+
+def test_ray_along_an_axis_hits_the_first_member():
+    scene = {"meshes": [member("near", (5, -1, 0), (5, 1, 0)), member("far", (9, -1, 0), (9, 1, 0))]}
+    hits = SceneIndex.from_scene(scene).ray((0, 0, 0), (1, 0, 0), limit=2)
+    assert [i for i, _ in hits] == [0, 1]
+    assert hits[0][1] == pytest.approx(5, abs=0.2)
+    assert SceneIndex.from_scene(scene).ray((0, 0, 0), (-1, 0, 0)) == []
+
+
+def test_within_and_box_agree_with_brute_force(index):
+    point, radius = (0.0, 0.0, 0.0), 6.0
+    expected = {i for i in range(index.count) if index.distance(i, point) <= radius}
+    assert {i for i, _ in index.within(point, radius)} == expected
+    box = index.in_box((-radius,) * 3, (radius,) * 3)
+    assert expected <= set(box)
+
+
+def test_round_trip_and_malformed_user_data():
+    scene = {"meshes": [member("a", (0, 0, 0), (1, 0, 0), None), member("b", (0, 1, 0), (1, 1, 0), "x"),
+                        member("c", (0, 2, 0), (1, 2, 0), {"stress_level": "high", "element_type": None}),
+                        member("d", (0, 3, 0), (1, 3, 0), {"stress_level": 0.7, "element_type": "chord"})]}
+    index = SceneIndex.from_scene(scene)
+    assert [index.stress(i) for i in range(4)] == [0.0, 0.0, 0.0, 0.7]
+    assert index.element_types == ["", "", "", "chord"]
+    copy = SceneIndex.from_bytes(index.to_bytes())
+    assert copy.ids == index.ids and list(copy.data) == list(index.data)
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from app.api.traffic_middleware import LiveTrafficMiddleware
+from app.config import settings
+from app.services.edit_engine import parse_edit
+from app.services.session_manager import SessionManager
+from app.services.speculation import FOLLOW_UPS, LiveTraffic, SpeculationWorker, follow_up_key
+
+
+@pytest.mark.parametrize("message", [message for message, _ in FOLLOW_UPS])
+def test_default_follow_ups_are_local_edits(message):
+    plan = parse_edit(message)
+    assert plan is not None and plan.confidence >= settings.local_edit_min_confidence
+
+
+def test_llm_only_follow_ups_need_a_budget(monkeypatch):
+    worker = SpeculationWorker(SessionManager(), LiveTraffic())
+    for _ in range(5):
+        worker._observe(follow_up_key("show wind load"), "show wind load")
+        worker._observe(follow_up_key("lengthen it"), "lengthen it")
+
+    monkeypatch.setattr(settings, "speculation_llm_calls_per_minute", 0)
+    candidates = worker._candidates()
+    assert "show wind load" not in candidates
+    assert not worker._take_llm_call()
+
+    monkeypatch.setattr(settings, "speculation_llm_calls_per_minute", 6)
+    assert "show wind load" in worker._candidates()
+
+
+def in_flight_during(path: str, scope_type: str = "http") -> int:
+    traffic = LiveTraffic()
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(traffic.in_flight)
+
+    asyncio.run(LiveTrafficMiddleware(app, traffic)({"type": scope_type, "path": path}, None, None))
+    assert traffic.in_flight == 0
+    return seen[0]
+
+
+def test_streaming_and_websocket_requests_are_not_live_traffic():
+    assert in_flight_during("/api/chat") == 1
+    assert in_flight_during("/api/simulate/batch") == 0
+    assert in_flight_during("/api/ws/session/abc", "websocket") == 0
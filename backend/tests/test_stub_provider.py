@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.models.request_models import SimulationRequest
+from app.services import llm_service as llm_module
+from app.services.llm_service import LLMService
+from app.services.providers import ProviderAdapter, GeminiAdapter, StubAdapter
+from app.services.stub_provider import StubLLMProvider, StubProviderError
+
+
+def stub_adapter(**options) -> StubAdapter:
+    adapter = StubAdapter()
+    adapter._client = StubLLMProvider(latency_distribution="constant", latency_mean_ms=0, **options)
+    return adapter
+
+
+def test_same_prompt_same_completion():
+    stub = StubLLMProvider(latency_mean_ms=0)
+    first = asyncio.run(stub.complete("simulate", "a steel beam"))
+    assert first == asyncio.run(stub.complete("simulate", "a steel beam"))
+
+
+def test_injected_errors_reach_the_caller(monkeypatch):
+    monkeypatch.setattr(llm_module, "get_provider", lambda provider: stub_adapter(error_rate=1.0))
+    request = SimulationRequest(prompt="simply supported steel beam")
+    with pytest.raises(StubProviderError):
+        asyncio.run(LLMService().generate_simulation(request))
+
+
+def test_stub_simulation_without_errors(monkeypatch):
+    monkeypatch.setattr(llm_module, "get_provider", lambda provider: stub_adapter())
+    simulation = asyncio.run(LLMService().generate_simulation(SimulationRequest(prompt="simply supported steel beam")))
+    assert simulation["metadata"]["llm_model"] == "stub"
+    assert simulation["scene"]["meshes"]
+
+
+def test_adapters_must_implement_chat():
+    class Incomplete(ProviderAdapter):
+        def _create_client(self):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+class FakeGemini:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_content_async(self, contents, generation_config=None):
+        self.calls.append((contents, generation_config))
+        return type("Response", (), {"text": "ok"})()
+
+
+def test_gemini_chat_maps_roles():
+    adapter = GeminiAdapter()
+    adapter._client = FakeGemini()
+    content, _ = asyncio.run(adapter.chat([
+        {"role": "system", "content": "You edit scenes"},
+        {"role": "user", "content": "add a beam"},
+        {"role": "assistant", "content": "done"},
+        {"role": "user", "content": "make it longer"},
+    ], max_tokens=100))
+    assert content == "ok"
+    contents, config = adapter.client.calls[0]
+    assert contents == [
+        {"role": "user", "parts": ["You edit scenes\n\nadd a beam"]},
+        {"role": "model", "parts": ["done"]},
+        {"role": "user", "parts": ["make it longer"]},
+    ]
+    assert config["max_output_tokens"] == 100
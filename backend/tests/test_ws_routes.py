@@ -0,0 +1,25 @@
+import asyncio
+import copy
+
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_session_manager
+from app.main import app
+from app.services.prompt_builder import BEAM_EXAMPLE
+
+
+def test_bad_frames_get_an_error_and_keep_the_connection():
+    manager = get_session_manager()
+    asyncio.run(manager.store_simulation("ws-sim", {**copy.deepcopy(BEAM_EXAMPLE), "simulation_id": "ws-sim"}))
+    session_id = asyncio.run(manager.create_session("ws-sim"))
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/api/ws/session/{session_id}") as websocket:
+            assert websocket.receive_json()["type"] == "session"
+            for frame in ("not json", "[1, 2]"):
+                websocket.send_text(frame)
+                assert websocket.receive_json()["type"] == "error"
+            websocket.send_bytes(b"\x00\x01")
+            assert websocket.receive_json()["type"] == "error"
+            websocket.send_json({"type": "ping"})
+            assert websocket.receive_json() == {"type": "pong"}